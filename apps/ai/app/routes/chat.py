@@ -12,6 +12,9 @@ from pathlib import Path
 from app.services.langchain_service import LangChainService
 from app.services.memory_service import MemoryService
 from app.services.context_service import ContextService
+from app.services.embedding_service import DEFAULT_MODEL_NAME, MODEL_REGISTRY
+from app.services.query_batcher import get_query_batcher
+from app.services.semantic_cache import SemanticCache, context_scope
 from app.tools import (
     DetectUniversityTool,
     UGCSearchTool,
@@ -31,6 +34,9 @@ langchain_service = None
 memory_service = MemoryService()
 context_service = ContextService()
 
+# Answers to earlier questions, reused for paraphrases in the same context
+semantic_cache = SemanticCache()
+
 def get_langchain_service():
     """Get or initialize LangChain service"""
     global langchain_service
@@ -42,6 +48,25 @@ def get_langchain_service():
             raise
     return langchain_service
 
+async def get_query_embedding(message: str):
+    """
+    Embedding of a chat message for the semantic cache, or None without a model
+    
+    Concurrent requests are encoded together by the shared query batcher.
+    Until the warm-up has loaded the model the cache is skipped: getting the
+    batcher would load the model (or wait for it) on the event loop.
+    """
+    if not semantic_cache.enabled:
+        return None
+    if not MODEL_REGISTRY.is_loaded(DEFAULT_MODEL_NAME):
+        MODEL_REGISTRY.load_in_background(DEFAULT_MODEL_NAME)
+        return None
+    try:
+        return await get_query_batcher().encode(message)
+    except Exception as e:
+        logger.warning(f"Semantic cache unavailable: {e}")
+        return None
+
 def load_system_prompt() -> str:
     """Load system prompt from file"""
     try:
@@ -83,13 +108,23 @@ You are a trusted advisor, not just a chatbot."""
         logger.error(f"Error loading system prompt: {e}")
         return "You are UniMate, Sri Lanka's official AI-powered university guidance companion."
 
-def get_tools() -> List:
-    """Get all available tools as LangChain tools"""
+def get_tools(context: Optional[Dict] = None) -> List:
+    """
+    Get all available tools as LangChain tools
+    
+    Args:
+        context: User context; a known university scopes UGC search to its partition
+    """
+    context = context or {}
+    university = None
+    if context_service.should_filter_by_university(context):
+        university = context_service.get_university_filter(context)
+    
     try:
         # Initialize tools
         tools = [
             DetectUniversityTool(),
-            UGCSearchTool(),
+            UGCSearchTool(university=university),
             ZScorePredictTool(),
             RuleEngineTool(),
             MemoryStoreTool(),
@@ -154,9 +189,6 @@ async def chat_endpoint(request: ChatRequest):
         # Load system prompt
         system_prompt = load_system_prompt()
         
-        # Get tools
-        tools = get_tools()
-        
         # Load user memory from MongoDB
         user_context = {}
         try:
@@ -247,6 +279,9 @@ async def chat_endpoint(request: ChatRequest):
             if value is not None:  # Only overwrite if request has a non-None value
                 context[key] = value
         
+        # Get tools (UGC search scoped to the user's university, if known)
+        tools = get_tools(context)
+        
         # Get conversation history from memory
         conversation_history = user_context.get("conversation_history", [])
         
@@ -270,16 +305,41 @@ async def chat_endpoint(request: ChatRequest):
         if context.get("course"):
             enhanced_prompt += f"\n\nUSER COURSE: The user is interested in or enrolled in {context['course']}."
         
+        # Paraphrases of questions already answered in this context skip the LLM.
+        # Follow-ups are answered from the conversation history, which the
+        # cache does not key on, so only messages without history use it
+        cache_scope = context_scope(context)
+        query_embedding = None
+        if not conversation_history:
+            query_embedding = await get_query_embedding(request.message)
+        cached = None
+        if query_embedding is not None:
+            cached = semantic_cache.lookup(query_embedding, request.message, cache_scope)
+        
         # Generate response using LangChain
         try:
-            result = await service.generate_with_tools(
-                message=request.message,
-                tools=tools,
-                system_prompt=enhanced_prompt,
-                session_id=request.sessionId,
-                context=context,
-                conversation_history=conversation_history
-            )
+            if cached is not None:
+                logger.info(f"Semantic cache hit (similarity {cached['similarity']:.3f})")
+                result = cached
+            else:
+                result = await service.generate_with_tools(
+                    message=request.message,
+                    tools=tools,
+                    system_prompt=enhanced_prompt,
+                    session_id=request.sessionId,
+                    context=context,
+                    conversation_history=conversation_history
+                )
+                metadata = result.get("metadata", {})
+                if query_embedding is not None and result.get("response") and "error" not in metadata:
+                    semantic_cache.store(
+                        query_embedding,
+                        request.message,
+                        cache_scope,
+                        result["response"],
+                        result.get("sources", []),
+                        tools_used=metadata.get("tools_used", [])
+                    )
             
             response_text = result.get("response", "I apologize, but I couldn't generate a response.")
             sources = result.get("sources", [])
@@ -0,0 +1,77 @@
+"""
+Vector Index Stats Endpoint
+Introspection of the RAG index for operations
+
+Reports what this worker is serving: storage backend, vectors per source,
+index version and build time, memory, search latency percentiles and cache
+hit rates, plus warnings for a stale or bloated index.
+"""
+from fastapi import APIRouter, HTTPException
+from typing import Any, Dict, List
+import logging
+
+from app.services.vector_store import get_vector_store
+from app.services.embedding_service import DEFAULT_MODEL_NAME, MODEL_REGISTRY
+from app.services.query_batcher import get_query_batcher
+from app.tools.ugc_search_tool import RESULT_CACHE, SEARCH_LATENCY
+from app.routes import chat
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+def index_warnings(collection: Dict[str, Any], index: Dict[str, Any]) -> List[str]:
+    """Signs of a stale or bloated index"""
+    warnings = []
+    documents = collection.get("document_count")
+    live_vectors = index["vectors"] - index["deleted_ids"]
+    if documents is not None and documents != live_vectors:
+        warnings.append(
+            f"Index has {live_vectors} live vectors but the store has {documents} documents; "
+            "run the ingestion script to republish the index"
+        )
+    if index["needs_compaction"]:
+        warnings.append(
+            f"Compaction pending ({index['segments']} segments, {index['deleted_ids']} deleted ids)"
+        )
+    if index["delta_vectors"]:
+        warnings.append(f"{index['delta_vectors']} vectors are not published to the shared index yet")
+    return warnings
+
+def query_batching_stats() -> Dict[str, Any]:
+    """Query embedding batch sizes, if the model is loaded"""
+    if not MODEL_REGISTRY.is_loaded(DEFAULT_MODEL_NAME):
+        return {}
+    return get_query_batcher().stats()
+
+@router.get("/index/stats")
+def index_stats():
+    """
+    Vector index health and performance statistics
+    """
+    try:
+        store = get_vector_store()
+        collection = store.get_collection_stats()
+        if "error" in collection:
+            raise HTTPException(status_code=503, detail=collection["error"])
+        
+        index = store.get_index_stats()
+        return {
+            "backend": collection["backend"],
+            "collection": collection,
+            "index": index,
+            "vectors_per_source": store.count_by_source(),
+            "latency": SEARCH_LATENCY.stats(),
+            "embedding_models": MODEL_REGISTRY.stats(),
+            "query_batching": query_batching_stats(),
+            "caches": {
+                "search_results": RESULT_CACHE.stats(),
+                "semantic_answers": chat.semantic_cache.stats(),
+            },
+            "warnings": index_warnings(collection, index),
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Index stats error: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
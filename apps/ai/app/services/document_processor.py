@@ -8,6 +8,8 @@ from typing import List, Dict, Any, Optional
 from datetime import datetime
 import logging
 
+from app.services.context_service import ContextService
+
 try:
     from PyPDF2 import PdfReader
     PYPDF2_AVAILABLE = True
@@ -38,6 +40,8 @@ class DocumentProcessor:
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
         
+        self.context_service = ContextService()
+        
         if not PYPDF2_AVAILABLE:
             logger.warning("PyPDF2 not installed. Install with: pip install PyPDF2")
     
@@ -207,6 +211,26 @@ class DocumentProcessor:
         
         return metadata
     
+    def detect_source_university(self, source: str, metadata: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """
+        Work out which university a document belongs to
+        
+        Args:
+            source: Source file name (e.g. "University of Moratuwa ... handbook.pdf")
+            metadata: PDF metadata (title/subject are checked if the file name has no match)
+        
+        Returns:
+            University name, or None for national UGC documents
+        """
+        metadata = metadata or {}
+        for text in (source, metadata.get("title"), metadata.get("subject")):
+            if not text:
+                continue
+            university = self.context_service.detect_university(str(text))
+            if university:
+                return university
+        return None
+    
     def process_pdf(self, file_path: str) -> List[Dict[str, Any]]:
         """
         Complete PDF processing pipeline:
@@ -225,6 +249,8 @@ class DocumentProcessor:
         pdf_data = self.read_pdf(file_path)
         source = pdf_data["source"]
         metadata = pdf_data["metadata"]
+        university = self.detect_source_university(source, metadata)
+        metadata["university"] = university
         
         # Process each page separately for better context
         all_chunks = []
@@ -238,6 +264,7 @@ class DocumentProcessor:
             
             # Add full metadata to each chunk
             for chunk in page_chunks:
+                chunk["university"] = university
                 chunk["metadata"] = {
                     **metadata,
                     "page": page_num,
@@ -246,7 +273,10 @@ class DocumentProcessor:
             
             all_chunks.extend(page_chunks)
         
-        logger.info(f"Processed {file_path}: {len(all_chunks)} chunks from {pdf_data['total_pages']} pages")
+        logger.info(
+            f"Processed {file_path}: {len(all_chunks)} chunks from {pdf_data['total_pages']} pages "
+            f"(university: {university or 'national UGC'})"
+        )
         
         return all_chunks
 
@@ -0,0 +1,768 @@
+"""
+Document Storage
+Backends persisting chunk text, metadata and embeddings behind VectorStore
+
+VectorStore keeps every search structure (index segments, ANN graphs, BM25) in
+memory and in the published index files, so a backend only has to store
+chunks, stream their embeddings in blocks when the index is (re)built, and
+return the fields of the few winning ids of each query.
+
+Backends (VECTOR_STORE_BACKEND):
+    mongodb  Chunks in a MongoDB collection (default)
+    sqlite   Chunks in a local SQLite file and embeddings in a float32 NumPy
+             sidecar file next to it (read through np.memmap); needs no
+             server, for edge nodes, CI and MongoDB outages
+"""
+import os
+import re
+import json
+import sqlite3
+import logging
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from bson import Binary, ObjectId
+from pymongo import UpdateOne
+
+from app.config.db import MongoDBConnection
+
+logger = logging.getLogger(__name__)
+
+STORAGE_BACKENDS = ("mongodb", "sqlite")
+DEFAULT_STORAGE_BACKEND = "mongodb"
+
+DEFAULT_STORAGE_DIR = Path(__file__).parent.parent.parent / "data" / "store"
+
+# Documents per embedding block streamed to the index builder and the scan
+DEFAULT_BLOCK_ROWS = 1024
+
+# Ids per "IN (...)" query (below SQLite's bound-parameter limit)
+SQLITE_ID_BATCH = 500
+
+# Chunk fields kept in their own SQLite columns (JSON_COLUMNS hold JSON text)
+SQLITE_COLUMNS = (
+    "text", "source", "page", "university", "chunk_index", "char_count", "metadata", "sources", "minhash"
+)
+JSON_COLUMNS = ("metadata", "sources")
+
+# Fields the SQLite backend can filter on in find_ids()
+SQLITE_FILTER_COLUMNS = ("source", "page", "university", "chunk_index")
+
+
+def get_storage_dir() -> Path:
+    """Directory of the local SQLite store (LOCAL_STORE_DIR overrides the default)"""
+    custom_dir = os.getenv("LOCAL_STORE_DIR")
+    return Path(custom_dir) if custom_dir else DEFAULT_STORAGE_DIR
+
+
+def encode_embedding(vector: np.ndarray, storage: str) -> Any:
+    """
+    Encode an embedding for storage in MongoDB
+    
+    Args:
+        vector: 1-D embedding
+        storage: One of EMBEDDING_STORAGE_MODES
+    
+    Returns:
+        BSON Binary of packed little-endian floats, or a list for "list" mode
+    """
+    if storage == "list":
+        return np.asarray(vector).tolist()
+    return Binary(np.ascontiguousarray(vector, dtype=np.dtype(storage).newbyteorder("<")).tobytes())
+
+
+def encode_embeddings(vectors: np.ndarray, storage: str) -> List[Any]:
+    """
+    encode_embedding() for every row of an (n, d) array
+    
+    The array is converted to the stored dtype once and each row's bytes are
+    sliced from that buffer, instead of converting row by row.
+    """
+    if storage == "list":
+        return np.asarray(vectors).tolist()
+    packed = np.ascontiguousarray(vectors, dtype=np.dtype(storage).newbyteorder("<"))
+    raw, row_bytes = packed.tobytes(), packed.shape[1] * packed.itemsize
+    return [Binary(raw[i * row_bytes:(i + 1) * row_bytes]) for i in range(packed.shape[0])]
+
+
+def decode_embedding(value: Any, dtype: Optional[str] = None) -> Optional[np.ndarray]:
+    """
+    Decode a stored embedding (packed binary or legacy list)
+    
+    Args:
+        value: The stored "embedding" field
+        dtype: The stored "embedding_dtype" field (binary embeddings only)
+    
+    Returns:
+        numpy array, or None if nothing is stored
+    """
+    if value is None:
+        return None
+    if isinstance(value, bytes):
+        return np.frombuffer(value, dtype=np.dtype(dtype or "float32").newbyteorder("<"))
+    return np.asarray(value, dtype=np.float32)
+
+
+class DocumentStorage(ABC):
+    """
+    Interface of the chunk storage behind VectorStore
+    
+    Documents are dicts with the chunk fields written by
+    VectorStore.store_documents ("text", "source", "page", "metadata",
+    "university", "sources", "minhash", ...); embeddings travel separately as
+    float32 matrices.
+    """
+    
+    name = "storage"
+    
+    # Directory for this backend's index files (None: the shared index dir)
+    index_dir: Optional[Path] = None
+    
+    @property
+    @abstractmethod
+    def connected(self) -> bool:
+        pass
+    
+    def ensure_index(self, embedding_dimension: int):
+        """Create backend-side indexes for a new collection (optional)"""
+    
+    @abstractmethod
+    def insert(self, documents: List[Dict[str, Any]], vectors: np.ndarray) -> List[ObjectId]:
+        """
+        Store documents with their embeddings
+        
+        Args:
+            documents: Chunk documents (an "_id" is assigned if missing)
+            vectors: (n, d) float32 embeddings, row i belongs to documents[i]
+        
+        Returns:
+            Ids of the stored documents, in order
+        """
+        pass
+    
+    @abstractmethod
+    def iter_embeddings(
+        self,
+        dimension: Optional[int] = None,
+        university: Optional[str] = None,
+        block_rows: int = DEFAULT_BLOCK_ROWS
+    ) -> Iterator[Tuple[List[ObjectId], np.ndarray, List[Dict[str, Any]]]]:
+        """
+        Stream stored embeddings in insertion order
+        
+        Args:
+            dimension: Only embeddings of this dimension (default: the first one seen)
+            university: Only this university's documents plus national ones
+                        (case-insensitive, like IndexSegment.partition_runs)
+            block_rows: Documents per block
+        
+        Yields:
+            (ids, (n, d) float32 raw embeddings, documents with "university"
+            (if stored) and "source") per block
+        """
+        pass
+    
+    @abstractmethod
+    def fetch(self, ids: List[ObjectId], fields: Iterable[str]) -> Dict[ObjectId, Dict[str, Any]]:
+        """Load the given fields of the given documents (missing ids are left out)"""
+        pass
+    
+    @abstractmethod
+    def add_sources(self, sources_by_id: Dict[ObjectId, List[Dict[str, Any]]]) -> int:
+        """Add {"source", "page"} entries to stored chunks' "sources" lists (set semantics)"""
+        pass
+    
+    @abstractmethod
+    def iter_signatures(self) -> Iterator[Tuple[ObjectId, np.ndarray, Optional[str]]]:
+        """(id, uint32 MinHash signature, university) of every chunk that has one"""
+        pass
+    
+    @abstractmethod
+    def find_ids(self, query_filter: Dict[str, Any]) -> List[ObjectId]:
+        """Ids of the documents matching a MongoDB-style filter"""
+        pass
+    
+    @abstractmethod
+    def delete(self, ids: List[ObjectId]):
+        pass
+    
+    @abstractmethod
+    def pull_source(self, source: str):
+        """Remove a source from the "sources" lists of chunks owned by other documents"""
+        pass
+    
+    @abstractmethod
+    def distinct_sources(self) -> List[str]:
+        pass
+    
+    @abstractmethod
+    def count(self) -> int:
+        pass
+    
+    @abstractmethod
+    def count_by_source(self) -> Dict[str, int]:
+        """Chunks per source file (a collapsed near-duplicate counts for its first source)"""
+        pass
+    
+    def migrate_embeddings(self, storage: str, batch_size: int = 500) -> int:
+        """Rewrite stored embeddings to another EMBEDDING_STORAGE mode"""
+        raise RuntimeError(f"{self.name} storage keeps float32 embeddings only; there is nothing to migrate")
+
+
+class MongoDocumentStorage(DocumentStorage):
+    """Chunks in a MongoDB collection, embeddings packed in the "embedding" field"""
+    
+    name = "MongoDB"
+    
+    def __init__(self, collection_name: str, embedding_storage: str):
+        """
+        Args:
+            collection_name: Name of MongoDB collection to store documents
+            embedding_storage: How new embeddings are written ("float32", "float16" or "list")
+        """
+        self.collection_name = collection_name
+        self.embedding_storage = embedding_storage
+        self.db = None
+        self.collection = None
+        self._connect()
+    
+    def _connect(self):
+        """Connect to MongoDB and get collection"""
+        try:
+            self.db = MongoDBConnection.get_db()
+            if self.db is None:
+                logger.warning("MongoDB not connected. Vector store operations will fail.")
+                return
+            
+            self.collection = self.db[self.collection_name]
+            logger.info(f"Vector store connected to collection: {self.collection_name}")
+        
+        except Exception as e:
+            logger.error(f"Error connecting to MongoDB: {e}", exc_info=True)
+            self.db = None
+            self.collection = None
+    
+    @property
+    def connected(self) -> bool:
+        return self.collection is not None
+    
+    def ensure_index(self, embedding_dimension: int):
+        """
+        Ensure vector search index exists on the collection
+        
+        Args:
+            embedding_dimension: Dimension of embedding vectors
+        """
+        if self.db is None:
+            logger.warning("Cannot create index: MongoDB not connected")
+            return
+        
+        try:
+            # Check if index already exists
+            indexes = self.collection.list_indexes()
+            index_names = [idx['name'] for idx in indexes]
+            
+            if 'vector_index' in index_names:
+                logger.info("Vector index already exists")
+                return
+            
+            # Create vector search index
+            # Note: MongoDB Atlas Vector Search requires specific index configuration
+            # For local MongoDB, we'll use a workaround with cosine similarity calculation
+            
+            # Create a regular index on embedding field for faster queries
+            self.collection.create_index([("embedding", 1)])
+            logger.info("Created index on embedding field")
+            
+            # For MongoDB Atlas, you would create a vector search index like this:
+            # {
+            #   "name": "vector_index",
+            #   "type": "vectorSearch",
+            #   "definition": {
+            #     "fields": [{
+            #       "type": "vector",
+            #       "path": "embedding",
+            #       "numDimensions": embedding_dimension,
+            #       "similarity": "cosine"
+            #     }]
+            #   }
+            # }
+        
+        except Exception as e:
+            logger.warning(f"Could not create vector index: {e}")
+            logger.info("Will use cosine similarity calculation instead")
+    
+    def insert(self, documents: List[Dict[str, Any]], vectors: np.ndarray) -> List[ObjectId]:
+        for doc, embedding in zip(documents, encode_embeddings(vectors, self.embedding_storage)):
+            doc["embedding"] = embedding
+            if self.embedding_storage != "list":
+                doc["embedding_dtype"] = self.embedding_storage
+            if doc.get("minhash") is not None:
+                doc["minhash"] = Binary(np.asarray(doc["minhash"], dtype="<u4").tobytes())
+        result = self.collection.insert_many(documents, ordered=False)  # ordered=False for better performance
+        return result.inserted_ids
+    
+    def iter_embeddings(
+        self,
+        dimension: Optional[int] = None,
+        university: Optional[str] = None,
+        block_rows: int = DEFAULT_BLOCK_ROWS
+    ) -> Iterator[Tuple[List[ObjectId], np.ndarray, List[Dict[str, Any]]]]:
+        query_filter = {
+            "$or": [
+                {"university": {"$regex": f"^{re.escape(university.strip())}$", "$options": "i"}},
+                {"university": None},
+            ]
+        } if university else {}
+        projection = {"embedding": 1, "embedding_dtype": 1, "university": 1, "source": 1}
+        cursor = self.collection.find(query_filter, projection).batch_size(block_rows)
+        
+        # Decode straight into a preallocated block; a full block is handed
+        # out and a fresh one started, so consumers may keep the blocks
+        block = None
+        ids: List[ObjectId] = []
+        docs: List[Dict[str, Any]] = []
+        for doc in cursor:
+            embedding = decode_embedding(doc.pop("embedding", None), doc.pop("embedding_dtype", None))
+            if embedding is None or embedding.shape[0] == 0:
+                continue
+            if dimension is None:
+                dimension = embedding.shape[0]
+            if embedding.shape[0] != dimension:
+                continue
+            if block is None:
+                block = np.empty((block_rows, dimension), dtype=np.float32)
+            block[len(ids)] = embedding
+            ids.append(doc["_id"])
+            docs.append(doc)
+            if len(ids) == block_rows:
+                yield ids, block, docs
+                block, ids, docs = None, [], []
+        if ids:
+            yield ids, block[:len(ids)], docs
+    
+    def fetch(self, ids: List[ObjectId], fields: Iterable[str]) -> Dict[ObjectId, Dict[str, Any]]:
+        if not ids:
+            return {}
+        docs = self.collection.find({"_id": {"$in": list(ids)}}, {field: 1 for field in fields})
+        return {doc["_id"]: doc for doc in docs}
+    
+    def add_sources(self, sources_by_id: Dict[ObjectId, List[Dict[str, Any]]]) -> int:
+        operations = [
+            UpdateOne({"_id": doc_id}, {"$addToSet": {"sources": {"$each": entries}}})
+            for doc_id, entries in sources_by_id.items()
+        ]
+        if operations:
+            self.collection.bulk_write(operations, ordered=False)
+        return len(operations)
+    
+    def iter_signatures(self) -> Iterator[Tuple[ObjectId, np.ndarray, Optional[str]]]:
+        cursor = self.collection.find(
+            {"minhash": {"$exists": True}},
+            {"minhash": 1, "university": 1}
+        ).batch_size(1000)
+        for doc in cursor:
+            yield doc["_id"], np.frombuffer(doc["minhash"], dtype="<u4"), doc.get("university")
+    
+    def find_ids(self, query_filter: Dict[str, Any]) -> List[ObjectId]:
+        return [doc["_id"] for doc in self.collection.find(query_filter, {"_id": 1})]
+    
+    def delete(self, ids: List[ObjectId]):
+        self.collection.delete_many({"_id": {"$in": list(ids)}})
+    
+    def pull_source(self, source: str):
+        self.collection.update_many(
+            {"source": {"$ne": source}, "sources.source": source},
+            {"$pull": {"sources": {"source": source}}}
+        )
+    
+    def distinct_sources(self) -> List[str]:
+        return [source for source in self.collection.distinct("source") if source]
+    
+    def count(self) -> int:
+        return self.collection.count_documents({})
+    
+    def count_by_source(self) -> Dict[str, int]:
+        pipeline = [{"$group": {"_id": "$source", "count": {"$sum": 1}}}]
+        return {str(row["_id"]): row["count"] for row in self.collection.aggregate(pipeline)}
+    
+    def migrate_embeddings(self, storage: str, batch_size: int = 500) -> int:
+        converted = 0
+        operations = []
+        cursor = self.collection.find({}, {"embedding": 1, "embedding_dtype": 1}).batch_size(batch_size)
+        
+        for doc in cursor:
+            value = doc.get("embedding")
+            if value is None:
+                continue
+            current = "list" if isinstance(value, list) else doc.get("embedding_dtype", "float32")
+            if current == storage:
+                continue
+            
+            vector = decode_embedding(value, doc.get("embedding_dtype"))
+            update = {"$set": {"embedding": encode_embedding(vector, storage)}}
+            if storage == "list":
+                update["$unset"] = {"embedding_dtype": ""}
+            else:
+                update["$set"]["embedding_dtype"] = storage
+            operations.append(UpdateOne({"_id": doc["_id"]}, update))
+            
+            if len(operations) >= batch_size:
+                self.collection.bulk_write(operations, ordered=False)
+                converted += len(operations)
+                operations = []
+                logger.info(f"Converted {converted} embeddings to {storage}")
+        
+        if operations:
+            self.collection.bulk_write(operations, ordered=False)
+            converted += len(operations)
+        
+        return converted
+
+
+class SQLiteDocumentStorage(DocumentStorage):
+    """
+    Chunks in a local SQLite file, embeddings in a NumPy sidecar
+    
+    The sidecar ({name}.vectors) is a headerless little-endian float32 matrix;
+    each chunk row records its row number in it, and the dimension and next
+    free row live in the meta table. Writers append the vectors first and then
+    commit the chunk rows and the new row count in one IMMEDIATE transaction,
+    so readers (any process, WAL mode) never see a row whose vector is not
+    fully written. Rows of deleted chunks stay in the sidecar unused.
+    
+    Each thread gets its own connection (sqlite3 connections are not shared
+    across threads).
+    """
+    
+    name = "SQLite"
+    
+    def __init__(self, collection_name: str, directory: Optional[str] = None):
+        """
+        Args:
+            collection_name: Base name of the database and sidecar files
+            directory: Store directory (default: LOCAL_STORE_DIR or data/store)
+        """
+        self.collection_name = collection_name
+        self.directory = Path(directory) if directory else get_storage_dir()
+        self.db_path = self.directory / f"{collection_name}.sqlite3"
+        self.vectors_path = self.directory / f"{collection_name}.vectors"
+        self.index_dir = self.directory / "index"
+        self._local = threading.local()
+        self._ready = False
+        
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._create_schema(self._connection())
+            self._ready = True
+            logger.info(f"Vector store using local SQLite store: {self.db_path}")
+        except (OSError, sqlite3.Error) as e:
+            logger.error(f"Error opening SQLite store {self.db_path}: {e}", exc_info=True)
+    
+    @property
+    def connected(self) -> bool:
+        return self._ready
+    
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode: transactions are opened explicitly
+            conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+    
+    @staticmethod
+    def _create_schema(conn: sqlite3.Connection):
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                id BLOB PRIMARY KEY,
+                row INTEGER NOT NULL,
+                text TEXT,
+                source TEXT,
+                page INTEGER,
+                university TEXT,
+                chunk_index INTEGER,
+                char_count INTEGER,
+                metadata TEXT,
+                sources TEXT,
+                minhash BLOB
+            );
+            CREATE INDEX IF NOT EXISTS chunks_row ON chunks (row);
+            CREATE INDEX IF NOT EXISTS chunks_source ON chunks (source);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER);
+        """)
+    
+    @staticmethod
+    def _get_meta(conn: sqlite3.Connection, key: str) -> Optional[int]:
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+    
+    @staticmethod
+    def _set_meta(conn: sqlite3.Connection, key: str, value: int):
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+    
+    def _map_vectors(self, dimension: int) -> np.ndarray:
+        """Read-only (rows, dimension) view of the sidecar"""
+        row_bytes = dimension * np.dtype("<f4").itemsize
+        rows = self.vectors_path.stat().st_size // row_bytes if self.vectors_path.exists() else 0
+        if rows == 0:
+            return np.empty((0, dimension), dtype=np.float32)
+        return np.memmap(self.vectors_path, dtype="<f4", mode="r", shape=(rows, dimension))
+    
+    @staticmethod
+    def _encode_row(doc: Dict[str, Any]) -> List[Any]:
+        values = []
+        for column in SQLITE_COLUMNS:
+            value = doc.get(column)
+            if column in JSON_COLUMNS:
+                value = json.dumps(value, default=str) if value is not None else None
+            elif column == "minhash" and value is not None:
+                value = np.asarray(value, dtype="<u4").tobytes()
+            values.append(value)
+        return values
+    
+    @staticmethod
+    def _decode_row(doc_id: bytes, columns: Tuple[str, ...], values: Tuple[Any, ...]) -> Dict[str, Any]:
+        doc = {"_id": ObjectId(doc_id)}
+        for column, value in zip(columns, values):
+            if column in JSON_COLUMNS and value is not None:
+                value = json.loads(value)
+            elif column == "minhash" and value is not None:
+                value = np.frombuffer(value, dtype="<u4")
+            if value is not None or column == "university":
+                doc[column] = value
+        return doc
+    
+    def insert(self, documents: List[Dict[str, Any]], vectors: np.ndarray) -> List[ObjectId]:
+        vectors = np.ascontiguousarray(vectors, dtype="<f4")
+        for doc in documents:
+            doc.setdefault("_id", ObjectId())
+        
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            dimension = self._get_meta(conn, "dimension")
+            if dimension is None:
+                dimension = vectors.shape[1]
+                self._set_meta(conn, "dimension", dimension)
+            elif vectors.shape[1] != dimension:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match store dimension {dimension}")
+            start = self._get_meta(conn, "rows") or 0
+            
+            # Vectors first: the rows only become visible with the commit below
+            with open(self.vectors_path, "r+b" if self.vectors_path.exists() else "wb") as f:
+                f.seek(start * vectors.shape[1] * vectors.itemsize)
+                f.write(vectors.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            
+            conn.executemany(
+                f"INSERT INTO chunks (id, row, {', '.join(SQLITE_COLUMNS)}) "
+                f"VALUES (?, ?, {', '.join('?' * len(SQLITE_COLUMNS))})",
+                [
+                    [doc["_id"].binary, start + i] + self._encode_row(doc)
+                    for i, doc in enumerate(documents)
+                ]
+            )
+            self._set_meta(conn, "rows", start + len(documents))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return [doc["_id"] for doc in documents]
+    
+    def iter_embeddings(
+        self,
+        dimension: Optional[int] = None,
+        university: Optional[str] = None,
+        block_rows: int = DEFAULT_BLOCK_ROWS
+    ) -> Iterator[Tuple[List[ObjectId], np.ndarray, List[Dict[str, Any]]]]:
+        conn = self._connection()
+        stored_dimension = self._get_meta(conn, "dimension")
+        if stored_dimension is None or (dimension is not None and dimension != stored_dimension):
+            return
+        
+        query = "SELECT id, row, university, source FROM chunks"
+        params: Tuple[Any, ...] = ()
+        if university:
+            query += " WHERE lower(university) = ? OR university IS NULL"
+            params = (university.strip().lower(),)
+        cursor = conn.execute(query + " ORDER BY row", params)
+        
+        vectors = None
+        while True:
+            batch = cursor.fetchmany(block_rows)
+            if not batch:
+                break
+            if vectors is None:
+                # Mapped after the first fetch so it covers every row of the
+                # read snapshot
+                vectors = self._map_vectors(stored_dimension)
+            rows = np.fromiter((row for _, row, _, _ in batch), dtype=np.int64, count=len(batch))
+            ids = [ObjectId(doc_id) for doc_id, _, _, _ in batch]
+            docs = [
+                {"_id": doc_id, "university": university_name, "source": source}
+                for doc_id, (_, _, university_name, source) in zip(ids, batch)
+            ]
+            yield ids, np.asarray(vectors[rows], dtype=np.float32), docs
+    
+    def fetch(self, ids: List[ObjectId], fields: Iterable[str]) -> Dict[ObjectId, Dict[str, Any]]:
+        columns = tuple(field for field in fields if field in SQLITE_COLUMNS)
+        select = ", ".join(("id",) + columns)
+        conn = self._connection()
+        
+        docs = {}
+        ids = list(ids)
+        for start in range(0, len(ids), SQLITE_ID_BATCH):
+            batch = [doc_id.binary for doc_id in ids[start:start + SQLITE_ID_BATCH]]
+            cursor = conn.execute(
+                f"SELECT {select} FROM chunks WHERE id IN ({', '.join('?' * len(batch))})",
+                batch
+            )
+            for row in cursor:
+                doc = self._decode_row(row[0], columns, row[1:])
+                docs[doc["_id"]] = doc
+        return docs
+    
+    def add_sources(self, sources_by_id: Dict[ObjectId, List[Dict[str, Any]]]) -> int:
+        conn = self._connection()
+        updated = 0
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for doc_id, entries in sources_by_id.items():
+                row = conn.execute("SELECT sources FROM chunks WHERE id = ?", (doc_id.binary,)).fetchone()
+                if row is None:
+                    continue
+                sources = json.loads(row[0]) if row[0] else []
+                for entry in entries:
+                    if entry not in sources:
+                        sources.append(entry)
+                conn.execute("UPDATE chunks SET sources = ? WHERE id = ?", (json.dumps(sources), doc_id.binary))
+                updated += 1
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return updated
+    
+    def iter_signatures(self) -> Iterator[Tuple[ObjectId, np.ndarray, Optional[str]]]:
+        cursor = self._connection().execute(
+            "SELECT id, minhash, university FROM chunks WHERE minhash IS NOT NULL ORDER BY row"
+        )
+        for doc_id, minhash, university in cursor:
+            yield ObjectId(doc_id), np.frombuffer(minhash, dtype="<u4"), university
+    
+    @staticmethod
+    def _where(query_filter: Dict[str, Any]) -> Tuple[str, List[Any]]:
+        """
+        Translate the equality, $in and $ne filters VectorStore uses into SQL
+        
+        Raises:
+            ValueError: For fields or operators the SQLite backend does not index
+        """
+        clauses = []
+        params: List[Any] = []
+        for field, condition in query_filter.items():
+            if field == "_id":
+                column, convert = "id", (lambda value: value.binary if isinstance(value, ObjectId) else value)
+            elif field in SQLITE_FILTER_COLUMNS:
+                column, convert = field, (lambda value: value)
+            else:
+                raise ValueError(f"Unsupported filter field for SQLite storage: {field}")
+            
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for operator, value in condition.items():
+                if operator in ("$eq", "$ne"):
+                    if value is None:
+                        clauses.append(f"{column} IS {'NOT ' if operator == '$ne' else ''}NULL")
+                    else:
+                        clauses.append(f"{column} {'=' if operator == '$eq' else '!='} ?")
+                        params.append(convert(value))
+                elif operator == "$in":
+                    values = [convert(v) for v in value if v is not None]
+                    alternatives = [f"{column} IN ({', '.join('?' * len(values))})"] if values else []
+                    if len(values) < len(value):
+                        alternatives.append(f"{column} IS NULL")
+                    clauses.append(f"({' OR '.join(alternatives) or '0'})")
+                    params.extend(values)
+                else:
+                    raise ValueError(f"Unsupported filter operator for SQLite storage: {operator}")
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+    
+    def find_ids(self, query_filter: Dict[str, Any]) -> List[ObjectId]:
+        where, params = self._where(query_filter)
+        cursor = self._connection().execute(f"SELECT id FROM chunks{where}", params)
+        return [ObjectId(doc_id) for doc_id, in cursor]
+    
+    def delete(self, ids: List[ObjectId]):
+        conn = self._connection()
+        ids = [doc_id.binary for doc_id in ids]
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for start in range(0, len(ids), SQLITE_ID_BATCH):
+                batch = ids[start:start + SQLITE_ID_BATCH]
+                conn.execute(f"DELETE FROM chunks WHERE id IN ({', '.join('?' * len(batch))})", batch)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    
+    def pull_source(self, source: str):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # instr() narrows the candidates; the JSON is checked exactly below
+            cursor = conn.execute(
+                "SELECT id, sources FROM chunks WHERE source != ? AND instr(sources, ?) > 0",
+                (source, json.dumps(source))
+            )
+            for doc_id, raw in cursor.fetchall():
+                sources = json.loads(raw)
+                kept = [entry for entry in sources if entry.get("source") != source]
+                if len(kept) < len(sources):
+                    conn.execute("UPDATE chunks SET sources = ? WHERE id = ?", (json.dumps(kept), doc_id))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    
+    def distinct_sources(self) -> List[str]:
+        cursor = self._connection().execute("SELECT DISTINCT source FROM chunks WHERE source IS NOT NULL")
+        return [source for source, in cursor if source]
+    
+    def count(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+    
+    def count_by_source(self) -> Dict[str, int]:
+        cursor = self._connection().execute("SELECT source, COUNT(*) FROM chunks GROUP BY source")
+        return {str(source): count for source, count in cursor}
+
+
+def create_storage(
+    backend: Optional[str],
+    collection_name: str,
+    embedding_storage: str
+) -> DocumentStorage:
+    """
+    Build the storage backend for a VectorStore
+    
+    Args:
+        backend: "mongodb" or "sqlite" (default: VECTOR_STORE_BACKEND or mongodb)
+        collection_name: Collection (MongoDB) or file base name (SQLite)
+        embedding_storage: MongoDB embedding encoding
+    
+    Raises:
+        ValueError: For an unknown backend
+    """
+    backend = (backend or os.getenv("VECTOR_STORE_BACKEND", DEFAULT_STORAGE_BACKEND)).lower()
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"Unsupported vector store backend: {backend}. Use one of {STORAGE_BACKENDS}")
+    if backend == "sqlite":
+        return SQLiteDocumentStorage(collection_name)
+    return MongoDocumentStorage(collection_name, embedding_storage)
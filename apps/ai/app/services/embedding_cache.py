@@ -0,0 +1,170 @@
+"""
+Embedding Cache
+Content-addressed on-disk cache of chunk embeddings
+
+Re-running the ingestion script over an unchanged docs folder produces the
+same chunk texts, so their embeddings are looked up by (model name,
+sha256(text)) in a local SQLite file instead of being encoded again. Vectors
+are stored as little-endian float32 blobs. The file is safe to share between
+processes (WAL mode) and can be deleted at any time to start over.
+"""
+import os
+import sqlite3
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = Path(__file__).parent.parent.parent / "data" / "cache" / "embeddings.sqlite3"
+
+# Digests per "IN (...)" query (below SQLite's bound-parameter limit)
+LOOKUP_BATCH = 500
+
+_FLOAT32_LE = np.dtype("<f4")
+
+
+def get_cache_path() -> Optional[Path]:
+    """
+    Embedding cache file (EMBEDDING_CACHE_PATH overrides the default)
+    
+    Returns:
+        None when EMBEDDING_CACHE is "off"
+    """
+    if os.getenv("EMBEDDING_CACHE", "on").lower() in ("off", "0", "false", "no"):
+        return None
+    custom_path = os.getenv("EMBEDDING_CACHE_PATH")
+    return Path(custom_path) if custom_path else DEFAULT_CACHE_PATH
+
+
+def text_digest(text: str) -> bytes:
+    """sha256 of a chunk text, the cache key next to the model name"""
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """
+    (model, text digest) -> float32 vector store in SQLite
+    
+    Each thread gets its own connection (sqlite3 connections are not shared
+    across threads). Errors are logged and treated as misses, so a broken
+    cache file only costs the encoding time it would have saved.
+    """
+    
+    def __init__(self, path: Path):
+        """
+        Args:
+            path: SQLite file (created with its directory if missing)
+        """
+        self.path = Path(path)
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection().executescript("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                digest BLOB NOT NULL,
+                vector BLOB NOT NULL,
+                PRIMARY KEY (model, digest)
+            ) WITHOUT ROWID;
+        """)
+    
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode: transactions are opened explicitly
+            conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+    
+    def get_many(self, model_name: str, texts: List[str], dimension: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Cached embeddings of texts
+        
+        Args:
+            model_name: Model the embeddings were computed with
+            texts: Texts to look up
+            dimension: Expected dimension; other cached vectors count as misses
+        
+        Returns:
+            (positions in texts of the hits, read-only (hits, dimension) float32 embeddings)
+        """
+        positions: Dict[bytes, List[int]] = {}
+        for position, text in enumerate(texts):
+            positions.setdefault(text_digest(text), []).append(position)
+        
+        row_bytes = dimension * _FLOAT32_LE.itemsize
+        found: List[int] = []
+        blobs: List[bytes] = []
+        digests = list(positions)
+        try:
+            conn = self._connection()
+            for start in range(0, len(digests), LOOKUP_BATCH):
+                batch = digests[start:start + LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT digest, vector FROM embeddings WHERE model = ? AND digest IN ({placeholders})",
+                    [model_name, *batch]
+                )
+                for digest, blob in rows:
+                    if len(blob) != row_bytes:
+                        continue
+                    for position in positions[bytes(digest)]:
+                        found.append(position)
+                        blobs.append(blob)
+        except sqlite3.Error as e:
+            logger.warning(f"Embedding cache lookup failed ({self.path}): {e}")
+            found, blobs = [], []
+        
+        self.hits += len(found)
+        self.misses += len(texts) - len(found)
+        # One buffer for all hits instead of an array per row
+        vectors = np.frombuffer(b"".join(blobs), dtype=_FLOAT32_LE).reshape(len(found), dimension)
+        return np.array(found, dtype=np.int64), vectors.astype(np.float32, copy=False)
+    
+    def put_many(self, model_name: str, texts: List[str], vectors: np.ndarray):
+        """Store embeddings of texts (rows of a (len(texts), d) array, in order)"""
+        packed = np.ascontiguousarray(vectors, dtype=_FLOAT32_LE)
+        rows = [
+            (model_name, text_digest(text), packed[i].tobytes())
+            for i, text in enumerate(texts)
+        ]
+        if not rows:
+            return
+        conn = self._connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany("INSERT OR REPLACE INTO embeddings (model, digest, vector) VALUES (?, ?, ?)", rows)
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            logger.warning(f"Embedding cache write failed ({self.path}): {e}")
+
+
+_caches: Dict[Path, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Shared cache for the configured path, or None if disabled or unavailable"""
+    path = get_cache_path()
+    if path is None:
+        return None
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            try:
+                cache = _caches[path] = EmbeddingCache(path)
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"Embedding cache unavailable ({path}): {e}")
+                return None
+        return cache
@@ -1,12 +1,24 @@
 """
 Embedding Service
 Generates vector embeddings for text chunks using sentence-transformers
+
+Models are loaded once per process through MODEL_REGISTRY and shared by every
+EmbeddingService, so building a service (e.g. a search tool per chat request)
+never reloads a transformer. EMBEDDING_BACKEND picks how models run: PyTorch
+("torch", default) or an exported ONNX graph ("onnx", "onnx-int8"; see
+onnx_embedding).
 """
 import os
+import time
+import functools
 import logging
-from typing import List, Union, Optional
+import threading
+from typing import Any, Callable, Dict, List, Set, Union, Optional
 import numpy as np
 
+from app.services.embedding_cache import get_embedding_cache
+from app.services.onnx_embedding import OnnxEncoder, get_embedding_backend, load_onnx_model
+
 try:
     from sentence_transformers import SentenceTransformer
     SENTENCE_TRANSFORMERS_AVAILABLE = True
@@ -16,6 +28,169 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Padded tokens per encoder batch (rows x longest text in the batch); 32 texts
+# at the 256-token limit, so long chunks batch as before and short ones
+# batch wider
+DEFAULT_TOKEN_BUDGET = 8192
+DEFAULT_MAX_BATCH_SIZE = 256
+
+
+def length_batches(lengths: np.ndarray, token_budget: int, max_batch: int) -> List[np.ndarray]:
+    """
+    Group positions into batches of similar token length
+    
+    Positions are sorted longest first and cut into consecutive runs whose
+    padded size (rows x the run's first, longest length) fits token_budget,
+    so little compute goes to padding.
+    
+    Args:
+        lengths: Tokens per text
+        token_budget: Padded tokens allowed per batch
+        max_batch: Texts allowed per batch
+    
+    Returns:
+        Arrays of positions, one per batch
+    """
+    order = np.argsort(-np.asarray(lengths), kind="stable")
+    batches = []
+    start = 0
+    while start < len(order):
+        longest = max(int(lengths[order[start]]), 1)
+        size = max(1, min(max_batch, token_budget // longest))
+        batches.append(order[start:start + size])
+        start += size
+    return batches
+
+
+class LoadedModel:
+    """A loaded model with what it cost to load"""
+    
+    def __init__(
+        self,
+        name: str,
+        model: Any,
+        dimension: int,
+        load_seconds: float,
+        parameter_bytes: int,
+        backend: str = "torch"
+    ):
+        self.name = name
+        self.model = model
+        self.dimension = dimension
+        self.load_seconds = load_seconds
+        self.parameter_bytes = parameter_bytes
+        self.backend = backend
+
+
+class ModelRegistry:
+    """
+    Process-wide, thread-safe cache of loaded embedding models by name
+    
+    The first caller for a name loads the model while concurrent callers for
+    the same name wait for it; other names load independently. Models run on
+    the backend configured at startup (EMBEDDING_BACKEND).
+    """
+    
+    def __init__(self):
+        self._models: Dict[str, LoadedModel] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._background: Set[str] = set()
+    
+    def get(self, model_name: str) -> LoadedModel:
+        """
+        Loaded model for a name, loading it on first use
+        
+        Raises:
+            ImportError: If sentence-transformers is not installed
+        """
+        loaded = self._models.get(model_name)
+        if loaded is not None:
+            return loaded
+        
+        with self._lock:
+            lock = self._locks.setdefault(model_name, threading.Lock())
+        with lock:
+            loaded = self._models.get(model_name)
+            if loaded is None:
+                loaded = self._models[model_name] = self._load(model_name, get_embedding_backend())
+        return loaded
+    
+    @staticmethod
+    def _load(model_name: str, backend: str) -> LoadedModel:
+        """Load a model on a backend and measure it"""
+        logger.info(f"Loading embedding model: {model_name} ({backend})")
+        started = time.perf_counter()
+        model = None
+        if backend != "torch":
+            try:
+                model = load_onnx_model(model_name, backend)
+            except Exception as e:
+                if not SENTENCE_TRANSFORMERS_AVAILABLE:
+                    raise
+                logger.warning(f"ONNX backend unavailable for {model_name}, falling back to torch: {e}")
+                backend = "torch"
+        
+        if model is None:
+            if not SENTENCE_TRANSFORMERS_AVAILABLE:
+                raise ImportError(
+                    "sentence-transformers is required. "
+                    "Install with: pip install sentence-transformers"
+                )
+            model = SentenceTransformer(model_name)
+        
+        # Get embedding dimension
+        test_embedding = model.encode("test", convert_to_numpy=True)
+        load_seconds = time.perf_counter() - started
+        if isinstance(model, OnnxEncoder):
+            parameter_bytes = model.model_bytes
+        else:
+            parameter_bytes = sum(p.numel() * p.element_size() for p in model.parameters())
+        
+        logger.info(
+            f"Embedding model {model_name} loaded in {load_seconds:.2f}s on {backend} "
+            f"(dimension {len(test_embedding)}, {parameter_bytes / 1e6:.1f} MB of parameters)"
+        )
+        return LoadedModel(model_name, model, len(test_embedding), load_seconds, parameter_bytes, backend)
+    
+    def is_loaded(self, model_name: str) -> bool:
+        return model_name in self._models
+    
+    def load_in_background(self, model_name: str):
+        """Load a model in a daemon thread (once per name; no-op if already loaded)"""
+        with self._lock:
+            if model_name in self._models or model_name in self._background:
+                return
+            self._background.add(model_name)
+        
+        def load():
+            try:
+                self.get(model_name)
+            except Exception as e:
+                logger.warning(f"Background load of embedding model {model_name} failed: {e}")
+        
+        threading.Thread(target=load, name=f"load-{model_name}", daemon=True).start()
+    
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Backend, dimension, load time and parameter memory per loaded model"""
+        stats = {}
+        for name, loaded in list(self._models.items()):
+            stats[name] = {
+                "backend": loaded.backend,
+                "dimension": loaded.dimension,
+                "load_seconds": round(loaded.load_seconds, 3),
+                "parameter_bytes": loaded.parameter_bytes,
+            }
+            if isinstance(loaded.model, OnnxEncoder):
+                stats[name]["parity_min_cosine"] = loaded.model.parity
+        return stats
+
+
+# Shared by every EmbeddingService in the process
+MODEL_REGISTRY = ModelRegistry()
+
 
 class EmbeddingService:
     """
@@ -23,51 +198,46 @@ class EmbeddingService:
     Uses all-MiniLM-L6-v2 model (384 dimensions, fast and efficient)
     """
     
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME):
         """
         Initialize embedding service
         
         Args:
             model_name: Name of the sentence-transformers model to use
                         Default: all-MiniLM-L6-v2 (384 dimensions)
-        """
-        if not SENTENCE_TRANSFORMERS_AVAILABLE:
-            raise ImportError(
-                "sentence-transformers is required. "
-                "Install with: pip install sentence-transformers"
-            )
         
+        Raises:
+            ImportError: If neither sentence-transformers nor an exported ONNX
+                         model for the configured backend is available
+        """
         self.model_name = model_name
         self.model = None
         self.embedding_dimension = None
+        self.backend = None
         self._load_model()
     
     def _load_model(self):
-        """Load the sentence-transformers model"""
+        """Get the model from the process-wide registry"""
         try:
-            logger.info(f"Loading embedding model: {self.model_name}")
-            self.model = SentenceTransformer(self.model_name)
-            
-            # Get embedding dimension
-            test_embedding = self.model.encode("test", convert_to_numpy=True)
-            self.embedding_dimension = len(test_embedding)
-            
-            logger.info(f"Embedding model loaded. Dimension: {self.embedding_dimension}")
+            loaded = MODEL_REGISTRY.get(self.model_name)
+            self.model = loaded.model
+            self.embedding_dimension = loaded.dimension
+            self.backend = loaded.backend
             
         except Exception as e:
             logger.error(f"Error loading embedding model: {e}", exc_info=True)
             raise
     
-    def generate_embeddings(self, text: Union[str, List[str]], batch_size: int = 32) -> Union[np.ndarray, List[np.ndarray]]:
+    def generate_embeddings(self, text: Union[str, List[str]], batch_size: Optional[int] = None) -> np.ndarray:
         """
         Generate embeddings for text or list of texts
         
         Args:
             text: Single text string or list of text strings
-            batch_size: Batch size for processing multiple texts
+            batch_size: Maximum texts per batch for multiple texts (see batch_embed)
             
         Returns:
-            numpy array (single text) or list of numpy arrays (multiple texts)
+            1-D array (single text) or (len(text), dimension) float32 array (multiple texts)
         """
         if self.model is None:
             raise RuntimeError("Embedding model not loaded")
@@ -93,38 +263,114 @@ class EmbeddingService:
         else:
             raise TypeError(f"Expected str or List[str], got {type(text)}")
     
-    def batch_embed(self, texts: List[str], batch_size: int = 32) -> List[np.ndarray]:
+    def _token_lengths(self, texts: List[str]) -> np.ndarray:
+        """Tokens per text as the model will see them (special tokens included, truncated)"""
+        tokenizer = getattr(self.model, "tokenizer", None)
+        if tokenizer is None:
+            # About four characters per token
+            return np.array([len(text) // 4 + 2 for text in texts], dtype=np.int64)
+        
+        max_seq_length = getattr(self.model, "max_seq_length", None)
+        input_ids = tokenizer(
+            texts,
+            add_special_tokens=True,
+            truncation=bool(max_seq_length),
+            max_length=max_seq_length,
+            return_attention_mask=False,
+            return_token_type_ids=False
+        )["input_ids"]
+        return np.array([len(ids) for ids in input_ids], dtype=np.int64)
+    
+    def _encode_length_batched(
+        self,
+        texts: List[str],
+        positions: np.ndarray,
+        out: np.ndarray,
+        max_batch: int,
+        token_budget: int,
+        on_batch: Optional[Callable[[List[str], np.ndarray], None]] = None
+    ):
+        """
+        Encode texts[positions] into out[positions] in length-homogeneous
+        batches sized by a token budget
+        
+        Args:
+            on_batch: Called with each batch's texts and embeddings (e.g. to cache them)
+        """
+        batches = length_batches(self._token_lengths([texts[i] for i in positions]), token_budget, max_batch)
+        for batch in batches:
+            rows = positions[batch]
+            batch_texts = [texts[i] for i in rows]
+            embeddings = self.model.encode(
+                batch_texts,
+                batch_size=len(batch),
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=False
+            )
+            out[rows] = embeddings
+            if on_batch is not None:
+                on_batch(batch_texts, embeddings)
+        logger.debug(f"Encoded {len(positions)} texts in {len(batches)} length-bucketed batches")
+    
+    def batch_embed(
+        self,
+        texts: List[str],
+        batch_size: Optional[int] = None,
+        use_cache: bool = True,
+        token_budget: Optional[int] = None
+    ) -> np.ndarray:
         """
         Generate embeddings for multiple texts efficiently
         
+        Texts already encoded by this model (in any earlier run) are read from
+        the on-disk embedding cache; only the misses are encoded and cached.
+        Misses are sorted by token length and encoded in batches of similar
+        length, each as large as the token budget allows, so short headings
+        are not padded to the length of long paragraphs. Every embedding is
+        written straight into one preallocated matrix.
+        
         Args:
             texts: List of text strings
-            batch_size: Number of texts to process at once
+            batch_size: Maximum texts per batch (default: EMBEDDING_MAX_BATCH_SIZE or 256)
+            use_cache: Consult the embedding cache (see embedding_cache)
+            token_budget: Padded tokens per batch (default: EMBEDDING_TOKEN_BUDGET or 8192)
             
         Returns:
-            List of numpy arrays (embeddings)
+            C-contiguous (len(texts), dimension) float32 array, row i for texts[i]
         """
         if self.model is None:
             raise RuntimeError("Embedding model not loaded")
         
+        embeddings = np.empty((len(texts), self.embedding_dimension), dtype=np.float32)
         if not texts:
-            return []
+            return embeddings
         
         try:
-            # Encode all texts in batches
-            embeddings = self.model.encode(
-                texts,
-                batch_size=batch_size,
-                convert_to_numpy=True,
-                normalize_embeddings=True,
-                show_progress_bar=len(texts) > 100  # Show progress for large batches
-            )
+            cache = get_embedding_cache() if use_cache else None
+            # ONNX backends cache separately: their vectors differ slightly from torch's
+            cache_key = self.model_name if self.backend == "torch" else f"{self.model_name}:{self.backend}"
+            missing = np.arange(len(texts))
+            cached = 0
+            if cache:
+                hit_positions, hit_vectors = cache.get_many(cache_key, texts, self.embedding_dimension)
+                embeddings[hit_positions] = hit_vectors
+                missing = np.setdiff1d(missing, hit_positions, assume_unique=True)
+                cached = len(hit_positions)
             
-            # Convert to list of arrays
-            embeddings_list = [embeddings[i] for i in range(len(embeddings))]
+            if len(missing):
+                # Encode the uncached texts in length-bucketed batches
+                self._encode_length_batched(
+                    texts,
+                    missing,
+                    embeddings,
+                    batch_size or int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", DEFAULT_MAX_BATCH_SIZE)),
+                    token_budget or int(os.getenv("EMBEDDING_TOKEN_BUDGET", DEFAULT_TOKEN_BUDGET)),
+                    on_batch=functools.partial(cache.put_many, cache_key) if cache else None
+                )
             
-            logger.info(f"Generated {len(embeddings_list)} embeddings")
-            return embeddings_list
+            logger.info(f"Generated {len(texts)} embeddings ({cached} from cache)")
+            return embeddings
             
         except Exception as e:
             logger.error(f"Error in batch embedding: {e}", exc_info=True)
@@ -152,4 +398,50 @@ class EmbeddingService:
             numpy array embedding
         """
         return self.generate_embeddings(query)
+    
+    def encode_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Encode several search queries in as few model calls as the batch
+        limits allow (same token budget and batch cap as batch_embed)
+        
+        Args:
+            queries: Search query texts
+        
+        Returns:
+            (len(queries), dimension) numpy array, one normalized row per query
+        """
+        if self.model is None:
+            raise RuntimeError("Embedding model not loaded")
+        
+        embeddings = np.empty((len(queries), self.embedding_dimension), dtype=np.float32)
+        if not queries:
+            return embeddings
+        
+        self._encode_length_batched(
+            queries,
+            np.arange(len(queries)),
+            embeddings,
+            int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", DEFAULT_MAX_BATCH_SIZE)),
+            int(os.getenv("EMBEDDING_TOKEN_BUDGET", DEFAULT_TOKEN_BUDGET))
+        )
+        return embeddings
+
 
+_services: Dict[str, EmbeddingService] = {}
+_services_lock = threading.Lock()
+
+
+def get_embedding_service(model_name: str = DEFAULT_MODEL_NAME) -> EmbeddingService:
+    """
+    Shared EmbeddingService for a model, for routes, tools and scripts
+    
+    Raises:
+        ImportError: If sentence-transformers is not installed
+    """
+    service = _services.get(model_name)
+    if service is None:
+        # The registry loads the model once even if several callers get here
+        service = EmbeddingService(model_name)
+        with _services_lock:
+            service = _services.setdefault(model_name, service)
+    return service
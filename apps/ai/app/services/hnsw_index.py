@@ -0,0 +1,292 @@
+"""
+HNSW Index
+Hierarchical Navigable Small World graph for approximate vector search
+
+Pure Python/NumPy implementation (Malkov & Yashunin). Nodes are row numbers of
+an external embedding matrix, so the graph never copies vectors: callers pass
+the matrix to add() and search(). Rows must be L2-normalized; similarity is
+the dot product.
+"""
+import math
+import heapq
+import random
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_M = 16
+DEFAULT_EF_CONSTRUCTION = 100
+DEFAULT_EF_SEARCH = 64
+
+
+class HNSWIndex:
+    """
+    HNSW graph over the rows of an embedding matrix
+    
+    Layer 0 adjacency is a dense (n, 2*M) int32 array padded with -1; the much
+    smaller upper layers are dicts of node -> neighbour list. Inserts are
+    incremental, so adding one handbook only links the new rows.
+    """
+    
+    SECTION_NAMES = ("hnsw_meta", "hnsw_levels", "hnsw_layer0", "hnsw_upper")
+    
+    def __init__(self, M: int = DEFAULT_M, ef_construction: int = DEFAULT_EF_CONSTRUCTION, seed: int = 0):
+        """
+        Initialize an empty graph
+        
+        Args:
+            M: Neighbours per node on upper layers (2*M on layer 0)
+            ef_construction: Candidate list size while inserting
+            seed: Random seed for level assignment
+        """
+        self.M = M
+        self.M0 = 2 * M
+        self.ef_construction = ef_construction
+        self.level_mult = 1.0 / math.log(M)
+        self.rng = random.Random(seed)
+        
+        self.count = 0
+        self.levels = np.zeros(0, dtype=np.int8)
+        self.layer0 = np.full((0, self.M0), -1, dtype=np.int32)
+        self.upper: List[Dict[int, List[int]]] = []
+        self.entry_point = -1
+        self.max_level = -1
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    def _grow(self, needed: int):
+        """Ensure capacity for `needed` nodes (doubling, copies mapped arrays)"""
+        capacity = self.layer0.shape[0]
+        if needed <= capacity and self.layer0.flags.writeable:
+            return
+        new_capacity = max(needed, 2 * capacity, 1024)
+        levels = np.zeros(new_capacity, dtype=np.int8)
+        levels[:self.count] = self.levels[:self.count]
+        layer0 = np.full((new_capacity, self.M0), -1, dtype=np.int32)
+        layer0[:self.count] = self.layer0[:self.count]
+        self.levels = levels
+        self.layer0 = layer0
+    
+    def _neighbors(self, node: int, level: int) -> np.ndarray:
+        if level == 0:
+            row = self.layer0[node]
+            return row[row >= 0]
+        return np.asarray(self.upper[level - 1].get(node, ()), dtype=np.int64)
+    
+    def _set_neighbors(self, node: int, level: int, neighbors: List[int]):
+        if level == 0:
+            self.layer0[node] = -1
+            self.layer0[node, :len(neighbors)] = neighbors
+        else:
+            self.upper[level - 1][node] = list(neighbors)
+    
+    def _search_layer(
+        self,
+        vectors: np.ndarray,
+        query: np.ndarray,
+        entry_points: List[int],
+        ef: int,
+        level: int
+    ) -> List[Tuple[float, int]]:
+        """
+        Greedy beam search on one layer
+        
+        Returns:
+            Up to ef (similarity, node) pairs, best first
+        """
+        visited = np.zeros(self.count, dtype=bool)
+        visited[entry_points] = True
+        entry_sims = np.asarray(vectors[entry_points], dtype=np.float32) @ query
+        candidates = [(-float(s), n) for s, n in zip(entry_sims, entry_points)]
+        results = [(float(s), n) for s, n in zip(entry_sims, entry_points)]
+        heapq.heapify(candidates)
+        heapq.heapify(results)
+        while len(results) > ef:
+            heapq.heappop(results)
+        
+        while candidates:
+            neg_sim, node = heapq.heappop(candidates)
+            full = len(results) >= ef
+            if full and -neg_sim < results[0][0]:
+                break
+            
+            neighbors = self._neighbors(node, level)
+            neighbors = neighbors[~visited[neighbors]]
+            if neighbors.size == 0:
+                continue
+            visited[neighbors] = True
+            
+            sims = np.asarray(vectors[neighbors], dtype=np.float32) @ query
+            if full:
+                # Only neighbours beating the current worst result can enter
+                better = sims > results[0][0]
+                neighbors, sims = neighbors[better], sims[better]
+            
+            for sim, neighbor in zip(sims.tolist(), neighbors.tolist()):
+                if len(results) < ef or sim > results[0][0]:
+                    heapq.heappush(candidates, (-sim, neighbor))
+                    heapq.heappush(results, (sim, neighbor))
+                    if len(results) > ef:
+                        heapq.heappop(results)
+        
+        return sorted(results, reverse=True)
+    
+    def _select_neighbors(self, vectors: np.ndarray, candidates: List[Tuple[float, int]], m: int) -> List[int]:
+        """
+        Neighbour selection heuristic (keeps diverse directions)
+        
+        A candidate is skipped when it is closer to an already selected
+        neighbour than to the base point; skipped candidates back-fill the
+        list if fewer than m survive.
+        
+        Args:
+            candidates: (similarity to base, node) pairs, best first
+            m: Maximum neighbours to keep
+        """
+        if len(candidates) <= m:
+            return [node for _, node in candidates]
+        
+        nodes = [node for _, node in candidates]
+        sims_to_base = np.array([sim for sim, _ in candidates], dtype=np.float32)
+        block = np.asarray(vectors[nodes], dtype=np.float32)
+        pairwise = block @ block.T
+        
+        selected: List[int] = []
+        pruned: List[int] = []
+        for i in range(len(nodes)):
+            if len(selected) >= m:
+                break
+            if selected and pairwise[i, selected].max() > sims_to_base[i]:
+                pruned.append(i)
+            else:
+                selected.append(i)
+        for i in pruned:
+            if len(selected) >= m:
+                break
+            selected.append(i)
+        return [nodes[i] for i in selected]
+    
+    def _insert(self, vectors: np.ndarray, node: int):
+        query = np.asarray(vectors[node], dtype=np.float32)
+        level = int(-math.log(1.0 - self.rng.random()) * self.level_mult)
+        
+        self._grow(node + 1)
+        self.levels[node] = level
+        self.count = node + 1
+        while len(self.upper) < level:
+            self.upper.append({})
+        
+        if self.entry_point < 0:
+            self.entry_point = node
+            self.max_level = level
+            return
+        
+        entry = [self.entry_point]
+        for lc in range(self.max_level, level, -1):
+            entry = [self._search_layer(vectors, query, entry, 1, lc)[0][1]]
+        
+        for lc in range(min(level, self.max_level), -1, -1):
+            found = self._search_layer(vectors, query, entry, self.ef_construction, lc)
+            max_neighbors = self.M0 if lc == 0 else self.M
+            neighbors = self._select_neighbors(vectors, found, self.M)
+            self._set_neighbors(node, lc, neighbors)
+            
+            # Link back, pruning any list that overflows
+            for neighbor in neighbors:
+                existing = self._neighbors(neighbor, lc).tolist()
+                if len(existing) < max_neighbors:
+                    self._set_neighbors(neighbor, lc, existing + [node])
+                    continue
+                pool = existing + [node]
+                base = np.asarray(vectors[neighbor], dtype=np.float32)
+                sims = np.asarray(vectors[pool], dtype=np.float32) @ base
+                ranked = sorted(zip(sims.tolist(), pool), reverse=True)
+                self._set_neighbors(neighbor, lc, self._select_neighbors(vectors, ranked, max_neighbors))
+            
+            entry = [n for _, n in found]
+        
+        if level > self.max_level:
+            self.entry_point = node
+            self.max_level = level
+    
+    def add(self, vectors: np.ndarray):
+        """
+        Insert every row of `vectors` not yet in the graph
+        
+        Args:
+            vectors: (n, d) normalized matrix whose first len(self) rows are
+                     already indexed
+        """
+        start = self.count
+        for node in range(start, vectors.shape[0]):
+            self._insert(vectors, node)
+        if vectors.shape[0] > start:
+            logger.info(f"HNSW index: inserted {vectors.shape[0] - start} nodes ({self.count} total)")
+    
+    def search(self, vectors: np.ndarray, query: np.ndarray, k: int, ef_search: int = DEFAULT_EF_SEARCH):
+        """
+        Approximate top-k search
+        
+        Args:
+            vectors: The (n, d) rows this graph was built on
+            query: Normalized query vector
+            k: Number of results
+            ef_search: Candidate list size (higher is slower and more accurate)
+        
+        Returns:
+            (rows, scores) best first
+        """
+        if self.count == 0 or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        
+        query = np.asarray(query, dtype=np.float32)
+        entry = [self.entry_point]
+        for lc in range(self.max_level, 0, -1):
+            entry = [self._search_layer(vectors, query, entry, 1, lc)[0][1]]
+        
+        found = self._search_layer(vectors, query, entry, max(ef_search, k), 0)[:k]
+        rows = np.array([node for _, node in found], dtype=np.int64)
+        scores = np.array([sim for sim, _ in found], dtype=np.float32)
+        return rows, scores
+    
+    def to_sections(self) -> Dict[str, np.ndarray]:
+        """Arrays to persist in the index file"""
+        upper_rows = []
+        for level, layer in enumerate(self.upper, start=1):
+            for node, neighbors in layer.items():
+                row = [node, level] + list(neighbors) + [-1] * (self.M - len(neighbors))
+                upper_rows.append(row)
+        
+        return {
+            "hnsw_meta": np.array(
+                [self.entry_point, self.max_level, self.M, self.ef_construction, self.count],
+                dtype=np.int64
+            ),
+            "hnsw_levels": self.levels[:self.count],
+            "hnsw_layer0": self.layer0[:self.count],
+            "hnsw_upper": np.array(upper_rows, dtype=np.int32).reshape(-1, 2 + self.M),
+        }
+    
+    @classmethod
+    def from_sections(cls, sections: Dict[str, np.ndarray]) -> Optional["HNSWIndex"]:
+        """Rebuild from index file sections, or None if the file has no HNSW graph"""
+        if not all(name in sections for name in cls.SECTION_NAMES):
+            return None
+        
+        entry_point, max_level, M, ef_construction, count = (int(v) for v in sections["hnsw_meta"])
+        index = cls(M=M, ef_construction=ef_construction)
+        index.count = count
+        index.entry_point = entry_point
+        index.max_level = max_level
+        # Mapped read-only; _grow copies them on the first insert
+        index.levels = sections["hnsw_levels"]
+        index.layer0 = sections["hnsw_layer0"]
+        index.upper = [{} for _ in range(max(max_level, 0))]
+        for row in np.asarray(sections["hnsw_upper"]).tolist():
+            node, level, neighbors = row[0], row[1], [n for n in row[2:] if n >= 0]
+            index.upper[level - 1][node] = neighbors
+        return index
@@ -0,0 +1,88 @@
+"""
+Latency Statistics
+Rolling per-operation latency percentiles for the index stats endpoint
+
+Each named operation keeps its last LATENCY_WINDOW durations in a ring buffer,
+so percentiles follow current traffic and memory stays bounded.
+"""
+import os
+import time
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+import numpy as np
+
+DEFAULT_WINDOW = 2048
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+class _Window:
+    """Ring buffer of the most recent durations (seconds)"""
+    
+    def __init__(self, size: int):
+        self.values = np.zeros(size, dtype=np.float64)
+        self.count = 0
+    
+    def add(self, seconds: float):
+        self.values[self.count % self.values.shape[0]] = seconds
+        self.count += 1
+    
+    def recent(self) -> np.ndarray:
+        return self.values[:min(self.count, self.values.shape[0])]
+
+
+class LatencyRecorder:
+    """Thread-safe latency windows keyed by operation name"""
+    
+    def __init__(self, window: Optional[int] = None):
+        """
+        Args:
+            window: Durations kept per operation (default: LATENCY_WINDOW or 2048)
+        """
+        self.window = window or int(os.getenv("LATENCY_WINDOW", DEFAULT_WINDOW))
+        self._windows: Dict[str, _Window] = {}
+        self._lock = threading.Lock()
+    
+    def record(self, name: str, seconds: float):
+        """Add one duration to an operation's window"""
+        with self._lock:
+            window = self._windows.get(name)
+            if window is None:
+                window = self._windows[name] = _Window(self.window)
+            window.add(seconds)
+    
+    @contextmanager
+    def measure(self, name: str) -> Iterator[None]:
+        """Record the duration of the with-block (also when it raises)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+    
+    def clear(self):
+        with self._lock:
+            self._windows.clear()
+    
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Percentiles per operation over its window
+        
+        Returns:
+            {name: {"count", "window", "p50_ms", "p90_ms", "p95_ms", "p99_ms", "max_ms"}},
+            count being all durations ever recorded
+        """
+        with self._lock:
+            snapshot = {name: (window.count, window.recent().copy()) for name, window in self._windows.items()}
+        
+        stats = {}
+        for name, (count, values) in snapshot.items():
+            entry = {"count": count, "window": int(values.shape[0])}
+            if values.size:
+                for percentile, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+                    entry[f"p{percentile}_ms"] = round(float(value) * 1000, 3)
+                entry["max_ms"] = round(float(values.max()) * 1000, 3)
+            stats[name] = entry
+        return stats
@@ -0,0 +1,199 @@
+"""
+Lexical Index
+BM25 inverted index over chunk text for exact-term retrieval
+
+Course codes, "GPA", "repeat exam" or faculty names embed poorly, so they are
+matched lexically. Postings are stored CSR-style in flat arrays (one row/tf
+run per term) so the index lives in the same memory-mapped file as the
+embeddings and costs a few bytes per posting.
+"""
+import re
+import logging
+from collections import Counter
+from typing import Dict, Hashable, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_K1 = 1.2
+DEFAULT_B = 0.75
+DEFAULT_RRF_K = 60
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+STOPWORDS = frozenset((
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "for", "from",
+    "how", "i", "in", "is", "it", "me", "my", "of", "on", "or", "the", "to",
+    "what", "when", "where", "which", "who", "will", "with",
+))
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens without stopwords (course codes stay whole)"""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def reciprocal_rank_fusion(ranked_lists: Sequence[Sequence[Hashable]], k: int = DEFAULT_RRF_K) -> Dict[Hashable, float]:
+    """
+    Merge ranked candidate lists with reciprocal-rank fusion
+    
+    Each list contributes 1 / (k + rank) per item, so items ranked well by
+    either retriever surface without having to calibrate their raw scores.
+    
+    Args:
+        ranked_lists: Lists of item keys (row numbers, document ids), best first
+        k: Rank smoothing constant
+    
+    Returns:
+        Dict of item -> fused score
+    """
+    fused: Dict[Hashable, float] = {}
+    for ranked in ranked_lists:
+        for rank, item in enumerate(ranked, start=1):
+            fused[item] = fused.get(item, 0.0) + 1.0 / (k + rank)
+    return fused
+
+
+class BM25Index:
+    """
+    BM25 inverted index over the rows of an index segment
+    
+    Term t's postings are rows[offsets[t]:offsets[t + 1]] with matching term
+    frequencies in tfs; doc_len holds each row's token count.
+    """
+    
+    SECTION_NAMES = ("bm25_terms", "bm25_offsets", "bm25_rows", "bm25_tfs", "bm25_doc_len")
+    
+    def __init__(
+        self,
+        terms: Dict[str, int],
+        offsets: np.ndarray,
+        rows: np.ndarray,
+        tfs: np.ndarray,
+        doc_len: np.ndarray,
+        k1: float = DEFAULT_K1,
+        b: float = DEFAULT_B
+    ):
+        self.terms = terms
+        self.offsets = offsets
+        self.rows = rows
+        self.tfs = tfs
+        self.doc_len = doc_len
+        self.k1 = k1
+        self.b = b
+        
+        n_docs = len(doc_len)
+        self.avg_doc_len = float(np.mean(doc_len)) if n_docs else 0.0
+        doc_freq = np.diff(np.asarray(offsets)).astype(np.float32)
+        self.idf = np.log1p((n_docs - doc_freq + 0.5) / (doc_freq + 0.5)).astype(np.float32)
+    
+    def __len__(self) -> int:
+        return len(self.doc_len)
+    
+    @classmethod
+    def build(cls, texts: Sequence[str], k1: float = DEFAULT_K1, b: float = DEFAULT_B) -> "BM25Index":
+        """
+        Build the index over texts (row i is texts[i])
+        
+        Args:
+            texts: Chunk texts in segment row order
+            k1: Term frequency saturation
+            b: Document length normalization
+        """
+        postings: Dict[str, List[tuple]] = {}
+        doc_len = np.zeros(len(texts), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts = Counter(tokenize(text or ""))
+            doc_len[row] = sum(counts.values())
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((row, tf))
+        
+        vocabulary = sorted(postings)
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        for term_id, term in enumerate(vocabulary):
+            offsets[term_id + 1] = offsets[term_id] + len(postings[term])
+        
+        rows = np.empty(int(offsets[-1]), dtype=np.int32)
+        tfs = np.empty(int(offsets[-1]), dtype=np.uint16)
+        for term_id, term in enumerate(vocabulary):
+            start, end = offsets[term_id], offsets[term_id + 1]
+            entries = np.asarray(postings[term], dtype=np.int64)
+            rows[start:end] = entries[:, 0]
+            tfs[start:end] = np.minimum(entries[:, 1], np.iinfo(np.uint16).max)
+        
+        logger.info(f"BM25 index: {len(texts)} chunks, {len(vocabulary)} terms, {len(rows)} postings")
+        return cls({term: i for i, term in enumerate(vocabulary)}, offsets, rows, tfs, doc_len, k1, b)
+    
+    def score(self, query: str) -> np.ndarray:
+        """BM25 score of every row for the query (0 for rows sharing no term)"""
+        scores = np.zeros(len(self), dtype=np.float32)
+        if len(self) == 0:
+            return scores
+        
+        for term in set(tokenize(query)):
+            term_id = self.terms.get(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            rows = self.rows[start:end]
+            tf = self.tfs[start:end].astype(np.float32)
+            norm = self.k1 * (1.0 - self.b + self.b * self.doc_len[rows] / self.avg_doc_len)
+            scores[rows] += self.idf[term_id] * tf * (self.k1 + 1.0) / (tf + norm)
+        return scores
+    
+    def search(self, query: str, k: int, runs: Optional[np.ndarray] = None):
+        """
+        Top-k rows by BM25 score
+        
+        Args:
+            query: Query text
+            k: Number of results
+            runs: Optional (m, 2) [start, end) row ranges to restrict to
+        
+        Returns:
+            (rows, scores) best first; rows with no matching term are omitted
+        """
+        scores = self.score(query)
+        if runs is not None:
+            allowed = np.zeros(len(self), dtype=bool)
+            for start, end in runs:
+                allowed[start:end] = True
+            scores[~allowed] = 0.0
+        
+        matched = np.flatnonzero(scores > 0)
+        if matched.size > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        order = matched[np.argsort(-scores[matched], kind="stable")]
+        return order.astype(np.int64), scores[order]
+    
+    def to_sections(self) -> Dict[str, np.ndarray]:
+        """Arrays to persist in the index file (terms as newline-joined UTF-8)"""
+        vocabulary = sorted(self.terms, key=self.terms.get)
+        terms = np.frombuffer("\n".join(vocabulary).encode("utf-8"), dtype=np.uint8)
+        return {
+            "bm25_terms": terms,
+            "bm25_offsets": self.offsets,
+            "bm25_rows": self.rows,
+            "bm25_tfs": self.tfs,
+            "bm25_doc_len": self.doc_len,
+        }
+    
+    @classmethod
+    def from_sections(cls, sections: Dict[str, np.ndarray], params: Optional[Dict] = None) -> Optional["BM25Index"]:
+        """Rebuild from index file sections, or None if the file has no BM25 index"""
+        if not all(name in sections for name in cls.SECTION_NAMES):
+            return None
+        
+        params = params or {}
+        raw = bytes(sections["bm25_terms"]).decode("utf-8")
+        vocabulary = raw.split("\n") if raw else []
+        return cls(
+            {term: i for i, term in enumerate(vocabulary)},
+            sections["bm25_offsets"],
+            sections["bm25_rows"],
+            sections["bm25_tfs"],
+            sections["bm25_doc_len"],
+            k1=params.get("k1", DEFAULT_K1),
+            b=params.get("b", DEFAULT_B)
+        )
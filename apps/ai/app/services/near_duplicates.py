@@ -0,0 +1,232 @@
+"""
+Near-Duplicate Detector
+MinHash signatures with LSH banding to collapse repeated handbook passages
+
+Handbooks repeat UGC rules, disciplinary codes and by-laws across faculties.
+Each chunk gets a MinHash signature over its word shingles; signatures are
+split into bands and chunks sharing any band bucket are compared, so a new
+chunk is only checked against a handful of candidates. A chunk whose
+estimated Jaccard similarity with an earlier one reaches the threshold is not
+embedded or stored again; its source is added to the earlier chunk instead.
+"""
+import os
+import re
+import zlib
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from bson import ObjectId
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NUM_PERM = 128
+DEFAULT_BANDS = 32
+DEFAULT_SHINGLE_SIZE = 5
+DEFAULT_THRESHOLD = 0.8
+
+_SHIFT = np.uint64(32)
+_WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+class NearDuplicateDetector:
+    """
+    MinHash/LSH index of chunk signatures
+    
+    Each chunk is registered under its MongoDB id. Buckets are kept per
+    university partition, so passages shared by two universities stay
+    searchable in both partitions.
+    """
+    
+    def __init__(
+        self,
+        threshold: Optional[float] = None,
+        num_perm: int = DEFAULT_NUM_PERM,
+        bands: int = DEFAULT_BANDS,
+        shingle_size: int = DEFAULT_SHINGLE_SIZE,
+        seed: int = 1
+    ):
+        """
+        Args:
+            threshold: Estimated Jaccard similarity at which chunks are
+                       collapsed (default: DEDUP_THRESHOLD or 0.8)
+            num_perm: Signature length
+            bands: LSH bands (num_perm must be divisible by bands)
+            shingle_size: Words per shingle
+            seed: Seed for the hash family (signatures are only comparable
+                  between detectors built with the same seed)
+        """
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+        
+        self.threshold = threshold if threshold is not None else float(os.getenv("DEDUP_THRESHOLD", DEFAULT_THRESHOLD))
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        self.shingle_size = shingle_size
+        
+        # Multiply-shift hash family: h(x) = ((a * x + b) mod 2**64) >> 32, a odd
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(0, np.iinfo(np.uint64).max, size=num_perm, dtype=np.uint64, endpoint=True) | np.uint64(1)
+        self._b = rng.integers(0, np.iinfo(np.uint64).max, size=num_perm, dtype=np.uint64, endpoint=True)
+        
+        self._buckets: Dict[Tuple[Optional[str], int, bytes], List[ObjectId]] = {}
+        self._signatures: Dict[ObjectId, np.ndarray] = {}
+    
+    def __len__(self) -> int:
+        return len(self._signatures)
+    
+    def _shingles(self, text: str) -> np.ndarray:
+        """CRC32 hashes of the word shingles of a text"""
+        words = _WORD_PATTERN.findall(text.lower())
+        if len(words) < self.shingle_size:
+            grams = [" ".join(words)] if words else []
+        else:
+            grams = [" ".join(words[i:i + self.shingle_size]) for i in range(len(words) - self.shingle_size + 1)]
+        return np.unique(np.fromiter(
+            (zlib.crc32(gram.encode("utf-8")) for gram in grams), dtype=np.uint64, count=len(grams)
+        ))
+    
+    def signature(self, text: str) -> np.ndarray:
+        """
+        MinHash signature of a text
+        
+        Returns:
+            (num_perm,) uint32 array
+        """
+        shingles = self._shingles(text)
+        if shingles.size == 0:
+            return np.full(self.num_perm, np.iinfo(np.uint32).max, dtype=np.uint32)
+        # uint64 arithmetic wraps, which is the mod 2**64 of the hash family
+        hashed = (np.outer(self._a, shingles) + self._b[:, None]) >> _SHIFT
+        return hashed.min(axis=1).astype(np.uint32)
+    
+    def _band_keys(self, signature: np.ndarray, university: Optional[str]):
+        for band in range(self.bands):
+            start = band * self.rows_per_band
+            yield (university, band, signature[start:start + self.rows_per_band].tobytes())
+    
+    def add(self, doc_id: ObjectId, signature: np.ndarray, university: Optional[str] = None):
+        """Register a stored chunk's signature"""
+        _add(self._buckets, self._signatures, self._band_keys(signature, university), doc_id, signature)
+    
+    def register(self, chunks: Iterable[Dict[str, Any]]):
+        """
+        Register chunks returned by collapse() once they are stored
+        
+        Only stored chunks may absorb later duplicates; a chunk whose insert
+        failed must not.
+        """
+        for chunk in chunks:
+            if chunk.get("minhash") is not None:
+                self.add(chunk["_id"], chunk["minhash"], chunk.get("university"))
+    
+    def _best_match(
+        self,
+        signature: np.ndarray,
+        university: Optional[str],
+        buckets: Dict[Tuple[Optional[str], int, bytes], List[ObjectId]],
+        signatures: Dict[ObjectId, np.ndarray]
+    ) -> Tuple[Optional[ObjectId], float]:
+        """Most similar chunk of an LSH index at or above the threshold, with its similarity"""
+        candidates = set()
+        for key in self._band_keys(signature, university):
+            candidates.update(buckets.get(key, ()))
+        
+        best_id, best_similarity = None, self.threshold
+        for doc_id in candidates:
+            similarity = float(np.mean(signatures[doc_id] == signature))
+            if similarity >= best_similarity:
+                best_id, best_similarity = doc_id, similarity
+        return best_id, best_similarity
+    
+    def find_duplicate(self, signature: np.ndarray, university: Optional[str] = None) -> Optional[ObjectId]:
+        """
+        Most similar registered chunk at or above the threshold
+        
+        Returns:
+            Its id, or None if the chunk is new
+        """
+        return self._best_match(signature, university, self._buckets, self._signatures)[0]
+    
+    def collapse(self, chunks: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[ObjectId, List[Dict[str, Any]]]]:
+        """
+        Split chunks into new ones and near-duplicates of known chunks
+        
+        New chunks get an "_id" (so later duplicates can point at them before
+        they are stored), a "minhash" signature and a "sources" list holding
+        their own source. A duplicate of a chunk earlier in the same list is
+        appended to that chunk's "sources". New chunks are not registered
+        here; pass them to register() after they are stored.
+        
+        Args:
+            chunks: Chunks from DocumentProcessor.process_pdf
+        
+        Returns:
+            (chunks to embed and store,
+             {stored chunk id: source entries to add to it})
+        """
+        unique = []
+        pending: Dict[ObjectId, Dict[str, Any]] = {}
+        merged: Dict[ObjectId, List[Dict[str, Any]]] = {}
+        # LSH index of this call's new chunks, kept apart until they are stored
+        pending_buckets: Dict[Tuple[Optional[str], int, bytes], List[ObjectId]] = {}
+        pending_signatures: Dict[ObjectId, np.ndarray] = {}
+        
+        for chunk in chunks:
+            university = chunk.get("university")
+            source_entry = {"source": chunk.get("source", "unknown"), "page": chunk.get("page")}
+            signature = self.signature(chunk.get("text", ""))
+            
+            stored_id, stored_similarity = self._best_match(signature, university, self._buckets, self._signatures)
+            pending_id, pending_similarity = self._best_match(signature, university, pending_buckets, pending_signatures)
+            duplicate_of = pending_id if pending_id is not None and pending_similarity > stored_similarity else stored_id
+            if duplicate_of is None:
+                chunk["_id"] = ObjectId()
+                chunk["minhash"] = signature
+                chunk["sources"] = [source_entry]
+                _add(
+                    pending_buckets, pending_signatures, self._band_keys(signature, university), chunk["_id"], signature
+                )
+                pending[chunk["_id"]] = chunk
+                unique.append(chunk)
+            elif duplicate_of in pending:
+                pending[duplicate_of]["sources"].append(source_entry)
+            else:
+                merged.setdefault(duplicate_of, []).append(source_entry)
+        
+        if len(unique) < len(chunks):
+            logger.info(f"Near-duplicate detection: {len(chunks) - len(unique)} of {len(chunks)} chunks collapsed")
+        return unique, merged
+    
+    def load(self, signatures: Iterable[Tuple[ObjectId, np.ndarray, Optional[str]]]) -> int:
+        """
+        Register signatures of already stored chunks
+        
+        Args:
+            signatures: (id, signature, university) tuples, e.g. from
+                        VectorStore.iter_signatures()
+        
+        Returns:
+            Number of signatures loaded
+        """
+        count = 0
+        for doc_id, signature, university in signatures:
+            if signature.shape[0] != self.num_perm:
+                continue
+            self.add(doc_id, signature, university)
+            count += 1
+        return count
+
+
+def _add(
+    buckets: Dict[Tuple[Optional[str], int, bytes], List[ObjectId]],
+    signatures: Dict[ObjectId, np.ndarray],
+    keys: Iterable[Tuple[Optional[str], int, bytes]],
+    doc_id: ObjectId,
+    signature: np.ndarray
+):
+    """Put a signature into an LSH index under its band keys"""
+    signatures[doc_id] = signature
+    for key in keys:
+        buckets.setdefault(key, []).append(doc_id)
@@ -0,0 +1,295 @@
+"""
+ONNX Embedding Backend
+CPU inference of a sentence-transformers model through ONNX Runtime
+
+The model's transformer is exported once to an ONNX graph (and, for
+"onnx-int8", dynamically quantized to int8 weights) next to its tokenizer.
+Encoding then tokenizes with the same tokenizer and limits, runs the graph,
+mean-pools the token states over the attention mask and L2-normalizes, like
+SentenceTransformer.encode(normalize_embeddings=True). Once exported, loading
+needs neither PyTorch nor sentence-transformers, which cuts startup time and
+process memory.
+
+Backends (EMBEDDING_BACKEND):
+    torch      sentence-transformers on PyTorch (default)
+    onnx       exported float32 graph
+    onnx-int8  exported graph with int8 weights
+
+The ONNX backends need onnxruntime (pip install -r requirements-onnx.txt).
+"""
+import os
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+try:
+    import onnxruntime
+    from transformers import AutoTokenizer
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+DEFAULT_EMBEDDING_BACKEND = "torch"
+
+DEFAULT_MODEL_DIR = Path(__file__).parent.parent.parent / "data" / "models"
+
+MODEL_FILES = {"onnx": "model.onnx", "onnx-int8": "model.int8.onnx"}
+CONFIG_FILE = "embedding_config.json"
+
+# Lowest cosine similarity to the torch embeddings accepted per backend
+PARITY_MIN_COSINE = {"onnx": 0.9999, "onnx-int8": 0.99}
+
+# Sentences compared against the torch output (mixed lengths and topics)
+PARITY_TEXTS = (
+    "What is the minimum Z-score for Medicine at the University of Colombo?",
+    "How do I apply for a hostel?",
+    "Students who fail to attend at least 80% of lectures are not eligible to sit the examination.",
+    "Repeat candidates must re-register for the course unit within two weeks of the release of results.",
+    "Mahapola scholarship",
+    "The Faculty of Engineering offers degree programmes in civil, electrical, mechanical and computer engineering, "
+    "each running for four academic years with a mandatory industrial training period.",
+)
+
+
+def get_embedding_backend() -> str:
+    """Configured inference backend (EMBEDDING_BACKEND, default torch)"""
+    backend = os.getenv("EMBEDDING_BACKEND", DEFAULT_EMBEDDING_BACKEND).lower()
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unsupported embedding backend: {backend}. Use one of {EMBEDDING_BACKENDS}")
+    return backend
+
+
+def get_model_dir(model_name: str) -> Path:
+    """Export directory of a model (under ONNX_MODEL_DIR, default data/models)"""
+    custom_dir = os.getenv("ONNX_MODEL_DIR")
+    base = Path(custom_dir) if custom_dir else DEFAULT_MODEL_DIR
+    return base / model_name.replace("/", "__")
+
+
+def _read_config(directory: Path) -> Dict[str, Any]:
+    path = directory / CONFIG_FILE
+    if not path.exists():
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_config(directory: Path, config: Dict[str, Any]):
+    tmp_path = directory / f"{CONFIG_FILE}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+    os.replace(tmp_path, directory / CONFIG_FILE)
+
+
+def export_model(model_name: str, backend: str, directory: Optional[Path] = None) -> Path:
+    """
+    Export a sentence-transformers model's transformer and tokenizer to ONNX
+    
+    Needs PyTorch and sentence-transformers (only here, not for inference).
+    
+    Args:
+        model_name: sentence-transformers model
+        backend: "onnx" or "onnx-int8" (also quantizes the exported graph)
+        directory: Export directory (default: get_model_dir(model_name))
+    
+    Returns:
+        Path of the backend's model file
+    
+    Raises:
+        ValueError: If the model does not use mean pooling
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+    
+    directory = directory or get_model_dir(model_name)
+    directory.mkdir(parents=True, exist_ok=True)
+    float_path = directory / MODEL_FILES["onnx"]
+    
+    model = SentenceTransformer(model_name, device="cpu")
+    transformer, pooling = model[0], model[1]
+    if pooling.get_pooling_mode_str() != "mean":
+        raise ValueError(f"Only mean-pooling models can be exported, {model_name} uses {pooling.get_pooling_mode_str()}")
+    
+    tokenizer = transformer.tokenizer
+    input_names = [
+        name for name in ("input_ids", "attention_mask", "token_type_ids") if name in tokenizer.model_input_names
+    ]
+    
+    if not float_path.exists():
+        class TokenStates(torch.nn.Module):
+            """Transformer forward returning only the last hidden states"""
+            
+            def __init__(self, auto_model):
+                super().__init__()
+                self.auto_model = auto_model
+            
+            def forward(self, *inputs):
+                return self.auto_model(**dict(zip(input_names, inputs)))[0]
+        
+        sample = tokenizer(["export sample"], padding=True, return_tensors="pt")
+        axes = {name: {0: "batch", 1: "sequence"} for name in input_names + ["last_hidden_state"]}
+        tmp_path = directory / f"{MODEL_FILES['onnx']}.tmp"
+        with torch.no_grad():
+            torch.onnx.export(
+                TokenStates(transformer.auto_model).eval(),
+                tuple(sample[name] for name in input_names),
+                str(tmp_path),
+                input_names=input_names,
+                output_names=["last_hidden_state"],
+                dynamic_axes=axes,
+                opset_version=14
+            )
+        os.replace(tmp_path, float_path)
+        tokenizer.save_pretrained(str(directory))
+        logger.info(f"Exported {model_name} to {float_path}")
+    
+    if backend == "onnx-int8" and not (directory / MODEL_FILES["onnx-int8"]).exists():
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(str(float_path), str(directory / MODEL_FILES["onnx-int8"]), weight_type=QuantType.QInt8)
+        logger.info(f"Quantized {model_name} to int8 weights")
+    
+    config = _read_config(directory)
+    config.update({
+        "model_name": model_name,
+        "max_seq_length": int(transformer.max_seq_length),
+        "dimension": int(model.get_sentence_embedding_dimension()),
+        "input_names": input_names,
+    })
+    _write_config(directory, config)
+    return directory / MODEL_FILES[backend]
+
+
+class OnnxEncoder:
+    """
+    Exported model behind a SentenceTransformer.encode()-compatible interface
+    """
+    
+    def __init__(self, directory: Path, backend: str):
+        """
+        Args:
+            directory: Export directory (see export_model)
+            backend: "onnx" or "onnx-int8"
+        """
+        if not ONNX_AVAILABLE:
+            raise ImportError("onnxruntime and transformers are required. Install with: pip install -r requirements-onnx.txt")
+        
+        self.directory = Path(directory)
+        self.backend = backend
+        self.model_path = self.directory / MODEL_FILES[backend]
+        config = _read_config(self.directory)
+        self.max_seq_length = config["max_seq_length"]
+        self.dimension = config["dimension"]
+        self.input_names = config["input_names"]
+        self.parity = config.get("parity", {}).get(backend)
+        
+        options = onnxruntime.SessionOptions()
+        threads = int(os.getenv("ONNX_THREADS", "0"))
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            str(self.model_path), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.tokenizer = AutoTokenizer.from_pretrained(str(self.directory))
+    
+    @property
+    def model_bytes(self) -> int:
+        return self.model_path.stat().st_size
+    
+    def encode(
+        self,
+        sentences: Union[str, Sequence[str]],
+        batch_size: int = 32,
+        convert_to_numpy: bool = True,
+        normalize_embeddings: bool = False,
+        show_progress_bar: bool = False,
+        **kwargs: Any
+    ) -> np.ndarray:
+        """
+        Embed one text ((d,) array) or a list of texts ((n, d) array)
+        
+        Texts are batched longest first, as sentence-transformers does, so
+        each batch pads to similar lengths.
+        """
+        single = isinstance(sentences, str)
+        texts: List[str] = [sentences] if single else list(sentences)
+        embeddings = np.empty((len(texts), self.dimension), dtype=np.float32)
+        
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        for start in range(0, len(texts), batch_size):
+            rows = order[start:start + batch_size]
+            tokens = self.tokenizer(
+                [texts[i] for i in rows],
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors="np"
+            )
+            feeds = {name: tokens[name].astype(np.int64) for name in self.input_names}
+            states = self.session.run(None, feeds)[0]
+            
+            # Mean over real (unpadded) tokens
+            mask = tokens["attention_mask"][:, :, None].astype(np.float32)
+            embeddings[rows] = (states * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings /= np.maximum(norms, 1e-12)
+        return embeddings[0] if single else embeddings
+
+
+def check_parity(model_name: str, encoder: OnnxEncoder, texts: Sequence[str] = PARITY_TEXTS) -> float:
+    """
+    Compare an exported model with the torch model on sample texts
+    
+    The result is stored in the export's config and reported when it loads.
+    
+    Returns:
+        Lowest cosine similarity between the two embeddings of a text
+    """
+    from sentence_transformers import SentenceTransformer
+    
+    reference = SentenceTransformer(model_name, device="cpu").encode(
+        list(texts), convert_to_numpy=True, normalize_embeddings=True, show_progress_bar=False
+    )
+    candidate = encoder.encode(list(texts), normalize_embeddings=True)
+    similarity = float(np.min(np.sum(reference * candidate, axis=1)))
+    
+    config = _read_config(encoder.directory)
+    config.setdefault("parity", {})[encoder.backend] = similarity
+    _write_config(encoder.directory, config)
+    encoder.parity = similarity
+    return similarity
+
+
+def load_onnx_model(model_name: str, backend: str) -> OnnxEncoder:
+    """
+    Exported model for a backend, exporting it on first use
+    
+    Only an export whose recorded parity meets PARITY_MIN_COSINE is served;
+    one without a recorded check (e.g. copied in, or from an interrupted
+    export) is checked now.
+    
+    Raises:
+        ImportError: If onnxruntime/transformers (or, to export or check, torch) are missing
+        ValueError: If the export fails the parity check
+    """
+    directory = get_model_dir(model_name)
+    if not (directory / MODEL_FILES[backend]).exists():
+        export_model(model_name, backend, directory)
+    encoder = OnnxEncoder(directory, backend)
+    if encoder.parity is None:
+        similarity = check_parity(model_name, encoder)
+        logger.info(f"ONNX parity check for {model_name} ({backend}): min cosine {similarity:.5f}")
+    if encoder.parity < PARITY_MIN_COSINE[backend]:
+        raise ValueError(
+            f"{backend} export of {model_name} deviates from torch "
+            f"(min cosine {encoder.parity:.5f} < {PARITY_MIN_COSINE[backend]}); "
+            f"re-export it with scripts/export_onnx_model.py"
+        )
+    return encoder
@@ -0,0 +1,212 @@
+"""
+Query Embedding Batcher
+Asyncio micro-batching in front of the embedding model
+
+Concurrent chat requests each need one query embedding. Encoding them one by
+one runs a batch-of-one forward pass per request; the batcher instead queues
+them, waits up to QUERY_BATCH_WAIT_MS for companions (or until
+QUERY_BATCH_SIZE are pending), encodes the batch in a worker thread and
+resolves every caller's future. While a batch is being encoded new queries
+keep queueing, so under load batches fill up on their own. The event loop is
+never blocked by the model.
+"""
+import os
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.embedding_service import DEFAULT_MODEL_NAME, EmbeddingService, get_embedding_service
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BATCH = 32
+DEFAULT_MAX_WAIT_MS = 2.0
+
+
+class QueryBatcher:
+    """
+    Micro-batching query encoder bound to the running event loop
+    
+    encode() is awaited from the event loop; encode_blocking() serves sync
+    code running in worker threads (e.g. tools) through the same batches.
+    """
+    
+    def __init__(
+        self,
+        service: EmbeddingService,
+        max_batch: Optional[int] = None,
+        max_wait_ms: Optional[float] = None
+    ):
+        """
+        Args:
+            service: Embedding service whose encode_queries() runs the batches
+            max_batch: Queries per batch (default: QUERY_BATCH_SIZE or 32)
+            max_wait_ms: Time the first query of a batch waits for companions
+                         (default: QUERY_BATCH_WAIT_MS or 2)
+        """
+        self.service = service
+        self.max_batch = max_batch or int(os.getenv("QUERY_BATCH_SIZE", DEFAULT_MAX_BATCH))
+        self.max_wait = (
+            max_wait_ms if max_wait_ms is not None else float(os.getenv("QUERY_BATCH_WAIT_MS", DEFAULT_MAX_WAIT_MS))
+        ) / 1000.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional["asyncio.Queue[Tuple[str, asyncio.Future]]"] = None
+        self._worker: Optional[asyncio.Task] = None
+        # A dedicated thread: callers blocked in encode_blocking() may occupy
+        # every thread of the loop's default executor
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="query-embedding")
+        
+        self.batches = 0
+        self.queries = 0
+        self.largest_batch = 0
+    
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """
+        Serve encode_blocking() callers through this loop's batches
+        
+        Safe from any thread; the batching task starts with the first query.
+        """
+        self._loop = loop
+    
+    def _start(self, loop: asyncio.AbstractEventLoop):
+        """Bind to a loop and start the batching task (in the loop thread)"""
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._worker = loop.create_task(self._run())
+    
+    async def encode(self, query: str) -> np.ndarray:
+        """
+        Embedding of one query, encoded together with concurrent queries
+        
+        Returns:
+            Normalized 1-D embedding
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._start(loop)
+        future = loop.create_future()
+        self._queue.put_nowait((query, future))
+        return await future
+    
+    def encode_blocking(self, query: str) -> np.ndarray:
+        """
+        encode() for sync callers
+        
+        From a worker thread of a running loop the query joins the loop's
+        batches; anywhere else (scripts, the loop thread itself) it is
+        encoded directly.
+        """
+        loop = self._loop
+        if loop is not None and loop.is_running() and not _in_loop(loop):
+            return asyncio.run_coroutine_threadsafe(self.encode(query), loop).result()
+        return self.service.encode_query(query)
+    
+    async def _collect(self) -> List[Tuple[str, asyncio.Future]]:
+        """Wait for a first query, then for companions until the batch is full or the wait is over"""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+    
+    async def _run(self):
+        """Encode batches one at a time for as long as the loop runs"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            # Callers that gave up (cancelled requests) need no embedding
+            batch = [(query, future) for query, future in batch if not future.done()]
+            if not batch:
+                continue
+            try:
+                embeddings = await loop.run_in_executor(
+                    self._executor, self.service.encode_queries, [query for query, _ in batch]
+                )
+            except Exception as e:
+                logger.error(f"Query embedding batch of {len(batch)} failed: {e}", exc_info=True)
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            
+            self.batches += 1
+            self.queries += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+            for (_, future), embedding in zip(batch, embeddings):
+                if not future.done():
+                    future.set_result(embedding)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Batch counters"""
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches": self.batches,
+            "queries": self.queries,
+            "mean_batch_size": self.queries / self.batches if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+        }
+
+
+def _in_loop(loop: asyncio.AbstractEventLoop) -> bool:
+    """True when called from the thread running loop"""
+    try:
+        return asyncio.get_running_loop() is loop
+    except RuntimeError:
+        return False
+
+
+_batchers: Dict[str, QueryBatcher] = {}
+_batchers_lock = threading.Lock()
+_bound_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def bind_query_batchers(loop: asyncio.AbstractEventLoop):
+    """
+    Bind the shared batchers, current and future, to the app's event loop
+    
+    Called from the startup event. Otherwise a batcher only learns the loop
+    from its first async encode(), and sync tools that run before then
+    encode their queries one at a time.
+    """
+    global _bound_loop
+    with _batchers_lock:
+        _bound_loop = loop
+        for batcher in _batchers.values():
+            batcher.bind(loop)
+
+
+def get_query_batcher(model_name: str = DEFAULT_MODEL_NAME) -> QueryBatcher:
+    """
+    Shared batcher for a model's query embeddings
+    
+    Loads the model on first use (or waits for a load in progress); from
+    the event loop, call it only once MODEL_REGISTRY.is_loaded(model_name).
+    
+    Raises:
+        ImportError: If sentence-transformers is not installed
+    """
+    batcher = _batchers.get(model_name)
+    if batcher is None:
+        service = get_embedding_service(model_name)
+        with _batchers_lock:
+            batcher = _batchers.get(model_name)
+            if batcher is None:
+                batcher = _batchers[model_name] = QueryBatcher(service)
+                if _bound_loop is not None:
+                    batcher.bind(_bound_loop)
+    return batcher
@@ -0,0 +1,149 @@
+"""
+Result Cache
+Bounded LRU + TTL cache for search results, invalidated by index version
+
+During intake season the same handful of questions (hostel fees, medical
+exemptions, repeat exams) arrive thousands of times. Caching the formatted
+search response skips the query embedding and the index scan entirely.
+Entries belong to one index version: as soon as a lookup reports a different
+version (e.g. after an ingestion published new segments) the whole cache is
+dropped, so stale results are never served.
+"""
+import os
+import re
+import copy
+import time
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TTL_SECONDS = 600.0
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = "?!.,;: "
+
+
+def normalize_query(query: str) -> str:
+    """Case-, whitespace- and trailing-punctuation-insensitive form of a query"""
+    return _WHITESPACE.sub(" ", query.strip().lower()).rstrip(_TRAILING_PUNCTUATION)
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache with per-entry expiry
+    
+    Values are deep-copied in and out, so callers may modify what they get.
+    """
+    
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            max_entries: Capacity; 0 disables the cache
+                         (default: SEARCH_CACHE_SIZE or 1024)
+            ttl: Seconds an entry stays valid (default: SEARCH_CACHE_TTL or 600)
+            clock: Time source (monotonic seconds)
+        """
+        self.max_entries = max_entries if max_entries is not None else int(
+            os.getenv("SEARCH_CACHE_SIZE", DEFAULT_MAX_ENTRIES)
+        )
+        self.ttl = ttl if ttl is not None else float(os.getenv("SEARCH_CACHE_TTL", DEFAULT_TTL_SECONDS))
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._version: Optional[Hashable] = None
+        self._lock = threading.Lock()
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+    
+    def _check_version(self, version: Hashable):
+        """Drop every entry when the index version moved (caller holds the lock)"""
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+                logger.info(f"Result cache invalidated ({len(self._entries)} entries, index version changed)")
+            self._entries.clear()
+            self._version = version
+    
+    def get(self, key: Hashable, version: Hashable) -> Optional[Any]:
+        """
+        Cached value for key under the given index version
+        
+        Returns:
+            A copy of the value, or None on a miss
+        """
+        if not self.enabled:
+            return None
+        
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= self._clock():
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            value = entry[1]
+        return copy.deepcopy(value)
+    
+    def put(self, key: Hashable, value: Any, version: Hashable):
+        """
+        Cache a value computed against the given index version
+        
+        Values computed against a version the cache has already moved past
+        are not stored.
+        """
+        if not self.enabled:
+            return
+        
+        value = copy.deepcopy(value)
+        with self._lock:
+            if version != self._version:
+                return
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Counters and occupancy"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
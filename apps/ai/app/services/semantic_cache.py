@@ -0,0 +1,261 @@
+"""
+Semantic Answer Cache
+Reuses final chat answers for paraphrased questions
+
+"How do I defer my exam" and "can I postpone exams" embed almost identically.
+Each answered question is stored with its query embedding, the user context it
+was answered in, and the answer with its sources. A later question in the same
+context whose embedding reaches the cosine threshold gets the stored answer
+without an LLM round trip.
+
+Entries are scoped by (university, stage, course), because the answer prompt
+depends on them. Questions carrying numbers (z-scores, years, fees) only match
+questions with the same numbers. Answers that used tools with per-user effects
+or inputs are not cached.
+"""
+import os
+import re
+import copy
+import time
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLD = 0.92
+DEFAULT_MAX_ENTRIES = 2048
+DEFAULT_TTL_SECONDS = 3600.0
+
+# Answers built with these tools depend on the individual user
+UNCACHEABLE_TOOLS = frozenset(("memory_store", "zscore_predict"))
+
+_NUMBER_PATTERN = re.compile(r"\d+(?:\.\d+)?")
+
+Scope = Tuple[str, str, str]
+
+
+def context_scope(context: Optional[Dict[str, Any]]) -> Scope:
+    """Cache scope of a chat context: (university, stage, course), lowercased"""
+    context = context or {}
+    return tuple(str(context.get(key) or "").strip().lower() for key in ("university", "stage", "course"))
+
+
+def _numbers(text: str) -> Tuple[str, ...]:
+    return tuple(sorted(set(_NUMBER_PATTERN.findall(text))))
+
+
+class _ScopeEntries:
+    """Entries of one scope: an (n, d) matrix of embeddings and the matching records"""
+    
+    def __init__(self, dimension: int):
+        self.vectors = np.empty((0, dimension), dtype=np.float32)
+        self.records: List[Dict[str, Any]] = []
+    
+    def remove(self, index: int):
+        self.vectors = np.delete(self.vectors, index, axis=0)
+        self.records.pop(index)
+
+
+class SemanticCache:
+    """
+    Capacity-bounded cache of chat answers keyed by query-embedding similarity
+    
+    Thread-safe. Eviction is least recently used across all scopes; expired
+    entries are dropped when their scope is next searched.
+    """
+    
+    def __init__(
+        self,
+        threshold: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            threshold: Minimum cosine similarity for a hit
+                       (default: SEMANTIC_CACHE_THRESHOLD or 0.92)
+            max_entries: Capacity across all scopes; 0 disables the cache
+                         (default: SEMANTIC_CACHE_SIZE or 2048)
+            ttl: Seconds an answer stays valid (default: SEMANTIC_CACHE_TTL or 3600)
+            clock: Time source (monotonic seconds)
+        """
+        self.threshold = threshold if threshold is not None else float(
+            os.getenv("SEMANTIC_CACHE_THRESHOLD", DEFAULT_THRESHOLD)
+        )
+        self.max_entries = max_entries if max_entries is not None else int(
+            os.getenv("SEMANTIC_CACHE_SIZE", DEFAULT_MAX_ENTRIES)
+        )
+        self.ttl = ttl if ttl is not None else float(os.getenv("SEMANTIC_CACHE_TTL", DEFAULT_TTL_SECONDS))
+        self._clock = clock
+        self._scopes: Dict[Scope, _ScopeEntries] = {}
+        # entry id -> scope, least recently used first
+        self._lru: "OrderedDict[int, Scope]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def __len__(self) -> int:
+        return len(self._lru)
+    
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+    
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else None
+    
+    def _best_match(self, entries: _ScopeEntries, vector: np.ndarray, numbers: Tuple[str, ...]) -> Tuple[int, float]:
+        """Index and similarity of the closest live entry with the same numbers (caller holds the lock)"""
+        now = self._clock()
+        for index in range(len(entries.records) - 1, -1, -1):
+            record = entries.records[index]
+            if record["expires"] <= now:
+                entries.remove(index)
+                del self._lru[record["id"]]
+                self.expirations += 1
+        
+        if not entries.records or entries.vectors.shape[1] != vector.shape[0]:
+            return -1, -1.0
+        similarities = entries.vectors @ vector
+        for index, record in enumerate(entries.records):
+            if record["numbers"] != numbers:
+                similarities[index] = -1.0
+        best = int(np.argmax(similarities))
+        return best, float(similarities[best])
+    
+    def lookup(self, embedding: np.ndarray, query: str, scope: Scope) -> Optional[Dict[str, Any]]:
+        """
+        Cached answer for a question in the given scope
+        
+        Args:
+            embedding: Query embedding
+            query: Question text (its numbers must match the cached question's)
+            scope: context_scope() of the chat context
+        
+        Returns:
+            {"response", "sources", "similarity"} or None on a miss
+        """
+        if not self.enabled:
+            return None
+        vector = self._normalize(embedding)
+        if vector is None:
+            return None
+        
+        with self._lock:
+            entries = self._scopes.get(scope)
+            index, similarity = (-1, -1.0)
+            if entries is not None:
+                index, similarity = self._best_match(entries, vector, _numbers(query))
+            if index < 0 or similarity < self.threshold:
+                self.misses += 1
+                return None
+            record = entries.records[index]
+            self._lru.move_to_end(record["id"])
+            self.hits += 1
+            return {
+                "response": record["response"],
+                "sources": copy.deepcopy(record["sources"]),
+                "similarity": similarity,
+            }
+    
+    def store(
+        self,
+        embedding: np.ndarray,
+        query: str,
+        scope: Scope,
+        response: str,
+        sources: List[Any],
+        tools_used: Iterable[str] = ()
+    ) -> bool:
+        """
+        Remember the answer to a question
+        
+        A near-identical question already cached in the scope has its answer
+        replaced instead of adding a second entry.
+        
+        Returns:
+            True if the answer was cached
+        """
+        if not self.enabled or UNCACHEABLE_TOOLS.intersection(tools_used):
+            return False
+        vector = self._normalize(embedding)
+        if vector is None:
+            return False
+        
+        numbers = _numbers(query)
+        with self._lock:
+            entries = self._scopes.get(scope)
+            if entries is not None and entries.vectors.shape[1] != vector.shape[0]:
+                # Embedding model changed: the old entries can never match again
+                for record in entries.records:
+                    del self._lru[record["id"]]
+                entries = None
+            if entries is None:
+                entries = self._scopes[scope] = _ScopeEntries(vector.shape[0])
+            
+            index, similarity = self._best_match(entries, vector, numbers)
+            if index >= 0 and similarity >= self.threshold:
+                self._lru.pop(entries.records[index]["id"])
+                entries.remove(index)
+            
+            record = {
+                "id": self._next_id,
+                "numbers": numbers,
+                "response": response,
+                "sources": copy.deepcopy(sources),
+                "expires": self._clock() + self.ttl,
+            }
+            self._next_id += 1
+            entries.vectors = np.vstack([entries.vectors, vector[None, :]])
+            entries.records.append(record)
+            self._lru[record["id"]] = scope
+            
+            while len(self._lru) > self.max_entries:
+                self._evict_oldest()
+        return True
+    
+    def _evict_oldest(self):
+        """Drop the least recently used entry (caller holds the lock)"""
+        entry_id, scope = self._lru.popitem(last=False)
+        entries = self._scopes[scope]
+        for index, record in enumerate(entries.records):
+            if record["id"] == entry_id:
+                entries.remove(index)
+                break
+        if not entries.records:
+            del self._scopes[scope]
+        self.evictions += 1
+    
+    def clear(self):
+        with self._lock:
+            self._scopes.clear()
+            self._lru.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Counters and occupancy"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._lru),
+                "scopes": len(self._scopes),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
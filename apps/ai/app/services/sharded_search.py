@@ -0,0 +1,125 @@
+"""
+Sharded Vector Search
+Exact scans split across a pool of worker processes
+
+Each published segment is cut into VECTOR_SEARCH_SHARDS contiguous row ranges.
+Worker processes map the same segment files as the API process (np.memmap
+over the immutable, versioned files), so the embedding matrix sits once in the
+OS page cache and is shared by every worker without being pickled or copied.
+A query is sent to every shard; each worker scans its rows and returns a local
+top-k, which the caller merges. With one shard (the default) no pool is
+started and searches run in the calling thread.
+"""
+import os
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.services.vector_index import IndexSegment, open_index_file
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SHARDS = 1
+
+# Segment files mapped by this worker process, by path
+_mapped_segments: Dict[str, IndexSegment] = {}
+
+
+def get_shard_count() -> int:
+    """Number of search shards (VECTOR_SEARCH_SHARDS, default 1)"""
+    return max(int(os.getenv("VECTOR_SEARCH_SHARDS", DEFAULT_SHARDS)), 1)
+
+
+def shard_bounds(rows: int, shard: int, shards: int) -> Tuple[int, int]:
+    """[start, end) row range of one shard of a segment"""
+    return rows * shard // shards, rows * (shard + 1) // shards
+
+
+def mapped_segments(paths: Iterable[str]) -> List[IndexSegment]:
+    """
+    Map segment files in a worker, reusing earlier mappings
+    
+    Mappings of files that are no longer passed (compacted away) are dropped.
+    """
+    paths = list(paths)
+    for stale in set(_mapped_segments) - set(paths):
+        del _mapped_segments[stale]
+    segments = []
+    for path in paths:
+        segment = _mapped_segments.get(path)
+        if segment is None:
+            segment = _mapped_segments[path] = open_index_file(Path(path))
+        segments.append(segment)
+    return segments
+
+
+class ShardPool:
+    """
+    Process pool running one task per shard
+    
+    Workers are spawned lazily on the first search and reused. Spawning (not
+    forking) keeps the pool safe to start from a threaded server. A pool
+    broken by a dead worker (OOM kill, crash) is dropped and the next search
+    spawns a fresh one.
+    """
+    
+    def __init__(self, shards: Optional[int] = None):
+        """
+        Args:
+            shards: Worker processes (default: VECTOR_SEARCH_SHARDS or 1)
+        """
+        self.shards = shards or get_shard_count()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+    
+    @property
+    def enabled(self) -> bool:
+        return self.shards > 1
+    
+    def _get_executor(self) -> ProcessPoolExecutor:
+        self.discard_broken()
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.shards,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+                logger.info(f"Started {self.shards} vector search shard workers")
+            return self._executor
+    
+    def submit(self, fn: Callable[..., Any], *args: Any) -> List[Future]:
+        """
+        Run fn(*args, shard, shards) once per shard
+        
+        fn must be a module-level function so it can be sent to the workers.
+        
+        Returns:
+            One future per shard
+        """
+        executor = self._get_executor()
+        try:
+            return [executor.submit(fn, *args, shard, self.shards) for shard in range(self.shards)]
+        except BrokenProcessPool:
+            self.discard_broken()
+            raise
+    
+    def discard_broken(self):
+        """Drop the pool if a worker died, so the next submit() starts a fresh one"""
+        with self._lock:
+            executor = self._executor
+            if executor is None or not executor._broken:
+                return
+            self._executor = None
+        logger.warning(f"Vector search shard pool broken ({executor._broken}); restarting workers")
+        executor.shutdown(wait=False, cancel_futures=True)
+    
+    def close(self):
+        """Stop the worker processes"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,441 @@
+"""
+Vector Index File
+Memory-mappable on-disk embedding index shared by all uvicorn workers
+
+File layout:
+    magic (8 bytes) | header length (uint32) | JSON header | sections...
+
+The JSON header records the index version stamp, vector count, dimension and
+the byte offset, dtype and shape of every section ("vectors", "ids", ...).
+Sections are 64-byte aligned so each can be opened with np.memmap at zero copy.
+
+The index is a list of immutable segment files. A small manifest next to them
+names the current segments (oldest first) and the ids deleted since they were
+written. Writers publish by writing fresh versioned segment files and then
+atomically replacing the manifest; readers compare the manifest version with
+the one they have mapped and map only the segment files that are new.
+"""
+import os
+import json
+import time
+import struct
+import logging
+from pathlib import Path
+from typing import Dict, Any, FrozenSet, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"UMVIDX01"
+FORMAT_VERSION = 1
+SECTION_ALIGNMENT = 64
+OBJECT_ID_BYTES = 12
+
+SUPPORTED_DTYPES = ("float32", "float16")
+
+# University partition label for national UGC documents (no single university)
+NATIONAL_CODE = -1
+
+DEFAULT_INDEX_DIR = Path(__file__).parent.parent.parent / "data" / "index"
+
+
+def get_index_dir() -> Path:
+    """Directory holding index files (VECTOR_INDEX_DIR overrides the default)"""
+    custom_dir = os.getenv("VECTOR_INDEX_DIR")
+    return Path(custom_dir) if custom_dir else DEFAULT_INDEX_DIR
+
+
+def _aligned(offset: int) -> int:
+    """Round offset up to the section alignment"""
+    return (offset + SECTION_ALIGNMENT - 1) // SECTION_ALIGNMENT * SECTION_ALIGNMENT
+
+
+def _manifest_path(directory: Path, name: str) -> Path:
+    return directory / f"{name}.manifest.json"
+
+
+class IndexSegment:
+    """
+    A set of normalized embedding rows and their document ids
+    
+    Either memory-mapped from an index file (path is set) or built in memory.
+    ids are raw 12-byte ObjectIds, shape (n, 12), so a mapped segment never
+    materializes per-row Python objects. Extra sections (e.g. ANN structures)
+    are kept by name in `sections`; `ann` holds the search structure built from
+    them, `quantizer` the compressed first-pass vectors and `lexical` the BM25
+    index over the chunk text, if any.
+    
+    Rows are labelled with a university partition: university_codes[i] indexes
+    university_names, or is NATIONAL_CODE for national UGC documents.
+    """
+    
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        ids: np.ndarray,
+        version: Optional[int] = None,
+        path: Optional[Path] = None,
+        header: Optional[Dict[str, Any]] = None,
+        sections: Optional[Dict[str, np.ndarray]] = None,
+        university_codes: Optional[np.ndarray] = None,
+        university_names: Optional[List[str]] = None
+    ):
+        self.vectors = vectors
+        self.ids = ids
+        self.version = version
+        self.path = path
+        self.header = header or {}
+        self.sections = sections or {}
+        self.ann = None
+        self.quantizer = None
+        self.lexical = None
+        self.university_codes = university_codes
+        self.university_names = university_names or []
+        self._partition_cache: Dict[str, np.ndarray] = {}
+    
+    def __len__(self) -> int:
+        return self.vectors.shape[0]
+    
+    @property
+    def dimension(self) -> int:
+        return self.vectors.shape[1]
+    
+    def partition_runs(self, university: str) -> np.ndarray:
+        """
+        Row ranges holding a university's documents plus the national ones
+        
+        Chunks are stored PDF by PDF, so each partition is a handful of
+        contiguous runs that can be scanned as zero-copy slices.
+        
+        Args:
+            university: University name (case-insensitive)
+            
+        Returns:
+            (k, 2) array of [start, end) row ranges
+        """
+        key = university.strip().lower()
+        runs = self._partition_cache.get(key)
+        if runs is not None:
+            return runs
+        
+        if self.university_codes is None:
+            runs = np.array([[0, len(self)]], dtype=np.int64)
+        else:
+            wanted = [NATIONAL_CODE] + [
+                code for code, name in enumerate(self.university_names) if name.lower() == key
+            ]
+            mask = np.isin(self.university_codes, wanted)
+            edges = np.flatnonzero(np.diff(np.concatenate([[False], mask, [False]]).astype(np.int8)))
+            runs = edges.reshape(-1, 2).astype(np.int64)
+        
+        self._partition_cache[key] = runs
+        return runs
+    
+    @classmethod
+    def empty(cls, dimension: int) -> "IndexSegment":
+        """A segment with no rows (e.g. a fresh delta segment)"""
+        return cls(
+            vectors=np.empty((0, dimension), dtype=np.float32),
+            ids=np.empty((0, OBJECT_ID_BYTES), dtype=np.uint8),
+            university_codes=np.empty(0, dtype=np.int16)
+        )
+
+
+class IndexView:
+    """
+    Immutable snapshot of the whole index
+    
+    Sealed segments are never modified; new documents go to the small delta
+    segment, which is replaced (not mutated) on every append and sealed once
+    it grows. `deleted` holds raw ids removed since the segments were built;
+    searches skip them and compaction drops them. Writers build a new view
+    and swap it in with a single attribute assignment, so searches read a
+    consistent snapshot without taking a lock.
+    """
+    
+    def __init__(
+        self,
+        segments: Tuple[IndexSegment, ...],
+        delta: IndexSegment,
+        deleted: FrozenSet[bytes] = frozenset(),
+        version: Optional[int] = None
+    ):
+        self.segments = tuple(segments)
+        self.delta = delta
+        self.deleted = deleted
+        self.version = version
+    
+    def __len__(self) -> int:
+        return sum(len(segment) for segment in self.segments) + len(self.delta)
+    
+    @property
+    def dimension(self) -> int:
+        if self.segments:
+            return self.segments[0].dimension
+        return self.delta.dimension
+    
+    def searchable(self) -> Tuple[IndexSegment, ...]:
+        """Segments to fan a search out over (sealed ones, then the delta)"""
+        if len(self.delta) == 0:
+            return self.segments
+        return self.segments + (self.delta,)
+
+
+def _layout_sections(header: Dict[str, Any], arrays: Dict[str, np.ndarray]) -> bytes:
+    """
+    Assign aligned offsets to every section and serialize the header
+    
+    Offsets depend on the header size and the header contains the offsets, so
+    room is reserved up front and grown until the header fits.
+    """
+    reserve = 1024
+    while True:
+        header["sections"] = {}
+        offset = _aligned(len(MAGIC) + 4 + reserve)
+        for section_name, array in arrays.items():
+            header["sections"][section_name] = {
+                "offset": offset,
+                "dtype": array.dtype.str,
+                "shape": list(array.shape),
+            }
+            offset = _aligned(offset + array.nbytes)
+        header_bytes = json.dumps(header).encode("utf-8")
+        if len(header_bytes) <= reserve:
+            return header_bytes
+        reserve *= 2
+
+
+def write_segment(
+    directory: Path,
+    name: str,
+    vectors: np.ndarray,
+    ids: np.ndarray,
+    dtype: str = "float32",
+    sections: Optional[Dict[str, np.ndarray]] = None,
+    meta: Optional[Dict[str, Any]] = None
+) -> Tuple[int, str]:
+    """
+    Write one immutable segment file (not yet visible to readers)
+    
+    Args:
+        directory: Index directory
+        name: Index name (usually the collection name)
+        vectors: (n, d) normalized embeddings
+        ids: (n, 12) uint8 raw ObjectIds
+        dtype: Storage dtype for vectors ("float32" or "float16")
+        sections: Extra named arrays stored after vectors and ids
+        meta: Extra JSON-serializable header fields
+    
+    Returns:
+        (version stamp, file name) of the new segment
+    """
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"Unsupported index dtype: {dtype}. Use one of {SUPPORTED_DTYPES}")
+    if vectors.shape[0] != ids.shape[0]:
+        raise ValueError(f"Mismatch: {vectors.shape[0]} vectors but {ids.shape[0]} ids")
+    
+    directory.mkdir(parents=True, exist_ok=True)
+    version = time.time_ns()
+    
+    arrays = {
+        "vectors": np.ascontiguousarray(vectors, dtype=dtype),
+        "ids": np.ascontiguousarray(ids, dtype=np.uint8),
+    }
+    for section_name, array in (sections or {}).items():
+        arrays[section_name] = np.ascontiguousarray(array)
+    
+    header = {
+        **(meta or {}),
+        "format": FORMAT_VERSION,
+        "version": version,
+        "name": name,
+        "count": int(vectors.shape[0]),
+        "dimension": int(vectors.shape[1]),
+        "dtype": dtype,
+    }
+    header_bytes = _layout_sections(header, arrays)
+    
+    file_name = f"{name}-{version}.idx"
+    final_path = directory / file_name
+    tmp_path = directory / f"{file_name}.tmp"
+    
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header_bytes)))
+        f.write(header_bytes)
+        for section_name, array in arrays.items():
+            f.seek(header["sections"][section_name]["offset"])
+            f.write(array.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, final_path)
+    
+    logger.info(f"Wrote vector index segment {final_path} ({vectors.shape[0]} vectors, {dtype})")
+    return version, file_name
+
+
+def publish_manifest(directory: Path, name: str, files: List[str], deleted: Iterable[bytes] = ()) -> int:
+    """
+    Atomically switch readers over to a new list of segment files
+    
+    Args:
+        directory: Index directory
+        name: Index name
+        files: Segment file names, oldest first
+        deleted: Raw ids deleted since the segments were written
+    
+    Returns:
+        Version stamp of the published index
+    """
+    previous = read_manifest(directory, name)
+    version = time.time_ns()
+    manifest = {
+        "version": version,
+        "segments": list(files),
+        "deleted": sorted(doc_id.hex() for doc_id in deleted),
+    }
+    
+    # Publish: replacing the manifest is the atomic switch-over for readers
+    manifest_tmp = directory / f"{name}.manifest.json.tmp"
+    with open(manifest_tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(manifest_tmp, _manifest_path(directory, name))
+    
+    _remove_stale_files(directory, name, keep=set(files) | set(manifest_files(previous)))
+    return version
+
+
+def _remove_stale_files(directory: Path, name: str, keep: set):
+    """
+    Delete segment files that are no longer referenced
+    
+    Workers may still have the previous manifest's files mapped for a moment
+    after the switch, so `keep` covers those too; they go on the next publish.
+    """
+    for path in directory.glob(f"{name}-*.idx"):
+        if path.name in keep:
+            continue
+        try:
+            path.unlink()
+        except OSError as e:
+            # Still mapped by a worker (Windows) - removed on a later publish
+            logger.debug(f"Could not remove stale index file {path}: {e}")
+
+
+def read_manifest(directory: Path, name: str) -> Optional[Dict[str, Any]]:
+    """
+    Read the manifest for an index
+    
+    Returns:
+        Manifest dict with version and segments, or None if no index was
+        published (or only a pre-segment single-file one, which ingestion
+        replaces on its next publish)
+    """
+    path = _manifest_path(directory, name)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if "segments" not in manifest:
+            logger.warning(f"Index manifest {path} predates segmented indexes; re-run ingestion to republish")
+            return None
+        return manifest
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read index manifest {path}: {e}")
+        return None
+
+
+def manifest_files(manifest: Optional[Dict[str, Any]]) -> List[str]:
+    """Segment file names listed by a manifest"""
+    if not manifest:
+        return []
+    return list(manifest.get("segments", ()))
+
+
+def manifest_deleted(manifest: Optional[Dict[str, Any]]) -> FrozenSet[bytes]:
+    """Raw ids a manifest marks as deleted"""
+    if not manifest:
+        return frozenset()
+    return frozenset(bytes.fromhex(doc_id) for doc_id in manifest.get("deleted", ()))
+
+
+def manifest_mtime(directory: Path, name: str) -> Optional[int]:
+    """Modification time of the manifest in ns (cheap staleness probe)"""
+    try:
+        return os.stat(_manifest_path(directory, name)).st_mtime_ns
+    except OSError:
+        return None
+
+
+def open_index_file(path: Path) -> IndexSegment:
+    """
+    Memory-map an index file
+    
+    Args:
+        path: Path to a .idx file
+    
+    Returns:
+        IndexSegment backed by read-only memmaps
+    """
+    with open(path, "rb") as f:
+        magic = f.read(len(MAGIC))
+        if magic != MAGIC:
+            raise ValueError(f"Not a vector index file: {path}")
+        (header_len,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(header_len).decode("utf-8"))
+    
+    if header.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported index format {header.get('format')} in {path}")
+    
+    arrays = {}
+    for section_name, section in header["sections"].items():
+        shape = tuple(section["shape"])
+        if shape[0] == 0:
+            arrays[section_name] = np.empty(shape, dtype=section["dtype"])
+            continue
+        arrays[section_name] = np.memmap(
+            path,
+            dtype=np.dtype(section["dtype"]),
+            mode="r",
+            offset=section["offset"],
+            shape=shape
+        )
+    
+    return IndexSegment(
+        vectors=arrays.pop("vectors"),
+        ids=arrays.pop("ids"),
+        version=header["version"],
+        path=path,
+        header=header,
+        sections=arrays,
+        university_codes=arrays.pop("university_codes", None),
+        university_names=header.get("universities")
+    )
+
+
+def open_segments(
+    directory: Path,
+    manifest: Dict[str, Any],
+    mapped: Optional[Dict[str, IndexSegment]] = None
+) -> List[IndexSegment]:
+    """
+    Map every segment a manifest lists
+    
+    Args:
+        directory: Index directory
+        manifest: Manifest from read_manifest
+        mapped: Already mapped segments by file name, reused instead of remapped
+    
+    Returns:
+        Segments, oldest first
+    """
+    mapped = mapped or {}
+    segments = []
+    for file_name in manifest_files(manifest):
+        segment = mapped.get(file_name)
+        if segment is None:
+            segment = open_index_file(directory / file_name)
+        segments.append(segment)
+    return segments
@@ -1,156 +1,776 @@
 """
 Vector Store Service
-MongoDB Vector Search integration for storing and retrieving document embeddings
+Storing and retrieving document embeddings for RAG
+
+Chunks are persisted by a storage backend (MongoDB, or a local SQLite file with
+a NumPy vector sidecar, see document_storage); search runs on the resident or
+memory-mapped index segments built from it.
 """
 import os
+import copy
+import time
+import heapq
 import logging
-from typing import List, Dict, Any, Optional
+import threading
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Dict, Any, Callable, FrozenSet, Optional, Tuple
 import numpy as np
-from pymongo import MongoClient
-from pymongo.errors import CollectionInvalid, OperationFailure
+from bson import ObjectId
 
-from app.config.db import MongoDBConnection
+from app.services.context_service import ContextService
+from app.services.document_storage import DocumentStorage, create_storage
+from app.services.hnsw_index import (
+    HNSWIndex,
+    DEFAULT_M,
+    DEFAULT_EF_CONSTRUCTION,
+    DEFAULT_EF_SEARCH,
+)
+from app.services.lexical_index import BM25Index, DEFAULT_RRF_K, reciprocal_rank_fusion
+from app.services.sharded_search import ShardPool, mapped_segments, shard_bounds
+from app.services.vector_index import (
+    IndexSegment,
+    IndexView,
+    NATIONAL_CODE,
+    OBJECT_ID_BYTES,
+    get_index_dir,
+    manifest_deleted,
+    manifest_mtime,
+    open_segments,
+    publish_manifest,
+    read_manifest,
+    write_segment,
+)
 
 logger = logging.getLogger(__name__)
 
+# Fields returned for each search hit (embeddings are never fetched at query time)
+RESULT_PROJECTION = {"text": 1, "source": 1, "page": 1, "metadata": 1, "sources": 1}
 
-class VectorStore:
+# Rows converted per step when scoring a float16 index
+SCORE_BLOCK_ROWS = 65536
+
+# Documents decoded and scored per step when scanning storage without an index
+SCAN_BLOCK_ROWS = 1024
+
+# int8 codes are widened through a small reusable buffer that stays in cache
+QUANTIZED_BLOCK_ROWS = 1024
+
+# How embeddings are written to MongoDB: packed float32/float16 BSON Binary,
+# or the legacy BSON array of doubles
+EMBEDDING_STORAGE_MODES = ("float32", "float16", "list")
+DEFAULT_EMBEDDING_STORAGE = "float32"
+
+# IVF (inverted-file) approximate search: below IVF_MIN_VECTORS an exact scan
+# is both fast and exact, so no IVF index is trained or used
+DEFAULT_IVF_MIN_VECTORS = 20000
+DEFAULT_IVF_NPROBE = 8
+
+# Search structure published with the index: "exact" (scan only), "ivf"
+# (k-means lists, large collections only) or "hnsw" (incremental graph)
+INDEX_TYPES = ("exact", "ivf", "hnsw")
+DEFAULT_INDEX_TYPE = "ivf"
+
+# Optional int8 scalar quantization of the published index: exact scans run
+# over the int8 codes and the best limit * rerank factor candidates are
+# re-scored against the full-precision (memory-mapped) vectors
+#
+# "pca" instead keeps a PCA-reduced copy of every row (e.g. 384 -> 96 dims):
+# the first pass scans the reduced rows and only the best PCA_CANDIDATES rows
+# are re-scored at full dimension
+QUANTIZATION_MODES = ("none", "sq8", "pca")
+DEFAULT_SQ8_RERANK_FACTOR = 10
+DEFAULT_PCA_DIMENSIONS = 96
+DEFAULT_PCA_CANDIDATES = 256
+
+# Queries sampled from the index when measuring recall against exact search
+DEFAULT_RECALL_SAMPLE = 200
+RECALL_QUERY_BATCH = 32
+
+# Segmented index: new documents go to a delta segment that is sealed once it
+# reaches INDEX_DELTA_ROWS rows; compaction merges the sealed segments (dropping
+# deleted ids) once there are more than INDEX_MAX_SEGMENTS of them or more than
+# INDEX_MAX_DELETED deleted ids
+DEFAULT_DELTA_ROWS = 4096
+DEFAULT_MAX_SEGMENTS = 8
+DEFAULT_MAX_DELETED = 1000
+DEFAULT_COMPACTION_INTERVAL = 30.0
+
+# Documents whose text is fetched per query when building a BM25 index
+TEXT_FETCH_BATCH = 1000
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize matrix rows in place, leaving all-zero rows untouched"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+
+def _object_ids_to_bytes(ids: List[ObjectId]) -> np.ndarray:
+    """Pack ObjectIds into an (n, 12) uint8 array"""
+    raw = np.frombuffer(b"".join(oid.binary for oid in ids), dtype=np.uint8)
+    return raw.reshape(len(ids), OBJECT_ID_BYTES)
+
+
+def _bytes_to_object_ids(rows: np.ndarray) -> List[ObjectId]:
+    """Unpack (n, 12) uint8 rows back into ObjectIds"""
+    return [ObjectId(row.tobytes()) for row in rows]
+
+
+def _encode_universities(
+    universities: List[Optional[str]],
+    names: Optional[List[str]] = None
+) -> Tuple[np.ndarray, List[str]]:
     """
-    Vector store for RAG system using MongoDB
-    Stores document chunks with embeddings and enables vector search
+    Turn per-row university names into partition codes
+    
+    Args:
+        universities: University of each row (None for national UGC documents)
+        names: Existing label table to extend
+    
+    Returns:
+        (codes, names) where codes[i] indexes names or is NATIONAL_CODE
+    """
+    names = list(names or [])
+    lookup = {name: code for code, name in enumerate(names)}
+    codes = np.empty(len(universities), dtype=np.int16)
+    for i, university in enumerate(universities):
+        if not university:
+            codes[i] = NATIONAL_CODE
+            continue
+        if university not in lookup:
+            lookup[university] = len(names)
+            names.append(university)
+        codes[i] = lookup[university]
+    return codes, names
+
+
+def _concat_segments(segments: List[IndexSegment], drop: FrozenSet[bytes] = frozenset()) -> IndexSegment:
+    """
+    Merge segments into one in-memory segment, oldest rows first
+    
+    Args:
+        segments: Segments to merge
+        drop: Raw ids to leave out (deleted documents)
+    
+    Returns:
+        New float32 segment with merged university labels
+    """
+    vectors, ids, codes = [], [], []
+    names: List[str] = []
+    for segment in segments:
+        keep = slice(None)
+        if drop:
+            keep = np.fromiter(
+                (bytes(row) not in drop for row in segment.ids), dtype=bool, count=len(segment)
+            )
+        segment_codes = segment.university_codes
+        if segment_codes is None:
+            segment_codes = np.full(len(segment), NATIONAL_CODE, dtype=np.int16)
+        # Re-label codes against the merged name table (index -1 stays national)
+        remap, names = _encode_universities(list(segment.university_names), names)
+        remap = np.append(remap, NATIONAL_CODE).astype(np.int16)
+        
+        vectors.append(np.asarray(segment.vectors[keep], dtype=np.float32))
+        ids.append(np.asarray(segment.ids[keep]))
+        codes.append(remap[np.asarray(segment_codes[keep])])
+    
+    return IndexSegment(
+        vectors=np.concatenate(vectors),
+        ids=np.concatenate(ids),
+        university_codes=np.concatenate(codes),
+        university_names=names
+    )
+
+
+def _score(vectors: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """
+    Dot product of every row with the query
+    
+    query may be a (d,) vector or a (d, q) matrix of queries, giving (n,) or
+    (n, q) scores from a single GEMM. float16 indexes are upcast block by
+    block so a query never materializes a float32 copy of the whole matrix.
+    """
+    if vectors.dtype == np.float32:
+        return np.asarray(vectors @ query)
+    scores = np.empty(vectors.shape[:1] + query.shape[1:], dtype=np.float32)
+    for start in range(0, vectors.shape[0], SCORE_BLOCK_ROWS):
+        block = vectors[start:start + SCORE_BLOCK_ROWS]
+        scores[start:start + SCORE_BLOCK_ROWS] = block.astype(np.float32) @ query
+    return scores
+
+
+def _segment_nbytes(segment: IndexSegment) -> int:
+    """Bytes of a segment's vectors, ids and extra sections"""
+    arrays = [segment.vectors, segment.ids, *segment.sections.values()]
+    if segment.university_codes is not None:
+        arrays.append(segment.university_codes)
+    return sum(array.nbytes for array in arrays)
+
+
+def _process_rss_bytes() -> Optional[int]:
+    """Resident set size of this process, where /proc is available"""
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _version_time(version: Optional[int]) -> Optional[str]:
+    """ISO timestamp of a time.time_ns() version stamp"""
+    if not version:
+        return None
+    return datetime.fromtimestamp(version / 1e9, tz=timezone.utc).isoformat()
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k highest scores, best first
+    
+    Uses argpartition so only the k winners are fully sorted
+    """
+    if k <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < scores.size:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(scores.size)
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def _search_runs(vectors: np.ndarray, runs: np.ndarray, query: np.ndarray, limit: int):
+    """
+    Exact top-k over contiguous [start, end) row runs
+    
+    Each run is scored as a zero-copy slice of the (possibly memory-mapped)
+    matrix.
+    
+    Returns:
+        (rows, scores) best first
+    """
+    if runs.shape[0] == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    rows = np.concatenate([np.arange(start, end) for start, end in runs])
+    scores = np.concatenate([_score(vectors[start:end], query) for start, end in runs])
+    top = _top_k(scores, limit)
+    return rows[top], scores[top]
+
+
+def _scan_shard(
+    paths: List[str],
+    query: np.ndarray,
+    limit: int,
+    university: Optional[str],
+    sq8_rerank_factor: int,
+    pca_candidates: int,
+    shard: int,
+    shards: int
+) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Local top-k of one shard of each published segment (runs in a ShardPool worker)
+    
+    The shard's rows are scanned like VectorStore._search_segment does
+    without an ANN structure: exactly, or through the segment's int8 or PCA
+    first pass, or over the university partition runs that fall in the shard.
+    
+    Returns:
+        (rows, scores) per segment, rows numbered within the whole segment
+    """
+    results = []
+    for segment in mapped_segments(paths):
+        start, end = shard_bounds(len(segment), shard, shards)
+        if university:
+            runs = np.clip(segment.partition_runs(university), start, end)
+            results.append(_search_runs(segment.vectors, runs[runs[:, 1] > runs[:, 0]], query, limit))
+            continue
+        
+        vectors = segment.vectors[start:end]
+        quantizer = ScalarQuantizer.from_sections(segment.sections) or PCAProjector.from_sections(segment.sections)
+        if isinstance(quantizer, PCAProjector):
+            rows, scores = quantizer.slice(start, end).search(vectors, query, limit, pca_candidates)
+        elif quantizer is not None:
+            rows, scores = quantizer.slice(start, end).search(vectors, query, limit, sq8_rerank_factor)
+        else:
+            scores = _score(vectors, query)
+            rows = _top_k(scores, limit)
+            scores = scores[rows]
+        results.append((rows + start, scores))
+    return results
+
+
+class IVFIndex:
+    """
+    Inverted-file approximate nearest-neighbour index
+    
+    Rows are assigned to their nearest of n_lists k-means centroids (spherical
+    k-means, since rows are normalized). A query scores the centroids, then
+    scans only the rows posted to the nprobe best lists. Posting lists are
+    stored CSR-style: list i holds rows[offsets[i]:offsets[i + 1]].
     """
     
-    def __init__(self, collection_name: str = "documents"):
+    SECTION_NAMES = ("ivf_centroids", "ivf_offsets", "ivf_rows")
+    
+    def __init__(self, centroids: np.ndarray, offsets: np.ndarray, rows: np.ndarray):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.rows = rows
+    
+    @property
+    def n_lists(self) -> int:
+        return self.centroids.shape[0]
+    
+    @classmethod
+    def train(
+        cls,
+        vectors: np.ndarray,
+        n_lists: Optional[int] = None,
+        iterations: int = 10,
+        sample_size: int = 100000,
+        seed: int = 0
+    ) -> "IVFIndex":
         """
-        Initialize vector store
+        Train centroids with k-means on a sample and post every row to a list
         
         Args:
-            collection_name: Name of MongoDB collection to store documents
+            vectors: (n, d) normalized embeddings
+            n_lists: Number of lists (default: about sqrt(n))
+            iterations: k-means iterations
+            sample_size: Rows sampled for training
+            seed: Random seed (training is deterministic for a given corpus)
+        
+        Returns:
+            Trained IVFIndex
         """
-        self.collection_name = collection_name
-        self.db = None
-        self.collection = None
-        self.embedding_dimension = None  # Will be set when first document is stored
+        n = vectors.shape[0]
+        if n == 0:
+            raise ValueError("Cannot train an IVF index on an empty matrix")
+        n_lists = max(1, min(n_lists or int(np.sqrt(n)), n))
+        rng = np.random.default_rng(seed)
         
-        # Connect to MongoDB
-        self._connect()
-    
-    def _connect(self):
-        """Connect to MongoDB and get collection"""
-        try:
-            self.db = MongoDBConnection.get_db()
-            if self.db is None:
-                logger.warning("MongoDB not connected. Vector store operations will fail.")
-                return
-            
-            self.collection = self.db[self.collection_name]
-            logger.info(f"Vector store connected to collection: {self.collection_name}")
+        sample_rows = np.sort(rng.choice(n, size=min(n, max(sample_size, n_lists)), replace=False))
+        sample = np.asarray(vectors[sample_rows], dtype=np.float32)
+        centroids = sample[rng.choice(sample.shape[0], size=n_lists, replace=False)].copy()
+        
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            counts = np.bincount(assignment, minlength=n_lists)
             
-        except Exception as e:
-            logger.error(f"Error connecting to MongoDB: {e}", exc_info=True)
-            self.db = None
-            self.collection = None
+            # Re-seed empty lists from random sample rows
+            empty = counts == 0
+            if empty.any():
+                sums[empty] = sample[rng.choice(sample.shape[0], size=int(empty.sum()))]
+            centroids = _normalize_rows(sums)
+        
+        assignment = cls._assign(vectors, centroids)
+        rows = np.argsort(assignment, kind="stable").astype(np.int64)
+        offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=n_lists), out=offsets[1:])
+        
+        logger.info(f"Trained IVF index: {n_lists} lists over {n} vectors")
+        return cls(centroids.astype(np.float32), offsets, rows)
     
-    def _ensure_index(self, embedding_dimension: int):
+    @staticmethod
+    def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        """Nearest centroid for every row, computed block by block"""
+        assignment = np.empty(vectors.shape[0], dtype=np.int64)
+        for start in range(0, vectors.shape[0], SCORE_BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+            assignment[start:start + SCORE_BLOCK_ROWS] = np.argmax(block @ centroids.T, axis=1)
+        return assignment
+    
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """Row numbers posted to the nprobe lists closest to the query"""
+        probe = _top_k(self.centroids @ query, min(nprobe, self.n_lists))
+        return np.concatenate([self.rows[self.offsets[i]:self.offsets[i + 1]] for i in probe])
+    
+    def search(self, vectors: np.ndarray, query: np.ndarray, k: int, nprobe: int):
         """
-        Ensure vector search index exists on the collection
+        Approximate top-k search
         
         Args:
-            embedding_dimension: Dimension of embedding vectors
+            vectors: The (n, d) rows this index was trained on
+            query: Normalized query vector
+            k: Number of results
+            nprobe: Number of lists to scan
+        
+        Returns:
+            (rows, scores) best first
         """
-        if self.db is None:
-            logger.warning("Cannot create index: MongoDB not connected")
-            return
+        rows = np.sort(self.candidates(query, nprobe))
+        scores = _score(vectors[rows], query)
+        top = _top_k(scores, k)
+        return rows[top], scores[top]
+    
+    def to_sections(self) -> Dict[str, np.ndarray]:
+        """Arrays to persist in the index file"""
+        return dict(zip(self.SECTION_NAMES, (self.centroids, self.offsets, self.rows)))
+    
+    @classmethod
+    def from_sections(cls, sections: Dict[str, np.ndarray]) -> Optional["IVFIndex"]:
+        """Rebuild from index file sections, or None if the file has no IVF index"""
+        if not all(name in sections for name in cls.SECTION_NAMES):
+            return None
+        return cls(*(sections[name] for name in cls.SECTION_NAMES))
+
+
+class ScalarQuantizer:
+    """
+    Per-dimension int8 scalar quantization
+    
+    Each dimension's [min, max] range is mapped onto the 256 int8 levels, so
+    x ~= code * scale + offset. A query is scored against the codes as
+    (q * scale) . code + q . offset, i.e. one small-matrix product per block
+    over a quarter of the float32 bytes.
+    """
+    
+    SECTION_NAMES = ("sq8_codes", "sq8_scale", "sq8_offset")
+    
+    def __init__(self, codes: np.ndarray, scale: np.ndarray, offset: np.ndarray):
+        self.codes = codes
+        self.scale = scale
+        self.offset = offset
+    
+    @classmethod
+    def train(cls, vectors: np.ndarray) -> "ScalarQuantizer":
+        """
+        Compute per-dimension ranges and encode every row
         
-        try:
-            # Check if index already exists
-            indexes = self.collection.list_indexes()
-            index_names = [idx['name'] for idx in indexes]
-            
-            if 'vector_index' in index_names:
-                logger.info("Vector index already exists")
-                return
-            
-            # Create vector search index
-            # Note: MongoDB Atlas Vector Search requires specific index configuration
-            # For local MongoDB, we'll use a workaround with cosine similarity calculation
-            
-            # Create a regular index on embedding field for faster queries
-            self.collection.create_index([("embedding", 1)])
-            logger.info("Created index on embedding field")
-            
-            # For MongoDB Atlas, you would create a vector search index like this:
-            # {
-            #   "name": "vector_index",
-            #   "type": "vectorSearch",
-            #   "definition": {
-            #     "fields": [{
-            #       "type": "vector",
-            #       "path": "embedding",
-            #       "numDimensions": embedding_dimension,
-            #       "similarity": "cosine"
-            #     }]
-            #   }
-            # }
-            
-            self.embedding_dimension = embedding_dimension
-            
-        except Exception as e:
-            logger.warning(f"Could not create vector index: {e}")
-            logger.info("Will use cosine similarity calculation instead")
+        Args:
+            vectors: (n, d) embeddings
+        
+        Returns:
+            ScalarQuantizer holding the int8 codes
+        """
+        n, dimension = vectors.shape
+        low = np.full(dimension, np.inf, dtype=np.float32)
+        high = np.full(dimension, -np.inf, dtype=np.float32)
+        for start in range(0, n, SCORE_BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+            np.minimum(low, block.min(axis=0), out=low)
+            np.maximum(high, block.max(axis=0), out=high)
+        
+        scale = (high - low) / 255.0
+        scale[scale == 0] = 1.0
+        offset = low + 128.0 * scale
+        
+        codes = np.empty((n, dimension), dtype=np.int8)
+        for start in range(0, n, SCORE_BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+            codes[start:start + SCORE_BLOCK_ROWS] = np.clip(np.rint((block - offset) / scale), -128, 127)
+        
+        logger.info(f"Quantized {n} vectors to int8 ({codes.nbytes / 1e6:.1f} MB)")
+        return cls(codes, scale.astype(np.float32), offset.astype(np.float32))
+    
+    def score(self, query: np.ndarray) -> np.ndarray:
+        """Approximate dot product of every row with the query"""
+        scaled_query = query * self.scale
+        bias = float(query @ self.offset)
+        scores = np.empty(self.codes.shape[0], dtype=np.float32)
+        buffer = np.empty((QUANTIZED_BLOCK_ROWS, self.codes.shape[1]), dtype=np.float32)
+        for start in range(0, self.codes.shape[0], QUANTIZED_BLOCK_ROWS):
+            block = self.codes[start:start + QUANTIZED_BLOCK_ROWS]
+            widened = buffer[:block.shape[0]]
+            np.copyto(widened, block)
+            scores[start:start + block.shape[0]] = widened @ scaled_query
+        scores += bias
+        return scores
+    
+    def search(self, vectors: np.ndarray, query: np.ndarray, k: int, rerank_factor: int):
+        """
+        First pass over the int8 codes, exact re-ranking of the best candidates
+        
+        Args:
+            vectors: Full-precision rows (only candidate rows are read)
+            query: Normalized query vector
+            k: Number of results
+            rerank_factor: Candidates re-scored per requested result
+        
+        Returns:
+            (rows, scores) best first, with exact scores
+        """
+        candidates = np.sort(_top_k(self.score(query), k * max(rerank_factor, 1)))
+        exact = _score(vectors[candidates], query)
+        top = _top_k(exact, k)
+        return candidates[top], exact[top]
+    
+    def to_sections(self) -> Dict[str, np.ndarray]:
+        """Arrays to persist in the index file"""
+        return dict(zip(self.SECTION_NAMES, (self.codes, self.scale, self.offset)))
+    
+    def slice(self, start: int, end: int) -> "ScalarQuantizer":
+        """Quantizer over rows [start, end) only (zero-copy)"""
+        return ScalarQuantizer(self.codes[start:end], self.scale, self.offset)
+    
+    @classmethod
+    def from_sections(cls, sections: Dict[str, np.ndarray]) -> Optional["ScalarQuantizer"]:
+        """Rebuild from index file sections, or None if the file is not quantized"""
+        if not all(name in sections for name in cls.SECTION_NAMES):
+            return None
+        return cls(*(sections[name] for name in cls.SECTION_NAMES))
+
+
+class PCAProjector:
+    """
+    Principal-component projection for a coarse first pass
+    
+    Rows are stored as y = P (x - mean), where the rows of P are the top
+    principal components. Since x ~= mean + P^T y, a query scores as
+    y . (P q) + mean . q: one scan over the reduced rows, reading a fraction
+    (dimensions / d) of the full-precision bytes.
+    """
+    
+    SECTION_NAMES = ("pca_mean", "pca_components", "pca_vectors")
+    
+    def __init__(self, mean: np.ndarray, components: np.ndarray, vectors: np.ndarray):
+        self.mean = mean
+        self.components = components
+        self.vectors = vectors
     
-    def store_documents(self, chunks: List[Dict[str, Any]], embeddings: List[np.ndarray]) -> int:
+    @property
+    def dimensions(self) -> int:
+        return self.components.shape[0]
+    
+    @classmethod
+    def train(cls, vectors: np.ndarray, dimensions: int) -> "PCAProjector":
+        """
+        Fit the principal components and project every row
+        
+        Args:
+            vectors: (n, d) embeddings
+            dimensions: Number of components to keep (< d)
+        
+        Returns:
+            PCAProjector holding the reduced rows
+        """
+        n, dimension = vectors.shape
+        total = np.zeros(dimension, dtype=np.float64)
+        for start in range(0, n, SCORE_BLOCK_ROWS):
+            total += np.asarray(vectors[start:start + SCORE_BLOCK_ROWS], dtype=np.float64).sum(axis=0)
+        mean = total / max(n, 1)
+        
+        covariance = np.zeros((dimension, dimension), dtype=np.float64)
+        for start in range(0, n, SCORE_BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + SCORE_BLOCK_ROWS], dtype=np.float64) - mean
+            covariance += block.T @ block
+        eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+        order = np.argsort(eigenvalues)[::-1][:dimensions]
+        components = np.ascontiguousarray(eigenvectors[:, order].T, dtype=np.float32)
+        mean = mean.astype(np.float32)
+        
+        reduced = np.empty((n, components.shape[0]), dtype=np.float32)
+        for start in range(0, n, SCORE_BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + SCORE_BLOCK_ROWS], dtype=np.float32) - mean
+            reduced[start:start + SCORE_BLOCK_ROWS] = block @ components.T
+        
+        variance = float(eigenvalues.sum())
+        explained = float(eigenvalues[order].sum()) / variance if variance > 0 else 1.0
+        logger.info(
+            f"Projected {n} vectors to {components.shape[0]} PCA dimensions "
+            f"({explained:.1%} of variance, {reduced.nbytes / 1e6:.1f} MB)"
+        )
+        return cls(mean, components, reduced)
+    
+    def score(self, query: np.ndarray) -> np.ndarray:
+        """Approximate dot product of every row with the query"""
+        scores = _score(self.vectors, self.components @ query)
+        scores += float(self.mean @ query)
+        return scores
+    
+    def search(self, vectors: np.ndarray, query: np.ndarray, k: int, candidates: int):
+        """
+        First pass over the reduced rows, exact re-ranking of the best candidates
+        
+        Args:
+            vectors: Full-precision rows (only candidate rows are read)
+            query: Normalized query vector
+            k: Number of results
+            candidates: Rows re-scored at full dimension (at least k)
+        
+        Returns:
+            (rows, scores) best first, with exact scores
+        """
+        rows = np.sort(_top_k(self.score(query), max(candidates, k)))
+        exact = _score(vectors[rows], query)
+        top = _top_k(exact, k)
+        return rows[top], exact[top]
+    
+    def to_sections(self) -> Dict[str, np.ndarray]:
+        """Arrays to persist in the index file"""
+        return dict(zip(self.SECTION_NAMES, (self.mean, self.components, self.vectors)))
+    
+    def slice(self, start: int, end: int) -> "PCAProjector":
+        """Projection of rows [start, end) only (zero-copy)"""
+        return PCAProjector(self.mean, self.components, self.vectors[start:end])
+    
+    @classmethod
+    def from_sections(cls, sections: Dict[str, np.ndarray]) -> Optional["PCAProjector"]:
+        """Rebuild from index file sections, or None if the file has no projection"""
+        if not all(name in sections for name in cls.SECTION_NAMES):
+            return None
+        return cls(*(sections[name] for name in cls.SECTION_NAMES))
+
+
+class VectorStore:
+    """
+    Vector store for RAG system using MongoDB or a local SQLite store
+    Stores document chunks with embeddings and enables vector search
+    """
+    
+    def __init__(
+        self,
+        collection_name: str = "documents",
+        index_dir: Optional[str] = None,
+        embedding_storage: Optional[str] = None,
+        nprobe: Optional[int] = None,
+        index_type: Optional[str] = None,
+        ef_search: Optional[int] = None,
+        backend: Optional[str] = None,
+        shards: Optional[int] = None
+    ):
+        """
+        Initialize vector store
+        
+        Args:
+            collection_name: Name of MongoDB collection (or SQLite file) to store documents
+            index_dir: Directory of published index files (default: VECTOR_INDEX_DIR, else
+                       data/index for MongoDB and the store's index/ directory for SQLite)
+            embedding_storage: How new embeddings are written: "float32", "float16" or "list"
+                               (default: EMBEDDING_STORAGE or float32)
+            nprobe: IVF lists scanned per query (default: IVF_NPROBE or 8)
+            index_type: "exact", "ivf" or "hnsw" (default: VECTOR_INDEX_TYPE or ivf)
+            ef_search: HNSW candidate list size per query (default: HNSW_EF_SEARCH or 64)
+            backend: Chunk storage, "mongodb" or "sqlite" (default: VECTOR_STORE_BACKEND or mongodb)
+            shards: Worker processes that split exact scans of published segments
+                    (default: VECTOR_SEARCH_SHARDS or 1, i.e. scan in-process)
         """
-        Store document chunks with their embeddings in MongoDB
+        embedding_storage = embedding_storage or os.getenv("EMBEDDING_STORAGE", DEFAULT_EMBEDDING_STORAGE)
+        if embedding_storage not in EMBEDDING_STORAGE_MODES:
+            raise ValueError(
+                f"Unsupported embedding storage: {embedding_storage}. Use one of {EMBEDDING_STORAGE_MODES}"
+            )
+        index_type = index_type or os.getenv("VECTOR_INDEX_TYPE", DEFAULT_INDEX_TYPE)
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unsupported index type: {index_type}. Use one of {INDEX_TYPES}")
+        
+        self.collection_name = collection_name
+        self.embedding_storage = embedding_storage
+        self.embedding_dimension = None  # Will be set when first document is stored
+        
+        # Chunk text, metadata and embeddings
+        self.storage: DocumentStorage = create_storage(backend, collection_name, embedding_storage)
+        
+        # Resident index: segments of normalized embedding rows plus their
+        # document ids. Memory-mapped from the published segment files when they
+        # exist (shared page cache across workers), otherwise built from storage
+        # on first search. Searches read self._view once and never lock; writers
+        # serialize on _index_lock and swap in a new view.
+        if index_dir:
+            self.index_dir = Path(index_dir)
+        elif self.storage.index_dir is not None and not os.getenv("VECTOR_INDEX_DIR"):
+            self.index_dir = self.storage.index_dir
+        else:
+            self.index_dir = get_index_dir()
+        self._view: Optional[IndexView] = None
+        self._manifest_mtime: Optional[int] = None
+        self._index_lock = threading.Lock()
+        
+        # Delta sealing and compaction
+        self.delta_rows = int(os.getenv("INDEX_DELTA_ROWS", DEFAULT_DELTA_ROWS))
+        self.max_segments = int(os.getenv("INDEX_MAX_SEGMENTS", DEFAULT_MAX_SEGMENTS))
+        self.max_deleted = int(os.getenv("INDEX_MAX_DELETED", DEFAULT_MAX_DELETED))
+        self._compaction_lock = threading.Lock()
+        self._compaction_thread: Optional[threading.Thread] = None
+        self._compaction_wakeup = threading.Event()
+        self._compaction_stop = threading.Event()
+        
+        # Approximate search settings (IVF is used only when the published
+        # index carries one and the collection is large enough)
+        self.index_type = index_type
+        self.nprobe = nprobe or int(os.getenv("IVF_NPROBE", DEFAULT_IVF_NPROBE))
+        self.ivf_min_vectors = int(os.getenv("IVF_MIN_VECTORS", DEFAULT_IVF_MIN_VECTORS))
+        self.hnsw_m = int(os.getenv("HNSW_M", DEFAULT_M))
+        self.hnsw_ef_construction = int(os.getenv("HNSW_EF_CONSTRUCTION", DEFAULT_EF_CONSTRUCTION))
+        self.ef_search = ef_search or int(os.getenv("HNSW_EF_SEARCH", DEFAULT_EF_SEARCH))
+        self.sq8_rerank_factor = int(os.getenv("SQ8_RERANK_FACTOR", DEFAULT_SQ8_RERANK_FACTOR))
+        self.pca_dimensions = int(os.getenv("PCA_DIMENSIONS", DEFAULT_PCA_DIMENSIONS))
+        self.pca_candidates = int(os.getenv("PCA_CANDIDATES", DEFAULT_PCA_CANDIDATES))
+        
+        # Sharded exact scans (see sharded_search)
+        self.shard_pool = ShardPool(shards)
+    
+    def store_documents(
+        self,
+        chunks: List[Dict[str, Any]],
+        embeddings: np.ndarray,
+        on_stored: Optional[Callable[[List[Dict[str, Any]]], None]] = None
+    ) -> int:
+        """
+        Store document chunks with their embeddings
         
         Args:
             chunks: List of chunk dictionaries with text and metadata
-            embeddings: List of numpy arrays (embeddings for each chunk)
+            embeddings: (len(chunks), d) float32 array, row i for chunks[i]
+                        (as returned by EmbeddingService.batch_embed); storage
+                        batches are views of it, not copies
+            on_stored: Called with the chunks of each batch that was inserted
+                       (a failed batch is logged and skipped)
             
         Returns:
             Number of documents stored
         """
-        if self.collection is None:
-            raise RuntimeError("MongoDB not connected. Cannot store documents.")
+        if not self.storage.connected:
+            raise RuntimeError(f"{self.storage.name} not connected. Cannot store documents.")
         
+        # No copy for a float32 matrix; a list of 1-D arrays is stacked once
+        embeddings = np.asarray(embeddings, dtype=np.float32)
         if len(chunks) != len(embeddings):
             raise ValueError(f"Mismatch: {len(chunks)} chunks but {len(embeddings)} embeddings")
         
         try:
-            # Set embedding dimension from first embedding
-            if self.embedding_dimension is None and len(embeddings) > 0:
-                self.embedding_dimension = len(embeddings[0])
-                self._ensure_index(self.embedding_dimension)
+            if len(chunks) == 0:
+                logger.warning("No valid documents to store")
+                return 0
+            
+            # Set embedding dimension from the embeddings
+            if self.embedding_dimension is None and embeddings.ndim == 2:
+                self.embedding_dimension = embeddings.shape[1]
+                self.storage.ensure_index(self.embedding_dimension)
+            
+            # Validate embedding dimension
+            if embeddings.ndim != 2 or embeddings.shape[1] != self.embedding_dimension:
+                logger.warning(
+                    f"Embedding dimension mismatch: expected {self.embedding_dimension}, "
+                    f"got {embeddings.shape[1:]}. Skipping {len(chunks)} chunks."
+                )
+                return 0
             
             # Prepare documents for insertion
             documents = []
-            for chunk, embedding in zip(chunks, embeddings):
-                # Convert numpy array to list for MongoDB storage
-                embedding_list = embedding.tolist() if isinstance(embedding, np.ndarray) else embedding
-                
-                # Validate embedding dimension
-                if len(embedding_list) != self.embedding_dimension:
-                    logger.warning(
-                        f"Embedding dimension mismatch: expected {self.embedding_dimension}, "
-                        f"got {len(embedding_list)}. Skipping chunk."
-                    )
-                    continue
-                
+            for chunk in chunks:
                 doc = {
                     "text": chunk.get("text", ""),
-                    "embedding": embedding_list,
                     "source": chunk.get("source", "unknown"),
                     "page": chunk.get("page"),
                     "metadata": chunk.get("metadata", {}),
                     "chunk_index": chunk.get("chunk_index", 0),
-                    "char_count": chunk.get("char_count", 0)
+                    "char_count": chunk.get("char_count", 0),
+                    "university": chunk.get("university")
                 }
+                # Set by NearDuplicateDetector.collapse
+                if chunk.get("_id") is not None:
+                    doc["_id"] = chunk["_id"]
+                if chunk.get("minhash") is not None:
+                    doc["minhash"] = chunk["minhash"]
+                if chunk.get("sources"):
+                    doc["sources"] = chunk["sources"]
                 documents.append(doc)
             
-            if not documents:
-                logger.warning("No valid documents to store")
-                return 0
-            
             # Insert documents in batches to avoid timeout
             batch_size = 100  # Insert 100 documents at a time
             stored_count = 0
@@ -158,9 +778,17 @@ class VectorStore:
             for i in range(0, len(documents), batch_size):
                 batch = documents[i:i + batch_size]
                 try:
-                    result = self.collection.insert_many(batch, ordered=False)  # ordered=False for better performance
-                    stored_count += len(result.inserted_ids)
-                    logger.debug(f"Stored batch {i//batch_size + 1}: {len(result.inserted_ids)} documents")
+                    batch_vectors = embeddings[i:i + batch_size]
+                    inserted_ids = self.storage.insert(batch, batch_vectors)
+                    stored_count += len(inserted_ids)
+                    self._append_to_delta(
+                        inserted_ids,
+                        batch_vectors,
+                        [doc["university"] for doc in batch]
+                    )
+                    if on_stored is not None:
+                        on_stored(chunks[i:i + batch_size])
+                    logger.debug(f"Stored batch {i//batch_size + 1}: {len(inserted_ids)} documents")
                 except Exception as e:
                     logger.warning(f"Error inserting batch {i//batch_size + 1}: {e}")
                     # Continue with next batch even if one fails
@@ -173,83 +801,945 @@ class VectorStore:
             logger.error(f"Error storing documents: {e}", exc_info=True)
             raise
     
-    def search_similar(self, query_embedding: np.ndarray, limit: int = 5, min_score: float = 0.0) -> List[Dict[str, Any]]:
+    def _build_resident_index(self):
+        """
+        Load all stored embeddings into one contiguous float32 segment
+        
+        Only _id and embedding are read here; text and metadata stay in storage
+        and are fetched per query for the winning ids only.
+        """
+        ids = []
+        blocks = []
+        universities = []
+        
+        # Chunks ingested before university partitioning have no "university"
+        # field; derive it from the source file name (once per source)
+        context_service = ContextService()
+        source_universities: Dict[str, Optional[str]] = {}
+        
+        for block_ids, block, docs in self.storage.iter_embeddings(self.embedding_dimension):
+            ids.extend(block_ids)
+            blocks.append(block)
+            for doc in docs:
+                if "university" in doc:
+                    universities.append(doc["university"])
+                else:
+                    source = doc.get("source", "")
+                    if source not in source_universities:
+                        source_universities[source] = context_service.detect_university(source)
+                    universities.append(source_universities[source])
+        
+        if blocks:
+            matrix = _normalize_rows(np.concatenate(blocks))
+            dimension = matrix.shape[1]
+        else:
+            dimension = self.embedding_dimension
+            matrix = np.empty((0, dimension or 0), dtype=np.float32)
+        
+        university_codes, university_names = _encode_universities(universities)
+        segment = IndexSegment(
+            vectors=matrix,
+            ids=_object_ids_to_bytes(ids),
+            university_codes=university_codes,
+            university_names=university_names
+        )
+        
+        with self._index_lock:
+            self._view = IndexView(
+                segments=(segment,) if len(segment) else (),
+                delta=IndexSegment.empty(matrix.shape[1])
+            )
+            if self.embedding_dimension is None and dimension is not None:
+                self.embedding_dimension = dimension
+        
+        logger.info(f"Resident vector index built: {matrix.shape[0]} vectors, dimension {matrix.shape[1]}")
+    
+    def _append_to_delta(
+        self,
+        inserted_ids: List[Any],
+        vectors: np.ndarray,
+        universities: List[Optional[str]]
+    ):
+        """
+        Add freshly inserted documents to the delta segment (if the index is loaded)
+        
+        Only the small delta is copied; once it reaches delta_rows rows it is
+        sealed as an immutable segment and a new empty delta is started.
+        
+        Args:
+            inserted_ids: Document ids returned by the storage insert
+            vectors: (n, d) embeddings of the inserted documents, in the same order
+            universities: University partition of each document
+        """
+        if self._view is None or not inserted_ids:
+            return
+        
+        new_codes, new_names = _encode_universities(universities)
+        batch = IndexSegment(
+            # Copied: normalized in place and kept by the index, while vectors
+            # may be a view of the caller's embeddings
+            vectors=_normalize_rows(np.array(vectors, dtype=np.float32)),
+            ids=_object_ids_to_bytes(inserted_ids),
+            university_codes=new_codes,
+            university_names=new_names
+        )
+        
+        with self._index_lock:
+            view = self._view
+            if len(view) > 0 and view.dimension != batch.dimension:
+                logger.warning("Embedding dimension changed; rebuild the index with update_index()")
+                return
+            delta = _concat_segments([view.delta, batch]) if len(view.delta) else batch
+            segments = view.segments
+            if len(delta) >= self.delta_rows:
+                segments = segments + (delta,)
+                delta = IndexSegment.empty(delta.dimension)
+                logger.info(f"Sealed delta segment ({len(segments[-1])} vectors, {len(segments)} segments)")
+                self._compaction_wakeup.set()
+            self._view = IndexView(segments, delta, view.deleted, view.version)
+    
+    def add_sources(self, sources_by_id: Dict[ObjectId, List[Dict[str, Any]]]) -> int:
+        """
+        Record extra sources on stored chunks that new near-duplicates collapsed into
+        
+        Args:
+            sources_by_id: Stored chunk id -> {"source", "page"} entries to add
+        
+        Returns:
+            Number of chunks updated
+        """
+        if not self.storage.connected:
+            raise RuntimeError(f"{self.storage.name} not connected. Cannot update documents.")
+        if not sources_by_id:
+            return 0
+        return self.storage.add_sources(sources_by_id)
+    
+    def iter_signatures(self):
+        """
+        MinHash signatures of stored chunks, for NearDuplicateDetector.load()
+        
+        Yields:
+            (id, uint32 signature, university) tuples
+        """
+        if not self.storage.connected:
+            return
+        yield from self.storage.iter_signatures()
+    
+    def delete_documents(self, query_filter: Dict[str, Any]) -> int:
+        """
+        Delete chunks from storage and from the index
+        
+        Deleted ids are masked out of searches immediately and physically
+        dropped from the segments by the next compaction.
+        
+        Args:
+            query_filter: MongoDB-style filter selecting the chunks to delete (the
+                          SQLite backend supports equality, $in and $ne on
+                          _id, source, page, university and chunk_index)
+        
+        Returns:
+            Number of chunks deleted
+        """
+        if not self.storage.connected:
+            raise RuntimeError(f"{self.storage.name} not connected. Cannot delete documents.")
+        
+        doc_ids = self.storage.find_ids(query_filter)
+        if not doc_ids:
+            return 0
+        
+        self.storage.delete(doc_ids)
+        
+        with self._index_lock:
+            view = self._view
+            if view is not None:
+                deleted = view.deleted | {doc_id.binary for doc_id in doc_ids}
+                self._view = IndexView(view.segments, view.delta, frozenset(deleted), view.version)
+                if len(deleted) > self.max_deleted:
+                    self._compaction_wakeup.set()
+        
+        logger.info(f"Deleted {len(doc_ids)} document chunks")
+        return len(doc_ids)
+    
+    def delete_source(self, source: str) -> int:
+        """
+        Delete every chunk of one source document (e.g. before re-ingesting it)
+        
+        Chunks first stored from another document only lose this source from
+        their near-duplicate "sources" list.
+        """
+        if not self.storage.connected:
+            raise RuntimeError(f"{self.storage.name} not connected. Cannot delete documents.")
+        self.storage.pull_source(source)
+        return self.delete_documents({"source": source})
+    
+    def get_sources(self) -> List[str]:
+        """Names of all source documents in the store"""
+        if not self.storage.connected:
+            return []
+        return sorted(self.storage.distinct_sources())
+    
+    def count_by_source(self) -> Dict[str, int]:
+        """Stored chunks (one vector each) per source document"""
+        if not self.storage.connected:
+            return {}
+        return dict(sorted(self.storage.count_by_source().items()))
+    
+    def _refresh_mapped_index(self):
+        """
+        Map the published segments, or remap when a newer manifest appears
+        
+        Only the manifest mtime is checked on the hot path; the manifest itself
+        is read when that changes, and only segment files not already mapped
+        are opened.
+        """
+        mtime = manifest_mtime(self.index_dir, self.collection_name)
+        if mtime is None or mtime == self._manifest_mtime:
+            return
+        
+        with self._index_lock:
+            if mtime == self._manifest_mtime:
+                return
+            self._manifest_mtime = mtime
+            
+            manifest = read_manifest(self.index_dir, self.collection_name)
+            if manifest is None:
+                return
+            current = self._view
+            if current is not None and current.version == manifest.get("version"):
+                return
+            
+            mapped = {}
+            if current is not None:
+                mapped = {segment.path.name: segment for segment in current.segments if segment.path}
+            try:
+                segments = open_segments(self.index_dir, manifest, mapped)
+                for segment in segments:
+                    if segment.path.name not in mapped:
+                        self._load_search_structures(segment)
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Could not map vector index {manifest.get('version')}: {e}")
+                return
+            
+            dimension = segments[0].dimension if segments else (self.embedding_dimension or 0)
+            self._view = IndexView(
+                segments=tuple(segments),
+                delta=IndexSegment.empty(dimension),
+                deleted=manifest_deleted(manifest),
+                version=manifest.get("version")
+            )
+            if self.embedding_dimension is None and segments:
+                self.embedding_dimension = dimension
+            logger.info(
+                f"Mapped vector index version {manifest.get('version')} "
+                f"({len(self._view)} vectors in {len(segments)} segments)"
+            )
+    
+    def _load_search_structures(self, segment: IndexSegment):
+        """Attach the ANN, quantizer and BM25 structures stored in a mapped segment"""
+        segment.ann = self._load_ann(segment)
+        segment.quantizer = (
+            ScalarQuantizer.from_sections(segment.sections) or PCAProjector.from_sections(segment.sections)
+        )
+        segment.lexical = BM25Index.from_sections(segment.sections, segment.header.get("bm25"))
+    
+    def _load_ann(self, segment: IndexSegment):
+        """Approximate search structure of a mapped segment for this store's index_type"""
+        if self.index_type == "ivf":
+            return IVFIndex.from_sections(segment.sections)
+        if self.index_type == "hnsw":
+            hnsw = HNSWIndex.from_sections(segment.sections)
+            if hnsw is None and len(segment) > 0:
+                logger.warning("Published vector index segment has no HNSW graph; using exact search")
+            return hnsw
+        return None
+    
+    def _build_hnsw(self, segment: IndexSegment, base: Optional[IndexSegment] = None) -> HNSWIndex:
+        """
+        HNSW graph covering every row of the segment
+        
+        Extends the graph of `base` (typically the oldest segment being merged)
+        when its ids are a prefix of this segment's ids, so compacting after
+        adding one handbook only inserts the new rows.
+        """
+        hnsw = None
+        if (
+            base is not None
+            and isinstance(base.ann, HNSWIndex)
+            and len(base.ann) == len(base) <= len(segment)
+            and np.array_equal(base.ids, segment.ids[:len(base)])
+        ):
+            # The base graph may still serve searches on the old view
+            hnsw = copy.deepcopy(base.ann)
+        
+        if hnsw is None or hnsw.M != self.hnsw_m:
+            hnsw = HNSWIndex(M=self.hnsw_m, ef_construction=self.hnsw_ef_construction)
+        
+        hnsw.add(segment.vectors)
+        return hnsw
+    
+    def _build_lexical_index(self, segment: IndexSegment) -> BM25Index:
+        """BM25 index over the chunk text of every row of the segment"""
+        texts_by_id = {}
+        object_ids = _bytes_to_object_ids(segment.ids)
+        for start in range(0, len(object_ids), TEXT_FETCH_BATCH):
+            batch = object_ids[start:start + TEXT_FETCH_BATCH]
+            for doc_id, doc in self.storage.fetch(batch, ("text",)).items():
+                texts_by_id[doc_id] = doc.get("text", "")
+        
+        return BM25Index.build([texts_by_id.get(doc_id, "") for doc_id in object_ids])
+    
+    def _get_lexical_index(self, segment: IndexSegment) -> BM25Index:
+        """The segment's BM25 index, built from stored text if it has none yet"""
+        lexical = segment.lexical
+        if lexical is None or len(lexical) != len(segment):
+            lexical = self._build_lexical_index(segment)
+            segment.lexical = lexical
+        return lexical
+    
+    def _get_index_view(self) -> IndexView:
+        """Return the current index view, mapping or building it on first use"""
+        self._refresh_mapped_index()
+        if self._view is None:
+            self._build_resident_index()
+        return self._view
+    
+    def load_index(self) -> IndexView:
+        """
+        Load the index now (mapped if published, else built from storage)
+        
+        Call before store_documents() so new chunks go to the delta segment
+        instead of requiring a full rebuild.
+        """
+        return self._get_index_view()
+    
+    def warm_up(self) -> Dict[str, Any]:
+        """
+        Load everything the first search would otherwise load
+        
+        Maps (or builds) the index, builds BM25 postings missing from its
+        segments, reads the vectors once so their pages are resident and runs
+        one probe search (which also starts the shard workers, if any).
+        
+        Returns:
+            {"version", "vectors", "segments"}
+        """
+        view = self._get_index_view()
+        probe = None
+        for segment in view.searchable():
+            self._get_lexical_index(segment)
+            for start in range(0, len(segment), SCORE_BLOCK_ROWS):
+                segment.vectors[start:start + SCORE_BLOCK_ROWS].sum()
+            if probe is None and len(segment):
+                probe = np.asarray(segment.vectors[0], dtype=np.float32)
+        if probe is not None:
+            self._search_view(view, probe, 1)
+        return {"version": view.version, "vectors": len(view), "segments": len(view.segments)}
+    
+    def index_version(self) -> Tuple[Optional[int], int, int]:
+        """
+        Token that changes whenever search results can change
+        
+        Combines the published version (new segments or compaction, also from
+        another process) with the row and deleted-id counts (delta appends and
+        deletes made through this store).
+        """
+        view = self._get_index_view()
+        return (view.version, len(view), len(view.deleted))
+    
+    def _write_segment_file(self, segment: IndexSegment, dtype: str, quantization: str, base: Optional[IndexSegment] = None):
+        """
+        Build the search structures of a sealed segment and write its file
+        
+        Args:
+            segment: In-memory segment to persist
+            dtype: Vector storage dtype
+            quantization: "sq8", "pca" or "none"
+            base: Segment whose HNSW graph may be extended (see _build_hnsw)
+        """
+        started = time.perf_counter()
+        sections = {}
+        meta = {"index_type": self.index_type}
+        if segment.university_codes is not None:
+            sections["university_codes"] = segment.university_codes
+            meta["universities"] = segment.university_names
+        if self.index_type == "hnsw":
+            hnsw = self._build_hnsw(segment, base)
+            sections.update(hnsw.to_sections())
+            meta["hnsw"] = {"M": hnsw.M, "ef_construction": hnsw.ef_construction}
+            segment.ann = hnsw
+        elif self.index_type == "ivf" and len(segment) >= self.ivf_min_vectors:
+            ivf = IVFIndex.train(segment.vectors)
+            sections.update(ivf.to_sections())
+            meta["ivf"] = {"n_lists": ivf.n_lists}
+            segment.ann = ivf
+        
+        if quantization == "sq8" and len(segment) > 0:
+            quantizer = ScalarQuantizer.train(segment.vectors)
+            sections.update(quantizer.to_sections())
+            meta["quantization"] = "sq8"
+            segment.quantizer = quantizer
+        elif quantization == "pca" and len(segment) > 0:
+            if self.pca_dimensions < segment.dimension:
+                projector = PCAProjector.train(segment.vectors, self.pca_dimensions)
+                sections.update(projector.to_sections())
+                meta["quantization"] = "pca"
+                meta["pca"] = {"dimensions": projector.dimensions}
+                segment.quantizer = projector
+            else:
+                logger.warning(
+                    f"PCA_DIMENSIONS ({self.pca_dimensions}) is not below the embedding "
+                    f"dimension ({segment.dimension}); segment is not projected"
+                )
+        
+        lexical = self._get_lexical_index(segment)
+        sections.update(lexical.to_sections())
+        meta["bm25"] = {"k1": lexical.k1, "b": lexical.b}
+        meta["build_seconds"] = round(time.perf_counter() - started, 3)
+        
+        version, file_name = write_segment(
+            self.index_dir,
+            self.collection_name,
+            segment.vectors,
+            segment.ids,
+            dtype=dtype,
+            sections=sections,
+            meta=meta
+        )
+        
+        # The in-memory copy already matches the file, no need to remap it here
+        segment.version = version
+        segment.path = self.index_dir / file_name
+        segment.header = {**meta, "version": version, "dtype": dtype}
+    
+    def _index_options(self, dtype: Optional[str], quantization: Optional[str]) -> Tuple[str, str]:
+        """Resolve publish dtype/quantization from arguments or the environment"""
+        quantization = quantization or os.getenv("VECTOR_QUANTIZATION", "none")
+        if quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"Unsupported quantization: {quantization}. Use one of {QUANTIZATION_MODES}")
+        return dtype or os.getenv("VECTOR_INDEX_DTYPE", "float32"), quantization
+    
+    def publish_index(self, dtype: Optional[str] = None, quantization: Optional[str] = None) -> int:
+        """
+        Publish the index incrementally for all workers
+        
+        Seals the delta segment, writes files for segments that have none yet
+        and switches the manifest over. Already published segments are left
+        untouched, so adding one handbook writes one small segment file.
+        
+        Args:
+            dtype: Vector storage dtype, "float32" or "float16"
+                   (default: VECTOR_INDEX_DTYPE or float32)
+            quantization: "sq8" to add int8 codes for the first-pass scan, "pca"
+                          to add PCA-reduced rows, or "none"
+                          (default: VECTOR_QUANTIZATION or none)
+        
+        Returns:
+            Version stamp of the published index
+        """
+        dtype, quantization = self._index_options(dtype, quantization)
+        return self._publish_segments(self._seal_delta(), dtype, quantization)
+    
+    def _publish_segments(self, view: IndexView, dtype: str, quantization: str) -> int:
+        """Write files for a view's unwritten sealed segments, then publish it"""
+        for segment in view.segments:
+            if segment.path is None:
+                self._write_segment_file(segment, dtype, quantization)
+        return self._publish_view(view)
+    
+    def _seal_delta(self) -> IndexView:
+        """Move a non-empty delta into the sealed segments and return the new view"""
+        if self._view is None:
+            self._build_resident_index()
+        with self._index_lock:
+            view = self._view
+            if len(view.delta) > 0:
+                view = IndexView(
+                    view.segments + (view.delta,),
+                    IndexSegment.empty(view.delta.dimension),
+                    view.deleted,
+                    view.version
+                )
+                self._view = view
+            return view
+    
+    def _publish_view(self, view: IndexView) -> int:
+        """Point the manifest at a view's (already written) segment files"""
+        with self._index_lock:
+            version = publish_manifest(
+                self.index_dir,
+                self.collection_name,
+                [segment.path.name for segment in view.segments],
+                view.deleted
+            )
+            # This process already holds the published view; don't remap it
+            self._manifest_mtime = manifest_mtime(self.index_dir, self.collection_name)
+            current = self._view
+            if current.segments[:len(view.segments)] == view.segments:
+                self._view = IndexView(current.segments, current.delta, current.deleted, version)
+        
+        logger.info(f"Published vector index version {version} ({len(view.segments)} segments)")
+        return version
+    
+    def needs_compaction(self) -> bool:
+        """True when there are too many sealed segments or deleted ids"""
+        view = self._view
+        if view is None:
+            return False
+        return len(view.segments) > self.max_segments or len(view.deleted) > self.max_deleted
+    
+    def compact(self, dtype: Optional[str] = None, quantization: Optional[str] = None, publish: bool = True) -> Optional[int]:
+        """
+        Merge all sealed segments into one, dropping deleted ids
+        
+        The merge runs on a snapshot without blocking searches or appends;
+        segments sealed meanwhile are kept after the merged one when the new
+        view is swapped in. The delta segment is left alone.
+        
+        Args:
+            dtype: Vector storage dtype of the merged segment file
+            quantization: "sq8", "pca" or "none" (see publish_index)
+            publish: Write the merged segment and publish the manifest
+        
+        Returns:
+            Published version, or None when not published
+        """
+        dtype, quantization = self._index_options(dtype, quantization)
+        self._get_index_view()
+        
+        with self._compaction_lock:
+            snapshot = self._view
+            sources = list(snapshot.segments)
+            if len(sources) > 1 or snapshot.deleted:
+                merged = _concat_segments(sources, snapshot.deleted) if sources else None
+                if publish and merged is not None and len(merged):
+                    self._write_segment_file(merged, dtype, quantization, base=sources[0])
+                
+                with self._index_lock:
+                    current = self._view
+                    later = current.segments[len(sources):]
+                    # Ids deleted before the snapshot but living in rows that were
+                    # not merged (delta, newly sealed segments) must stay masked
+                    deleted = set(current.deleted - snapshot.deleted)
+                    if snapshot.deleted:
+                        for segment in later + (current.delta,):
+                            deleted.update(
+                                doc_id for doc_id in map(bytes, segment.ids) if doc_id in snapshot.deleted
+                            )
+                    self._view = IndexView(
+                        ((merged,) if merged is not None and len(merged) else ()) + later,
+                        current.delta,
+                        frozenset(deleted),
+                        current.version
+                    )
+                
+                merged_rows = len(merged) if merged is not None else 0
+                logger.info(
+                    f"Compacted {len(sources)} segments into {merged_rows} vectors "
+                    f"({sum(len(segment) for segment in sources) - merged_rows} deleted rows dropped)"
+                )
+            
+            if not publish:
+                return None
+            # Segments sealed during the merge still need their own files
+            return self._publish_segments(self._view, dtype, quantization)
+    
+    def start_background_compaction(self, interval: Optional[float] = None):
+        """
+        Compact in a daemon thread whenever needs_compaction() says so
+        
+        The thread wakes when a delta is sealed, ids are deleted, or every
+        `interval` seconds (default: INDEX_COMPACTION_INTERVAL or 30).
+        """
+        if self._compaction_thread is not None and self._compaction_thread.is_alive():
+            return
+        interval = interval or float(os.getenv("INDEX_COMPACTION_INTERVAL", DEFAULT_COMPACTION_INTERVAL))
+        self._compaction_stop.clear()
+        
+        def run():
+            while not self._compaction_stop.is_set():
+                self._compaction_wakeup.wait(interval)
+                self._compaction_wakeup.clear()
+                if self._compaction_stop.is_set():
+                    break
+                if self.needs_compaction():
+                    try:
+                        self.compact()
+                    except Exception as e:
+                        logger.error(f"Background index compaction failed: {e}", exc_info=True)
+        
+        self._compaction_thread = threading.Thread(target=run, name="vector-index-compaction", daemon=True)
+        self._compaction_thread.start()
+        logger.info("Background index compaction started")
+    
+    def stop_background_compaction(self):
+        """Stop the compaction thread, waiting for a running compaction to finish"""
+        thread = self._compaction_thread
+        if thread is None:
+            return
+        self._compaction_stop.set()
+        self._compaction_wakeup.set()
+        thread.join()
+        self._compaction_thread = None
+    
+    def stop_search_shards(self):
+        """Stop the shard worker processes (they restart on the next sharded search)"""
+        self.shard_pool.close()
+    
+    def write_index_file(self, dtype: Optional[str] = None, quantization: Optional[str] = None) -> int:
+        """
+        Publish the whole index as a single compacted segment file
+        
+        Args:
+            dtype: Vector storage dtype, "float32" or "float16"
+                   (default: VECTOR_INDEX_DTYPE or float32)
+            quantization: "sq8" to add int8 codes for the first-pass scan, "pca"
+                          to add PCA-reduced rows, or "none"
+                          (default: VECTOR_QUANTIZATION or none)
+        
+        Returns:
+            Version stamp of the published index
+        """
+        self._get_index_view()
+        self._seal_delta()
+        return self.compact(dtype, quantization)
+    
+    def _search_segment(
+        self,
+        segment: IndexSegment,
+        query: np.ndarray,
+        limit: int,
+        university: Optional[str] = None
+    ):
+        """
+        Top-k rows of a segment for a normalized query
+        
+        Uses the segment's HNSW graph, or its IVF index when the collection is
+        large enough, otherwise an exact scan (over int8 codes or PCA-reduced
+        rows with exact re-ranking when the segment has them). With a university, only
+        that university's partition plus the national UGC documents is scanned.
+        
+        Returns:
+            (rows, scores) best first
+        """
+        if university:
+            return self._search_partition(segment, query, limit, university)
+        if self._uses_ann(segment):
+            if isinstance(segment.ann, HNSWIndex):
+                return segment.ann.search(segment.vectors, query, limit, self.ef_search)
+            return segment.ann.search(segment.vectors, query, limit, self.nprobe)
+        if isinstance(segment.quantizer, PCAProjector):
+            return segment.quantizer.search(segment.vectors, query, limit, self.pca_candidates)
+        if segment.quantizer is not None:
+            return segment.quantizer.search(segment.vectors, query, limit, self.sq8_rerank_factor)
+        
+        scores = _score(segment.vectors, query)
+        top = _top_k(scores, limit)
+        return top, scores[top]
+    
+    def _uses_ann(self, segment: IndexSegment) -> bool:
+        """True when a segment is searched through its HNSW graph or IVF lists"""
+        return (
+            (isinstance(segment.ann, HNSWIndex) and len(segment.ann) == len(segment))
+            or (isinstance(segment.ann, IVFIndex) and len(segment) >= self.ivf_min_vectors)
+        )
+    
+    def _search_partition(self, segment: IndexSegment, query: np.ndarray, limit: int, university: str):
+        """
+        Exact top-k over one university partition
+        
+        Partitions are contiguous row runs, so each run is scored as a
+        zero-copy slice of the (possibly memory-mapped) matrix.
+        
+        Returns:
+            (rows, scores) best first
+        """
+        return _search_runs(segment.vectors, segment.partition_runs(university), query, limit)
+    
+    def _search_segment_many(
+        self,
+        segment: IndexSegment,
+        queries: np.ndarray,
+        limit: int,
+        university: Optional[str] = None
+    ):
+        """
+        Top-k rows of a segment for each row of a normalized (q, d) query matrix
+        
+        Exact scans score all queries with one GEMM; ANN and quantized
+        segments are searched query by query.
+        
+        Returns:
+            List of (rows, scores) per query, best first
+        """
+        if (self._uses_ann(segment) or segment.quantizer is not None) and not university:
+            return [self._search_segment(segment, query, limit) for query in queries]
+        
+        if university:
+            runs = segment.partition_runs(university)
+            if runs.shape[0] == 0:
+                empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+                return [empty for _ in queries]
+            rows = np.concatenate([np.arange(start, end) for start, end in runs])
+            scores = np.concatenate([_score(segment.vectors[start:end], queries.T) for start, end in runs])
+        else:
+            rows = None
+            scores = _score(segment.vectors, queries.T)
+        
+        results = []
+        for column in range(queries.shape[0]):
+            column_scores = scores[:, column]
+            top = _top_k(column_scores, limit)
+            results.append((top if rows is None else rows[top], column_scores[top]))
+        return results
+    
+    def _merge_hits(self, view: IndexView, hits: List[Tuple[IndexSegment, np.ndarray, np.ndarray]], limit: int):
+        """
+        Merge per-segment (rows, scores) into the global top-k, skipping deleted ids
+        
+        Returns:
+            ((k, 12) raw ids, scores) best first
+        """
+        if not hits:
+            return np.empty((0, OBJECT_ID_BYTES), dtype=np.uint8), np.empty(0, dtype=np.float32)
+        ids = np.concatenate([segment.ids[rows] for segment, rows, _ in hits])
+        scores = np.concatenate([np.asarray(scores, dtype=np.float32) for _, _, scores in hits])
+        if view.deleted:
+            live = np.fromiter((bytes(row) not in view.deleted for row in ids), dtype=bool, count=len(ids))
+            ids, scores = ids[live], scores[live]
+        top = _top_k(scores, limit)
+        return ids[top], scores[top]
+    
+    def _search_view(self, view: IndexView, query: np.ndarray, limit: int, university: Optional[str] = None):
+        """
+        Fan a normalized query out over every segment of a view
+        
+        Each segment returns limit + len(deleted) candidates so deleted rows
+        cannot push live ones out of the merged top-k. With several shards,
+        scans of published segments run in the shard workers while the delta
+        and ANN segments are searched here.
+        
+        Returns:
+            ((k, 12) raw ids, scores) best first
+        """
+        fetch = limit + len(view.deleted)
+        segments = view.searchable()
+        sharded = []
+        if self.shard_pool.enabled:
+            sharded = [
+                segment for segment in segments
+                if segment.path is not None and (university or not self._uses_ann(segment))
+            ]
+        try:
+            futures = []
+            if sharded:
+                futures = self.shard_pool.submit(
+                    _scan_shard,
+                    [str(segment.path) for segment in sharded],
+                    query,
+                    fetch,
+                    university,
+                    self.sq8_rerank_factor,
+                    self.pca_candidates
+                )
+            
+            sharded_ids = {id(segment) for segment in sharded}
+            hits = [
+                (segment, *self._search_segment(segment, query, fetch, university))
+                for segment in segments if id(segment) not in sharded_ids
+            ]
+            for future in futures:
+                hits.extend(
+                    (segment, rows, scores) for segment, (rows, scores) in zip(sharded, future.result())
+                )
+        except Exception as e:
+            logger.error(f"Sharded vector search failed, scanning in-process: {e}")
+            if isinstance(e, BrokenProcessPool):
+                # A worker died; the next search starts fresh workers
+                self.shard_pool.discard_broken()
+            hits = [(segment, *self._search_segment(segment, query, fetch, university)) for segment in segments]
+        return self._merge_hits(view, hits, limit)
+    
+    def measure_recall(self, k: int = 5, sample_size: Optional[int] = None, seed: int = 0) -> Optional[Dict[str, Any]]:
+        """
+        Recall@k of the configured search path against an exact scan
+        
+        Queries are rows sampled from the index; each one is searched through
+        the segments' ANN, int8 or PCA first pass and compared with the exact
+        top-k over the full-precision vectors. The query's own row is left out
+        of both lists: every path finds it, which would inflate the recall.
+        
+        Args:
+            k: Results compared per query
+            sample_size: Queries to sample (default: RECALL_SAMPLE_SIZE or 200)
+            seed: Sampling seed
+        
+        Returns:
+            {"recall", "k", "queries"}, or None for an empty index
+        """
+        view = self._get_index_view()
+        segments = [segment for segment in view.searchable() if len(segment) > 0]
+        total = sum(len(segment) for segment in segments)
+        if total == 0:
+            return None
+        sample_size = sample_size or int(os.getenv("RECALL_SAMPLE_SIZE", DEFAULT_RECALL_SAMPLE))
+        
+        rng = np.random.default_rng(seed)
+        picks = np.sort(rng.choice(total, size=min(sample_size, total), replace=False))
+        offsets = np.cumsum([0] + [len(segment) for segment in segments])
+        queries = np.empty((len(picks), view.dimension), dtype=np.float32)
+        own_ids: List[bytes] = []
+        for i, pick in enumerate(picks):
+            index = int(np.searchsorted(offsets, pick, side="right")) - 1
+            queries[i] = segments[index].vectors[pick - offsets[index]]
+            own_ids.append(bytes(segments[index].ids[pick - offsets[index]]))
+        _normalize_rows(queries)
+        
+        fetch = k + 1 + len(view.deleted)
+        found = expected = 0
+        for start in range(0, len(queries), RECALL_QUERY_BATCH):
+            batch = queries[start:start + RECALL_QUERY_BATCH]
+            exact_hits = [[] for _ in batch]
+            for segment in segments:
+                scores = _score(segment.vectors, batch.T)
+                for column in range(len(batch)):
+                    top = _top_k(scores[:, column], fetch)
+                    exact_hits[column].append((segment, top, scores[top, column]))
+            
+            for own_id, query, hits in zip(own_ids[start:], batch, exact_hits):
+                exact_ids, _ = self._merge_hits(view, hits, k + 1)
+                approximate_ids, _ = self._search_view(view, query, k + 1)
+                exact = [doc_id for doc_id in map(bytes, exact_ids) if doc_id != own_id][:k]
+                approximate = [doc_id for doc_id in map(bytes, approximate_ids) if doc_id != own_id][:k]
+                found += len(set(exact) & set(approximate))
+                expected += len(exact)
+        
+        return {"recall": found / expected if expected else 1.0, "k": k, "queries": len(queries)}
+    
+    def _search_view_lexical(self, view: IndexView, query: str, limit: int, university: Optional[str] = None):
+        """
+        BM25 top-k over every segment of a view
+        
+        Term statistics are per segment, which compaction evens out again.
+        
+        Returns:
+            ((k, 12) raw ids, scores) best first
+        """
+        return self._merge_hits(view, self._lexical_hits(view, query, limit + len(view.deleted), university), limit)
+    
+    def _lexical_hits(
+        self,
+        view: IndexView,
+        query: str,
+        fetch: int,
+        university: Optional[str] = None
+    ) -> List[Tuple[IndexSegment, np.ndarray, np.ndarray]]:
+        """Per-segment BM25 (segment, rows, scores), fetch candidates each"""
+        hits = []
+        for segment in view.searchable():
+            runs = segment.partition_runs(university) if university else None
+            hits.append((segment, *self._get_lexical_index(segment).search(query, fetch, runs)))
+        return hits
+    
+    def _fetch_documents(self, ids: np.ndarray) -> Dict[ObjectId, Dict[str, Any]]:
+        """Load result fields for (n, 12) raw document ids in one query"""
+        if len(ids) == 0:
+            return {}
+        return self.storage.fetch(_bytes_to_object_ids(ids), RESULT_PROJECTION)
+    
+    def _fetch_results(
+        self,
+        ids: np.ndarray,
+        scores: np.ndarray,
+        docs_by_id: Optional[Dict[ObjectId, Dict[str, Any]]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Fetch text and metadata for the winning ids, preserving score order
+        
+        Args:
+            ids: (n, 12) raw document ids, best first
+            scores: Similarity score for each id
+            docs_by_id: Documents already loaded by _fetch_documents
+        
+        Returns:
+            List of result dicts
+        """
+        if len(ids) == 0:
+            return []
+        
+        if docs_by_id is None:
+            docs_by_id = self._fetch_documents(ids)
+        ids = _bytes_to_object_ids(ids)
+        
+        results = []
+        for doc_id, score in zip(ids, scores):
+            doc = docs_by_id.get(doc_id)
+            if doc is None:
+                # Deleted since the index was built
+                continue
+            results.append({
+                "text": doc.get("text", ""),
+                "source": doc.get("source", "unknown"),
+                "page": doc.get("page"),
+                "sources": doc.get("sources", []),
+                "metadata": doc.get("metadata", {}),
+                "score": float(score)
+            })
+        return results
+    
+    def search_similar(
+        self,
+        query_embedding: np.ndarray,
+        limit: int = 5,
+        min_score: float = 0.0,
+        university: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
         """
         Search for similar documents using cosine similarity
         
+        Scores each index segment with a single matrix-vector product against the
+        resident (or memory-mapped) vectors, or through its ANN structure, and
+        merges the per-segment winners; falls back to scanning storage if the
+        index cannot be built.
+        
         Args:
             query_embedding: Query embedding vector
             limit: Maximum number of results to return
             min_score: Minimum similarity score (0.0 to 1.0)
+            university: Restrict to this university's documents plus national UGC documents
             
         Returns:
             List of similar documents with scores
         """
-        if self.collection is None:
-            raise RuntimeError("MongoDB not connected. Cannot search documents.")
+        if not self.storage.connected:
+            raise RuntimeError(f"{self.storage.name} not connected. Cannot search documents.")
         
         try:
-            # Convert query embedding to list
-            query_vector = query_embedding.tolist() if isinstance(query_embedding, np.ndarray) else query_embedding
-            
-            # For MongoDB Atlas Vector Search, you would use:
-            # pipeline = [
-            #     {
-            #         "$vectorSearch": {
-            #             "index": "vector_index",
-            #             "path": "embedding",
-            #             "queryVector": query_vector,
-            #             "numCandidates": limit * 10,
-            #             "limit": limit
-            #         }
-            #     }
-            # ]
-            # results = list(self.collection.aggregate(pipeline))
-            
-            # For local MongoDB, calculate cosine similarity manually
-            # Get all documents (or a large sample for efficiency)
-            # Use batch_size to avoid loading too many at once
-            all_docs = list(self.collection.find(
-                {}, 
-                {"embedding": 1, "text": 1, "source": 1, "page": 1, "metadata": 1}
-            ).batch_size(100))
-            
-            if not all_docs:
+            try:
+                view = self._get_index_view()
+            except MemoryError:
+                logger.warning("Resident vector index does not fit in memory, scanning collection instead")
+                return self._scan_collection(query_embedding, limit, min_score, university)
+            
+            if len(view) == 0:
                 logger.info("No documents in vector store")
                 return []
             
-            # Calculate cosine similarity for each document
-            similarities = []
-            query_norm = np.linalg.norm(query_vector)
+            query = np.asarray(query_embedding, dtype=np.float32).ravel()
+            if query.shape[0] != view.dimension:
+                logger.warning(
+                    f"Query dimension {query.shape[0]} does not match index dimension {view.dimension}"
+                )
+                return []
             
-            for doc in all_docs:
-                doc_embedding = doc.get("embedding")
-                if not doc_embedding or len(doc_embedding) != len(query_vector):
-                    continue
-                
-                # Calculate cosine similarity
-                dot_product = np.dot(query_vector, doc_embedding)
-                doc_norm = np.linalg.norm(doc_embedding)
-                
-                if doc_norm == 0:
-                    continue
-                
-                similarity = dot_product / (query_norm * doc_norm)
-                
-                if similarity >= min_score:
-                    similarities.append({
-                        "text": doc.get("text", ""),
-                        "source": doc.get("source", "unknown"),
-                        "page": doc.get("page"),
-                        "metadata": doc.get("metadata", {}),
-                        "score": float(similarity)
-                    })
+            query_norm = np.linalg.norm(query)
+            if query_norm == 0:
+                return []
             
-            # Sort by similarity score (descending)
-            similarities.sort(key=lambda x: x["score"], reverse=True)
+            # Rows are normalized, so a dot product gives cosine similarity
+            ids, scores = self._search_view(view, query / query_norm, limit, university)
+            keep = scores >= min_score
             
-            # Return top results
-            results = similarities[:limit]
+            results = self._fetch_results(ids[keep], scores[keep])
             
             logger.info(f"Found {len(results)} similar documents (min_score={min_score})")
             return results
@@ -258,25 +1748,350 @@ class VectorStore:
             logger.error(f"Error searching similar documents: {e}", exc_info=True)
             return []
     
+    def search_many(
+        self,
+        query_embeddings: np.ndarray,
+        limit: int = 5,
+        min_score: float = 0.0,
+        university: Optional[str] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Search for several queries at once
+        
+        Scores the whole (q, d) query matrix against the index in one matrix
+        product and fetches every winning document in a single storage query.
+        
+        Args:
+            query_embeddings: (q, d) matrix (or list) of query embeddings
+            limit: Maximum number of results per query
+            min_score: Minimum similarity score (0.0 to 1.0)
+            university: Restrict to this university's documents plus national UGC documents
+        
+        Returns:
+            One result list per query, in query order
+        """
+        if not self.storage.connected:
+            raise RuntimeError(f"{self.storage.name} not connected. Cannot search documents.")
+        
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries.reshape(1, -1)
+        if queries.shape[0] == 0:
+            return []
+        
+        try:
+            try:
+                view = self._get_index_view()
+            except MemoryError:
+                logger.warning("Resident vector index does not fit in memory, scanning collection instead")
+                return [self._scan_collection(query, limit, min_score, university) for query in queries]
+            
+            if len(view) == 0:
+                logger.info("No documents in vector store")
+                return [[] for _ in queries]
+            
+            if queries.shape[1] != view.dimension:
+                logger.warning(
+                    f"Query dimension {queries.shape[1]} does not match index dimension {view.dimension}"
+                )
+                return [[] for _ in queries]
+            
+            norms = np.linalg.norm(queries, axis=1, keepdims=True)
+            valid = norms[:, 0] > 0
+            normalized = queries / np.where(norms > 0, norms, 1.0)
+            
+            fetch = limit + len(view.deleted)
+            per_segment = [
+                (segment, self._search_segment_many(segment, normalized, fetch, university))
+                for segment in view.searchable()
+            ]
+            
+            hits = []
+            for column, is_valid in enumerate(valid):
+                ids, scores = self._merge_hits(
+                    view,
+                    [(segment, *results[column]) for segment, results in per_segment],
+                    limit
+                )
+                keep = (scores >= min_score) & is_valid
+                hits.append((ids[keep], scores[keep]))
+            
+            docs_by_id = self._fetch_documents(np.unique(np.concatenate([ids for ids, _ in hits]), axis=0))
+            results = [self._fetch_results(ids, scores, docs_by_id) for ids, scores in hits]
+            
+            logger.info(f"Searched {len(results)} queries (min_score={min_score})")
+            return results
+        
+        except Exception as e:
+            logger.error(f"Error searching similar documents: {e}", exc_info=True)
+            return [[] for _ in queries]
+    
+    def search_lexical(
+        self,
+        query: str,
+        limit: int = 5,
+        university: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Search chunk text with BM25 (no embedding model needed)
+        
+        Args:
+            query: Query text
+            limit: Maximum number of results to return
+            university: Restrict to this university's documents plus national UGC documents
+        
+        Returns:
+            List of matching documents, score is the BM25 score
+        """
+        if not self.storage.connected:
+            raise RuntimeError(f"{self.storage.name} not connected. Cannot search documents.")
+        
+        try:
+            view = self._get_index_view()
+            ids, scores = self._search_view_lexical(view, query, limit, university)
+            
+            results = self._fetch_results(ids, scores)
+            logger.info(f"Found {len(results)} documents by BM25")
+            return results
+        
+        except Exception as e:
+            logger.error(f"Error searching documents lexically: {e}", exc_info=True)
+            return []
+    
+    def search_hybrid(
+        self,
+        query: str,
+        query_embedding: np.ndarray,
+        limit: int = 5,
+        min_score: float = 0.0,
+        university: Optional[str] = None,
+        rrf_k: int = DEFAULT_RRF_K
+    ) -> List[Dict[str, Any]]:
+        """
+        Fuse BM25 and vector candidates with reciprocal-rank fusion
+        
+        Each retriever contributes its top limit * 4 documents. min_score is a
+        cosine floor for both: BM25 candidates whose own embedding is less
+        similar to the query are dropped, so a shared stray term alone never
+        yields a result.
+        
+        Args:
+            query: Query text
+            query_embedding: Query embedding vector
+            limit: Maximum number of results to return
+            min_score: Minimum cosine similarity of any fused document
+            university: Restrict to this university's documents plus national UGC documents
+            rrf_k: Rank smoothing constant
+        
+        Returns:
+            List of documents, score is the fused RRF score
+        """
+        if not self.storage.connected:
+            raise RuntimeError(f"{self.storage.name} not connected. Cannot search documents.")
+        
+        try:
+            view = self._get_index_view()
+            if len(view) == 0:
+                logger.info("No documents in vector store")
+                return []
+            
+            candidates = limit * 4
+            lexical_hits = self._lexical_hits(view, query, candidates + len(view.deleted), university)
+            
+            vector_ids = np.empty((0, OBJECT_ID_BYTES), dtype=np.uint8)
+            query_vector = np.asarray(query_embedding, dtype=np.float32).ravel()
+            query_norm = np.linalg.norm(query_vector)
+            if query_vector.shape[0] == view.dimension and query_norm > 0:
+                query_vector = query_vector / query_norm
+                ids, scores = self._search_view(view, query_vector, candidates, university)
+                vector_ids = ids[scores >= min_score]
+                # Same cosine floor for the BM25 candidates (rows are normalized)
+                floored = []
+                for segment, rows, scores in lexical_hits:
+                    keep = _score(segment.vectors[rows], query_vector) >= min_score
+                    floored.append((segment, rows[keep], np.asarray(scores)[keep]))
+                lexical_hits = floored
+            lexical_ids, _ = self._merge_hits(view, lexical_hits, candidates)
+            
+            fused = reciprocal_rank_fusion(
+                [[bytes(row) for row in vector_ids], [bytes(row) for row in lexical_ids]],
+                k=rrf_k
+            )
+            ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:limit]
+            ids = np.frombuffer(b"".join(doc_id for doc_id, _ in ranked), dtype=np.uint8).reshape(-1, OBJECT_ID_BYTES)
+            scores = np.array([score for _, score in ranked], dtype=np.float32)
+            
+            results = self._fetch_results(ids, scores)
+            logger.info(
+                f"Found {len(results)} documents by hybrid search "
+                f"({len(vector_ids)} vector, {len(lexical_ids)} BM25 candidates)"
+            )
+            return results
+        
+        except Exception as e:
+            logger.error(f"Error in hybrid search: {e}", exc_info=True)
+            return []
+    
+    def _scan_collection(
+        self,
+        query_embedding: np.ndarray,
+        limit: int,
+        min_score: float,
+        university: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Score every document straight from storage (no resident index)
+        
+        Args:
+            query_embedding: Query embedding vector
+            limit: Maximum number of results to return
+            min_score: Minimum similarity score (0.0 to 1.0)
+            university: Restrict to this university's documents plus national UGC documents
+        
+        Returns:
+            List of similar documents with scores
+        """
+        query = np.asarray(query_embedding, dtype=np.float32).ravel()
+        query_norm = np.linalg.norm(query)
+        if query_norm == 0:
+            return []
+        query = query / query_norm
+        dimension = query.shape[0]
+        
+        # For MongoDB Atlas Vector Search, you would use:
+        # pipeline = [
+        #     {
+        #         "$vectorSearch": {
+        #             "index": "vector_index",
+        #             "path": "embedding",
+        #             "queryVector": query.tolist(),
+        #             "numCandidates": limit * 10,
+        #             "limit": limit
+        #         }
+        #     }
+        # ]
+        # results = list(self.collection.aggregate(pipeline))
+        
+        # Otherwise stream stored embeddings in fixed-size blocks, score each
+        # block with one matrix-vector product and keep only the best `limit`
+        # in a min-heap, so memory stays O(block + limit) however large the
+        # collection is. Text is fetched afterwards for the winners only.
+        heap: List[Tuple[float, int, ObjectId]] = []
+        scanned = 0
+        
+        for block_ids, block, _ in self.storage.iter_embeddings(dimension, university, SCAN_BLOCK_ROWS):
+            scores = block @ query
+            norms = np.linalg.norm(block, axis=1)
+            valid = norms > 0
+            scores[valid] /= norms[valid]
+            scores[~valid] = -np.inf
+            for row in _top_k(scores, limit):
+                score = float(scores[row])
+                if score < min_score:
+                    break
+                entry = (score, -(scanned + int(row)), block_ids[row])
+                if len(heap) < limit:
+                    heapq.heappush(heap, entry)
+                elif score > heap[0][0]:
+                    heapq.heapreplace(heap, entry)
+            scanned += len(block_ids)
+        
+        if scanned == 0:
+            logger.info("No documents in vector store")
+            return []
+        
+        winners = sorted(heap, reverse=True)
+        ids = _object_ids_to_bytes([doc_id for _, _, doc_id in winners])
+        results = self._fetch_results(ids, [score for score, _, _ in winners])
+        
+        logger.info(f"Found {len(results)} similar documents by collection scan (min_score={min_score})")
+        return results
+    
     def update_index(self):
         """
         Refresh/update the vector search index
         This is useful after bulk document insertions
         """
-        if self.collection is None:
-            logger.warning("Cannot update index: MongoDB not connected")
+        if not self.storage.connected:
+            logger.warning(f"Cannot update index: {self.storage.name} not connected")
             return
         
         try:
             # Rebuild index if needed
             if self.embedding_dimension:
-                self._ensure_index(self.embedding_dimension)
+                self.storage.ensure_index(self.embedding_dimension)
+            
+            # Reload the resident matrix so it reflects every stored document
+            self._build_resident_index()
             
             logger.info("Vector index updated")
             
         except Exception as e:
             logger.error(f"Error updating index: {e}", exc_info=True)
     
+    def migrate_embedding_storage(self, storage: Optional[str] = None, batch_size: int = 500) -> int:
+        """
+        Rewrite stored embeddings in place to the given storage mode
+        
+        Args:
+            storage: Target mode (default: this store's embedding_storage)
+            batch_size: Documents updated per bulk write
+        
+        Returns:
+            Number of documents converted
+        """
+        if not self.storage.connected:
+            raise RuntimeError(f"{self.storage.name} not connected. Cannot migrate documents.")
+        
+        storage = storage or self.embedding_storage
+        if storage not in EMBEDDING_STORAGE_MODES:
+            raise ValueError(f"Unsupported embedding storage: {storage}. Use one of {EMBEDDING_STORAGE_MODES}")
+        
+        converted = self.storage.migrate_embeddings(storage, batch_size)
+        logger.info(f"Embedding storage migration complete: {converted} documents converted to {storage}")
+        return converted
+    
+    def get_index_stats(self) -> Dict[str, Any]:
+        """
+        Size, memory, build time and version of the searchable index
+        
+        Memory is split into bytes memory-mapped from published segment files
+        (shared with the other workers through the page cache) and bytes
+        resident in this process only (delta and unpublished segments).
+        
+        Returns:
+            Dictionary with index statistics
+        """
+        view = self._get_index_view()
+        segments = view.searchable()
+        published = [segment for segment in view.segments if segment.path is not None]
+        mapped_bytes = sum(_segment_nbytes(segment) for segment in segments if segment.path is not None)
+        resident_bytes = sum(_segment_nbytes(segment) for segment in segments if segment.path is None)
+        newest = max((segment.version or 0 for segment in published), default=None)
+        
+        return {
+            "version": view.version,
+            "published_at": _version_time(view.version),
+            "newest_segment_built_at": _version_time(newest),
+            "build_seconds": round(sum(segment.header.get("build_seconds", 0.0) for segment in published), 3),
+            "index_type": self.index_type,
+            "dimension": view.dimension if len(view) else self.embedding_dimension,
+            "vectors": len(view),
+            "segments": len(view.segments),
+            "delta_vectors": len(view.delta),
+            "deleted_ids": len(view.deleted),
+            "needs_compaction": self.needs_compaction(),
+            "dtypes": sorted({segment.header.get("dtype", str(segment.vectors.dtype)) for segment in segments}),
+            "quantization": sorted({segment.header.get("quantization", "none") for segment in published}),
+            "search_shards": self.shard_pool.shards,
+            "index_dir": str(self.index_dir),
+            "memory": {
+                "mapped_bytes": mapped_bytes,
+                "resident_bytes": resident_bytes,
+                "process_rss_bytes": _process_rss_bytes(),
+            },
+        }
+    
     def get_collection_stats(self) -> Dict[str, Any]:
         """
         Get statistics about the vector store collection
@@ -284,17 +2099,49 @@ class VectorStore:
         Returns:
             Dictionary with collection statistics
         """
-        if self.collection is None:
-            return {"error": "MongoDB not connected"}
+        if not self.storage.connected:
+            return {"error": f"{self.storage.name} not connected"}
         
         try:
-            count = self.collection.count_documents({})
+            count = self.storage.count()
+            dimension = self.embedding_dimension
+            if dimension is None:
+                # Processes that did not ingest learn the dimension from the index
+                view = self._get_index_view()
+                dimension = view.dimension if len(view) else None
             return {
+                "backend": self.storage.name,
                 "collection_name": self.collection_name,
                 "document_count": count,
-                "embedding_dimension": self.embedding_dimension
+                "embedding_dimension": dimension
             }
         except Exception as e:
             logger.error(f"Error getting collection stats: {e}", exc_info=True)
             return {"error": str(e)}
 
+
+_stores: Dict[Tuple[str, Optional[str], Optional[str]], VectorStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_vector_store(
+    collection_name: str = "documents",
+    index_type: Optional[str] = None,
+    backend: Optional[str] = None
+) -> VectorStore:
+    """
+    Shared VectorStore for routes and tools
+    
+    The mapped index, its search structures and the shard workers are then
+    loaded once per process rather than once per chat request. A store whose
+    storage is not connected is not kept, so later callers retry.
+    """
+    key = (collection_name, index_type, backend)
+    store = _stores.get(key)
+    if store is None:
+        store = VectorStore(collection_name=collection_name, index_type=index_type, backend=backend)
+        if not store.storage.connected:
+            return store
+        with _stores_lock:
+            store = _stores.setdefault(key, store)
+    return store
@@ -0,0 +1,139 @@
+"""
+Startup Warm-up
+Loads the embedding model, vector index and cut-off data in background threads
+
+The server accepts connections right away (health checks answer), while each
+component warms in its own thread. /ready reports ready only once all of them
+have finished, so a load balancer never routes chat traffic to a cold worker.
+A component that fails is reported but does not hold readiness back: the
+service degrades the same way it would without warm-up (e.g. search falls
+back to lexical).
+"""
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from app.config.db import MongoDBConnection
+from app.models.cutoff import CutoffModel
+from app.services.embedding_service import get_embedding_service
+from app.services.vector_store import get_vector_store
+
+logger = logging.getLogger(__name__)
+
+# A/L streams with cut-off data
+CUTOFF_STREAMS = ("Bio", "Maths", "Arts", "Commerce", "Technology")
+
+
+def warm_embedding_model() -> str:
+    """Load the shared embedding model"""
+    service = get_embedding_service()
+    return f"{service.model_name} on {service.backend}, dimension {service.embedding_dimension}"
+
+
+def warm_vector_index() -> str:
+    """Map the shared vector index and load its search structures"""
+    store = get_vector_store(collection_name="documents")
+    if not store.storage.connected:
+        raise RuntimeError(f"{store.storage.name} document store not connected")
+    stats = store.warm_up()
+    return f"version {stats['version']}, {stats['vectors']} vectors in {stats['segments']} segments"
+
+
+def warm_cutoffs() -> str:
+    """Create the cut-off indexes and read each stream's recent cut-offs once"""
+    if MongoDBConnection.get_db() is None:
+        raise RuntimeError("MongoDB not connected")
+    cutoff_model = CutoffModel()
+    records = sum(len(cutoff_model.get_historical_cutoffs(stream=stream)) for stream in CUTOFF_STREAMS)
+    return f"{records} recent cut-off records"
+
+
+WARMUP_TASKS: Dict[str, Callable[[], str]] = {
+    "embedding_model": warm_embedding_model,
+    "vector_index": warm_vector_index,
+    "cutoffs": warm_cutoffs,
+}
+
+
+class Warmup:
+    """
+    Runs warm-up tasks in parallel threads and tracks their progress
+    """
+    
+    def __init__(self, tasks: Optional[Dict[str, Callable[[], str]]] = None):
+        """
+        Args:
+            tasks: {component: function returning a short description}
+                   (default: model, vector index and cut-offs)
+        """
+        self.tasks = tasks or WARMUP_TASKS
+        self.started_at: Optional[float] = None
+        self.seconds: Optional[float] = None
+        self._components: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+    
+    @property
+    def ready(self) -> bool:
+        return self._done.is_set()
+    
+    def start(self):
+        """Start every task in its own daemon thread (once)"""
+        with self._lock:
+            if self.started_at is not None:
+                return
+            self.started_at = time.perf_counter()
+            self._components = {name: {"status": "pending"} for name in self.tasks}
+        
+        threads = [
+            threading.Thread(target=self._run, args=(name, task), name=f"warmup-{name}", daemon=True)
+            for name, task in self.tasks.items()
+        ]
+        for thread in threads:
+            thread.start()
+        
+        def finish():
+            for thread in threads:
+                thread.join()
+            self.seconds = time.perf_counter() - self.started_at
+            self._done.set()
+            failed = [name for name, component in self._components.items() if component["status"] == "failed"]
+            if failed:
+                logger.warning(f"⚠️ Warm-up finished in {self.seconds:.2f}s with failures: {', '.join(failed)}")
+            else:
+                logger.info(f"✅ Warm-up finished in {self.seconds:.2f}s; ready for traffic")
+        
+        threading.Thread(target=finish, name="warmup", daemon=True).start()
+    
+    def _run(self, name: str, task: Callable[[], str]):
+        started = time.perf_counter()
+        try:
+            detail = task()
+            component = {"status": "ready", "detail": detail}
+            logger.info(f"✅ Warm-up {name}: {time.perf_counter() - started:.2f}s ({detail})")
+        except Exception as e:
+            component = {"status": "failed", "error": str(e)}
+            logger.warning(f"⚠️ Warm-up {name} failed after {time.perf_counter() - started:.2f}s: {e}")
+        component["seconds"] = round(time.perf_counter() - started, 3)
+        with self._lock:
+            self._components[name] = component
+    
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until warm-up has finished; False on timeout"""
+        return self._done.wait(timeout)
+    
+    def status(self) -> Dict[str, Any]:
+        """Readiness plus status, timing and detail per component"""
+        with self._lock:
+            components = {name: dict(component) for name, component in self._components.items()}
+        return {
+            "ready": self.ready,
+            "started": self.started_at is not None,
+            "seconds": round(self.seconds, 3) if self.seconds is not None else None,
+            "components": components,
+        }
+
+
+# Warm-up of this worker process, started by the app's startup event
+WARMUP = Warmup()
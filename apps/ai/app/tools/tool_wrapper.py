@@ -2,6 +2,7 @@
 Tool Wrapper
 Converts custom tools to LangChain-compatible tools
 """
+import asyncio
 from typing import Type, Optional, Any
 from langchain_core.tools import BaseTool as LangChainBaseTool
 from pydantic import BaseModel, Field
@@ -109,6 +110,6 @@ class LangChainToolWrapper(LangChainBaseTool):
             return f"Error: {str(e)}"
     
     async def _arun(self, **kwargs) -> str:
-        """Async version"""
-        return self._run(**kwargs)
+        """Async version (runs the sync tool in a worker thread, off the event loop)"""
+        return await asyncio.to_thread(self._run, **kwargs)
 
@@ -2,36 +2,102 @@
 UGC Search Tool
 RAG search in UGC documents using vector search
 """
+import os
+import time
 from typing import Dict, Any, List, Optional
+import numpy as np
 from app.tools.base_tool import BaseTool
-from app.services.vector_store import VectorStore
-from app.services.embedding_service import EmbeddingService
+from app.services.vector_store import get_vector_store
+from app.services.embedding_service import DEFAULT_MODEL_NAME, MODEL_REGISTRY, get_embedding_service
+from app.services.query_batcher import get_query_batcher
+from app.services.result_cache import ResultCache, normalize_query
+from app.services.latency_stats import LatencyRecorder
 import logging
 
 logger = logging.getLogger(__name__)
 
+SEARCH_MODES = ("vector", "hybrid", "lexical")
+DEFAULT_SEARCH_MODE = "vector"
+
+# Shared by every tool instance (chat builds a tool per request); sized by
+# SEARCH_CACHE_SIZE / SEARCH_CACHE_TTL
+RESULT_CACHE = ResultCache()
+
+# Search latency per mode ("cached" for result cache hits), and query embedding
+SEARCH_LATENCY = LatencyRecorder()
+
 class UGCSearchTool(BaseTool):
     """
     Tool for searching UGC documents using vector search (RAG)
     """
     
-    def __init__(self):
+    def __init__(
+        self,
+        index_type: Optional[str] = None,
+        university: Optional[str] = None,
+        search_mode: Optional[str] = None,
+        backend: Optional[str] = None
+    ):
+        """
+        Args:
+            index_type: Vector search structure: "exact", "ivf" or "hnsw"
+                        (default: VECTOR_INDEX_TYPE, see VectorStore)
+            university: Default university filter (e.g. from the user's context);
+                        searches then cover that university plus national UGC documents
+            search_mode: "vector", "hybrid" (BM25 + vector, fused by rank) or
+                         "lexical" (BM25 only) (default: UGC_SEARCH_MODE or vector)
+            backend: Chunk storage, "mongodb" or "sqlite" (local file, no MongoDB needed)
+                     (default: VECTOR_STORE_BACKEND or mongodb)
+        """
         super().__init__(
             name="ugc_search",
             description="Search UGC handbooks and official university documents for verified information. Use this when the user asks about admission requirements, courses, policies, or any official university information. Returns relevant document chunks with sources."
         )
         
+        search_mode = search_mode or os.getenv("UGC_SEARCH_MODE", DEFAULT_SEARCH_MODE)
+        if search_mode not in SEARCH_MODES:
+            raise ValueError(f"Unsupported search mode: {search_mode}. Use one of {SEARCH_MODES}")
+        self.search_mode = search_mode
+        self.university = university
+        self.result_cache = RESULT_CACHE
+        self.latency = SEARCH_LATENCY
+        
         # Initialize vector store and embedding service
         self.vector_store = None
         self.embedding_service = None
+        self.query_batcher = None
         
         try:
-            self.vector_store = VectorStore(collection_name="documents")
-            self.embedding_service = EmbeddingService()
-            logger.info("UGC Search Tool: Vector store and embedding service initialized")
+            # Shared per process, so a tool per chat request neither remaps the index nor reloads the model
+            self.vector_store = get_vector_store(collection_name="documents", index_type=index_type, backend=backend)
+            logger.info("UGC Search Tool: Vector store initialized")
         except Exception as e:
             logger.error(f"UGC Search Tool: Failed to initialize services: {e}")
             logger.warning("UGC Search Tool will not be available")
+        
+        # The embedding service is taken once its model is loaded (see _embeddings_ready)
+        if self.vector_store:
+            self._embeddings_ready()
+    
+    def _embeddings_ready(self) -> bool:
+        """
+        True once the embedding model is loaded
+        
+        Never waits for the model: until the startup warm-up (or a background
+        load started here) has loaded it, searches run on BM25 alone.
+        """
+        if self.embedding_service is None:
+            if not MODEL_REGISTRY.is_loaded(DEFAULT_MODEL_NAME):
+                MODEL_REGISTRY.load_in_background(DEFAULT_MODEL_NAME)
+                return False
+            try:
+                self.embedding_service = get_embedding_service()
+                self.query_batcher = get_query_batcher()
+                logger.info("UGC Search Tool: Embedding service initialized")
+            except Exception as e:
+                logger.error(f"UGC Search Tool: Failed to initialize embedding service: {e}")
+                return False
+        return self.embedding_service.model is not None
     
     def get_parameters_schema(self) -> Dict[str, Any]:
         return {
@@ -45,18 +111,23 @@ class UGCSearchTool(BaseTool):
                     "type": "integer",
                     "description": "Maximum number of results to return",
                     "default": 5
+                },
+                "university": {
+                    "type": "string",
+                    "description": "Only search this university's documents (plus national UGC documents)"
                 }
             },
             "required": ["query"]
         }
     
-    def execute(self, query: str = "", limit: int = 5) -> Dict[str, Any]:
+    def execute(self, query: str = "", limit: int = 5, university: Optional[str] = None) -> Dict[str, Any]:
         """
         Search UGC documents using vector search (RAG)
         
         Args:
             query: Search query
             limit: Maximum number of results (default: 5)
+            university: University filter (default: the tool's university)
         
         Returns:
             Dict with search results, sources, and formatted answer
@@ -69,80 +140,226 @@ class UGCSearchTool(BaseTool):
                 "message": "No search query provided"
             }
         
-        if not self.vector_store or not self.embedding_service:
-            logger.warning("UGC Search Tool: Vector store or embedding service not available")
+        if not self.vector_store:
+            logger.warning("UGC Search Tool: Vector store not available")
             return {
                 "success": False,
                 "results": [],
                 "sources": [],
-                "message": "Search service is currently unavailable. Please ensure MongoDB is connected and embeddings are initialized."
+                "message": "Search service is currently unavailable. Please ensure the document store is connected and embeddings are initialized."
             }
         
+        university = university or self.university
+        search_mode = self._effective_search_mode()
+        started = time.perf_counter()
+        
         try:
-            # Generate embedding for query
-            query_embedding = self.embedding_service.encode_query(query)
-            
-            # Search for similar documents
-            similar_docs = self.vector_store.search_similar(
-                query_embedding=query_embedding,
-                limit=limit,
-                min_score=0.3  # Minimum similarity threshold
+            # Repeated questions are answered from the cache until the index
+            # changes; RESULT_CACHE is shared by tools on different stores
+            cache_key = (
+                normalize_query(query),
+                limit,
+                (university or "").strip().lower(),
+                search_mode,
+                self.vector_store.storage.name,
+                self.vector_store.collection_name,
+                self.vector_store.index_type,
             )
+            index_version = self._index_version()
+            if index_version is not None:
+                cached = self.result_cache.get(cache_key, index_version)
+                if cached is not None:
+                    self.latency.record("cached", time.perf_counter() - started)
+                    return cached
             
-            if not similar_docs:
-                return {
-                    "success": False,
-                    "results": [],
-                    "sources": [],
-                    "message": "No relevant documents found. The information may not be available in UGC documents."
-                }
-            
-            # Format results
-            formatted_results = []
-            sources = []
-            
-            for doc in similar_docs:
-                formatted_results.append({
-                    "text": doc.get("text", ""),
-                    "source": doc.get("source", "UGC Handbook"),
-                    "page": doc.get("page"),
-                    "score": doc.get("score", 0.0),
-                    "metadata": doc.get("metadata", {})
-                })
-                
-                # Collect unique sources
-                source_name = doc.get("source", "UGC Handbook")
-                if source_name not in sources:
-                    sources.append(source_name)
-            
-            # Format response with sources
-            # Combine top results into a context string
-            context_parts = []
-            for i, result in enumerate(formatted_results[:3], 1):  # Top 3 for context
-                source = result.get("source", "UGC Handbook")
-                page = result.get("page", "")
-                page_info = f" (page {page})" if page else ""
-                context_parts.append(
-                    f"[Source: {source}{page_info}]\n{result.get('text', '')}"
-                )
-            
-            context = "\n\n---\n\n".join(context_parts)
+            query_embedding = None
+            if search_mode != "lexical":
+                # Generate embedding for query
+                # Batched with concurrent chat queries when called from a request
+                with self.latency.measure("embedding"):
+                    query_embedding = self.query_batcher.encode_blocking(query)
             
+            similar_docs = self._search(query, query_embedding, limit, university, search_mode)
+            response = self._format_response(similar_docs)
+            if index_version is not None:
+                self.result_cache.put(cache_key, response, index_version)
+            self.latency.record(search_mode, time.perf_counter() - started)
+            return response
+        
+        except Exception as e:
+            logger.error(f"UGC Search Tool error: {e}", exc_info=True)
             return {
-                "success": True,
-                "results": formatted_results,
-                "sources": sources,
-                "context": context,
-                "message": f"Found {len(formatted_results)} relevant document chunks",
-                "formatted_answer": f"Based on {', '.join(sources)}, here is the relevant information:\n\n{context}"
+                "success": False,
+                "results": [],
+                "sources": [],
+                "message": f"Search error: {str(e)}"
             }
-                
+    
+    def execute_many(self, queries: List[str], limit: int = 5, university: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Run several searches at once (query rewrites, evaluation runs)
+        
+        All queries are embedded in one model call; in vector mode they are also
+        scored against the index in one matrix product.
+        
+        Args:
+            queries: Search queries
+            limit: Maximum number of results per query (default: 5)
+            university: University filter (default: the tool's university)
+        
+        Returns:
+            One execute()-style result dict per query, in order
+        """
+        # Empty queries (and an unavailable store) get execute()'s error responses
+        active = [query for query in queries if query]
+        if not self.vector_store or not active:
+            return [self.execute(query, limit, university) for query in queries]
+        
+        university = university or self.university
+        search_mode = self._effective_search_mode()
+        
+        try:
+            if search_mode == "lexical":
+                results = [self._search(query, None, limit, university, search_mode) for query in active]
+            else:
+                query_embeddings = self.embedding_service.encode_queries(active)
+                if search_mode == "vector":
+                    results = self.vector_store.search_many(
+                        query_embeddings=query_embeddings,
+                        limit=limit,
+                        min_score=0.3,  # Minimum similarity threshold
+                        university=university
+                    )
+                else:
+                    results = [
+                        self._search(query, query_embedding, limit, university, search_mode)
+                        for query, query_embedding in zip(active, query_embeddings)
+                    ]
+            
+            responses = iter(self._format_response(similar_docs) for similar_docs in results)
+            return [next(responses) if query else self.execute(query) for query in queries]
+            
         except Exception as e:
             logger.error(f"UGC Search Tool error: {e}", exc_info=True)
+            return [
+                {
+                    "success": False,
+                    "results": [],
+                    "sources": [],
+                    "message": f"Search error: {str(e)}"
+                }
+                for _ in queries
+            ]
+    
+    def _index_version(self):
+        """Current index version token, or None if the index cannot be loaded"""
+        if not self.result_cache.enabled:
+            return None
+        try:
+            return self.vector_store.index_version()
+        except Exception as e:
+            logger.warning(f"UGC Search Tool: index version unavailable, not caching: {e}")
+            return None
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters of the shared result cache"""
+        return self.result_cache.stats()
+    
+    def latency_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Search latency percentiles per mode, shared by all tool instances"""
+        return self.latency.stats()
+    
+    def _effective_search_mode(self) -> str:
+        """Configured search mode, or lexical while the embedding model is unavailable"""
+        if self.search_mode != "lexical" and not self._embeddings_ready():
+            # BM25 needs no model, so it answers alone until embeddings are available
+            logger.info("UGC Search Tool: Embedding model not ready, using lexical search")
+            return "lexical"
+        return self.search_mode
+    
+    def _search(
+        self,
+        query: str,
+        query_embedding: Optional[np.ndarray],
+        limit: int,
+        university: Optional[str],
+        search_mode: str
+    ) -> List[Dict[str, Any]]:
+        """Run one search in the given mode"""
+        if search_mode == "lexical":
+            return self.vector_store.search_lexical(
+                query=query,
+                limit=limit,
+                university=university
+            )
+        
+        if search_mode == "hybrid":
+            return self.vector_store.search_hybrid(
+                query=query,
+                query_embedding=query_embedding,
+                limit=limit,
+                min_score=0.3,  # Minimum similarity threshold (vector side)
+                university=university
+            )
+        
+        # Search for similar documents
+        return self.vector_store.search_similar(
+            query_embedding=query_embedding,
+            limit=limit,
+            min_score=0.3,  # Minimum similarity threshold
+            university=university
+        )
+    
+    def _format_response(self, similar_docs: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Build the tool response (results, sources, context) from search hits"""
+        if not similar_docs:
             return {
                 "success": False,
                 "results": [],
                 "sources": [],
-                "message": f"Search error: {str(e)}"
+                "message": "No relevant documents found. The information may not be available in UGC documents."
             }
-
+        
+        # Format results
+        formatted_results = []
+        sources = []
+        
+        for doc in similar_docs:
+            formatted_results.append({
+                "text": doc.get("text", ""),
+                "source": doc.get("source", "UGC Handbook"),
+                "page": doc.get("page"),
+                "sources": doc.get("sources", []),
+                "score": doc.get("score", 0.0),
+                "metadata": doc.get("metadata", {})
+            })
+            
+            # Collect unique sources (a collapsed near-duplicate lists every
+            # handbook it appeared in)
+            source_names = [doc.get("source", "UGC Handbook")]
+            source_names += [entry.get("source") for entry in doc.get("sources", []) if entry.get("source")]
+            for source_name in source_names:
+                if source_name not in sources:
+                    sources.append(source_name)
+        
+        # Format response with sources
+        # Combine top results into a context string
+        context_parts = []
+        for i, result in enumerate(formatted_results[:3], 1):  # Top 3 for context
+            source = result.get("source", "UGC Handbook")
+            page = result.get("page", "")
+            page_info = f" (page {page})" if page else ""
+            context_parts.append(
+                f"[Source: {source}{page_info}]\n{result.get('text', '')}"
+            )
+        
+        context = "\n\n---\n\n".join(context_parts)
+        
+        return {
+            "success": True,
+            "results": formatted_results,
+            "sources": sources,
+            "context": context,
+            "message": f"Found {len(formatted_results)} relevant document chunks",
+            "formatted_answer": f"Based on {', '.join(sources)}, here is the relevant information:\n\n{context}"
+        }
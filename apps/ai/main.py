@@ -2,13 +2,17 @@
 UniMate AI Agent - FastAPI Main Application
 """
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 import os
+import asyncio
 import logging
 
-from app.routes import chat, zscore, university
+from app.routes import chat, zscore, university, index
 from app.config.db import MongoDBConnection
+from app.services.query_batcher import bind_query_batchers
+from app.services.warmup import WARMUP
 
 # Configure logging
 logging.basicConfig(
@@ -47,13 +51,13 @@ async def startup_event():
         else:
             logger.warning("⚠️ MongoDB connection failed - some features may not work")
         
-        # Initialize ZScore tool to verify it works
-        try:
-            from app.tools.zscore_predict_tool import ZScorePredictTool
-            zscore_tool = ZScorePredictTool()
-            logger.info("✅ ZScore tool initialized")
-        except Exception as e:
-            logger.warning(f"⚠️ ZScore tool initialization warning: {e}")
+        # Tools run in worker threads; their query embeddings join the
+        # request batches from the first request on
+        bind_query_batchers(asyncio.get_running_loop())
+        
+        # Load the embedding model, vector index and cut-off data in the
+        # background; /ready reports when they are done
+        WARMUP.start()
             
     except Exception as e:
         logger.error(f"❌ Startup error: {e}")
@@ -105,10 +109,19 @@ async def health():
             "error": str(e) if os.getenv("NODE_ENV") == "development" else "Service error"
         }
 
+@app.get("/ready")
+async def ready():
+    """
+    Readiness probe: 503 until the startup warm-up has finished
+    """
+    status = WARMUP.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
 # Routes
 app.include_router(chat.router, prefix="/ai", tags=["chat"])
 app.include_router(zscore.router, prefix="/ai", tags=["zscore"])
 app.include_router(university.router, prefix="/ai", tags=["university"])
+app.include_router(index.router, prefix="/ai", tags=["index"])
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,78 @@
+"""
+ONNX Model Export Script
+Exports the embedding model for the ONNX backends and checks parity with torch
+
+Exports the float32 graph and its int8-quantized copy under ONNX_MODEL_DIR
+(default data/models), then compares both against the sentence-transformers
+output. Set EMBEDDING_BACKEND=onnx or onnx-int8 to serve with them.
+Needs the optional ONNX dependencies (pip install -r requirements-onnx.txt).
+"""
+import sys
+import logging
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.embedding_service import DEFAULT_MODEL_NAME
+from app.services.onnx_embedding import (
+    MODEL_FILES, PARITY_MIN_COSINE, OnnxEncoder, check_parity, export_model, get_model_dir
+)
+from dotenv import load_dotenv
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+
+def main():
+    """Main export function"""
+    logger.info("=" * 60)
+    logger.info("ONNX Model Export Script")
+    logger.info("=" * 60)
+    
+    model_name = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_MODEL_NAME
+    directory = get_model_dir(model_name)
+    logger.info(f"Exporting {model_name} to {directory}")
+    logger.info("-" * 60)
+    
+    results = {}
+    for backend in MODEL_FILES:
+        try:
+            path = export_model(model_name, backend, directory)
+            encoder = OnnxEncoder(directory, backend)
+            results[backend] = (path.stat().st_size, check_parity(model_name, encoder))
+        except ImportError as e:
+            logger.error(f"❌ Missing dependency: {e}")
+            sys.exit(1)
+        except Exception as e:
+            logger.error(f"❌ {backend} export failed: {e}", exc_info=True)
+            sys.exit(1)
+    
+    # Summary
+    logger.info("=" * 60)
+    logger.info("Export Summary")
+    logger.info("=" * 60)
+    failed = False
+    for backend, (size, similarity) in results.items():
+        passed = similarity >= PARITY_MIN_COSINE[backend]
+        failed = failed or not passed
+        logger.info(
+            f"{'✅' if passed else '❌'} {backend}: {size / 1e6:.1f} MB, "
+            f"min cosine vs torch {similarity:.5f} (threshold {PARITY_MIN_COSINE[backend]})"
+        )
+    logger.info("=" * 60)
+    if failed:
+        logger.error("❌ Parity check failed; keep EMBEDDING_BACKEND=torch")
+        sys.exit(1)
+    logger.info("✅ ONNX export completed successfully!")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,14 +6,16 @@ import os
 import sys
 import logging
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from app.services.document_processor import DocumentProcessor
-from app.services.embedding_service import EmbeddingService
+from app.services.embedding_service import EmbeddingService, get_embedding_service
+from app.services.near_duplicates import NearDuplicateDetector
 from app.services.vector_store import VectorStore
+from app.services.document_storage import DEFAULT_STORAGE_BACKEND
 from app.config.db import MongoDBConnection
 from dotenv import load_dotenv
 
@@ -55,7 +57,8 @@ def find_pdf_files(docs_dir: str) -> List[str]:
 
 def ingest_document(file_path: str, processor: DocumentProcessor, 
                     embedding_service: EmbeddingService, 
-                    vector_store: VectorStore) -> bool:
+                    vector_store: VectorStore,
+                    deduplicator: Optional[NearDuplicateDetector] = None) -> bool:
     """
     Process and ingest a single PDF document
     
@@ -64,6 +67,8 @@ def ingest_document(file_path: str, processor: DocumentProcessor,
         processor: Document processor instance
         embedding_service: Embedding service instance
         vector_store: Vector store instance
+        deduplicator: Near-duplicate detector; repeated passages are not
+                      embedded again, their source is added to the stored chunk
         
     Returns:
         True if successful, False otherwise
@@ -80,17 +85,29 @@ def ingest_document(file_path: str, processor: DocumentProcessor,
         
         logger.info(f"Extracted {len(chunks)} chunks from {file_path}")
         
+        # Collapse boilerplate already seen in this or an earlier handbook
+        if deduplicator is not None:
+            chunks, merged = deduplicator.collapse(chunks)
+            if merged:
+                vector_store.add_sources(merged)
+                logger.info(f"Linked {sum(len(v) for v in merged.values())} duplicate chunks to stored chunks")
+            if not chunks:
+                logger.info(f"All chunks of {file_path} duplicate stored chunks")
+                return True
+        
         # Generate embeddings for all chunks
         texts = [chunk["text"] for chunk in chunks]
         logger.info(f"Generating embeddings for {len(texts)} chunks...")
-        embeddings = embedding_service.batch_embed(texts, batch_size=32)
+        embeddings = embedding_service.batch_embed(texts)
         
         if len(embeddings) != len(chunks):
             logger.error(f"Embedding count mismatch: {len(embeddings)} embeddings for {len(chunks)} chunks")
             return False
         
-        # Store in vector database
-        stored_count = vector_store.store_documents(chunks, embeddings)
+        # Store in vector database; only stored chunks can absorb later duplicates
+        stored_count = vector_store.store_documents(
+            chunks, embeddings, on_stored=deduplicator.register if deduplicator is not None else None
+        )
         
         if stored_count > 0:
             logger.info(f"✅ Successfully stored {stored_count} chunks from {file_path}")
@@ -104,29 +121,13 @@ def ingest_document(file_path: str, processor: DocumentProcessor,
         return False
 
 
-def main():
-    """Main ingestion function"""
-    logger.info("=" * 60)
-    logger.info("Document Ingestion Script")
-    logger.info("=" * 60)
-    
-    # Check MongoDB connection
-    db = MongoDBConnection.connect()
-    if db is None:
-        logger.error("❌ MongoDB connection failed. Please check MONGODB_URI in .env")
-        sys.exit(1)
-    
-    logger.info("✅ MongoDB connected")
-    
-    # Initialize services
-    try:
-        processor = DocumentProcessor(chunk_size=500, chunk_overlap=50)
-        embedding_service = EmbeddingService()
-        vector_store = VectorStore(collection_name="documents")
-        logger.info("✅ Services initialized")
-    except Exception as e:
-        logger.error(f"❌ Failed to initialize services: {e}")
-        sys.exit(1)
+def ingest_all(processor: DocumentProcessor, embedding_service: EmbeddingService,
+               vector_store: VectorStore, backend: str):
+    """Ingest the docs directory's PDFs, publish the index and log a summary"""
+    # Load the published index so new chunks land in a delta segment
+    # instead of forcing a full rebuild; merge segments in the background
+    vector_store.load_index()
+    vector_store.start_background_compaction()
     
     # Find docs directory
     script_dir = Path(__file__).parent
@@ -153,23 +154,63 @@ def main():
         logger.info(f"Please add PDF files to: {docs_dir}")
         sys.exit(0)
     
+    # Skip handbooks that are already stored, unless asked to re-ingest them
+    reingest = os.getenv("REINGEST_EXISTING", "false").lower() == "true"
+    existing_sources = set(vector_store.get_sources())
+    
+    skipped_count = 0
+    pending_files = []
+    for pdf_file in pdf_files:
+        source = os.path.basename(pdf_file)
+        if source in existing_sources:
+            if not reingest:
+                logger.info(f"Skipping already ingested: {source}")
+                skipped_count += 1
+                continue
+            deleted = vector_store.delete_source(source)
+            logger.info(f"Replacing {deleted} existing chunks of {source}")
+        pending_files.append(pdf_file)
+    
+    # Near-duplicate detection against everything still stored
+    deduplicator = None
+    if os.getenv("DEDUP_CHUNKS", "true").lower() == "true":
+        deduplicator = NearDuplicateDetector()
+        loaded = deduplicator.load(vector_store.iter_signatures())
+        logger.info(f"Near-duplicate detection enabled ({loaded} stored signatures)")
+    
     # Process each PDF
-    logger.info(f"\nProcessing {len(pdf_files)} PDF file(s)...")
+    logger.info(f"\nProcessing {len(pending_files)} PDF file(s)...")
     logger.info("-" * 60)
     
     success_count = 0
     fail_count = 0
     
-    for pdf_file in pdf_files:
-        if ingest_document(pdf_file, processor, embedding_service, vector_store):
+    for pdf_file in pending_files:
+        if ingest_document(pdf_file, processor, embedding_service, vector_store, deduplicator):
             success_count += 1
         else:
             fail_count += 1
         logger.info("-" * 60)
     
-    # Update index
-    logger.info("Updating vector index...")
-    vector_store.update_index()
+    # Publish the memory-mapped index segments shared by all API workers
+    # (only segments added by this run are written)
+    vector_store.stop_background_compaction()
+    index_version = None
+    try:
+        index_version = vector_store.publish_index()
+        if vector_store.needs_compaction():
+            index_version = vector_store.compact()
+        logger.info(f"✅ Vector index published (version {index_version})")
+    except Exception as e:
+        logger.error(f"❌ Failed to publish vector index: {e}", exc_info=True)
+    
+    # Recall of the first-pass search (ANN, int8 or PCA) against an exact scan
+    recall = None
+    if index_version is not None:
+        try:
+            recall = vector_store.measure_recall()
+        except Exception as e:
+            logger.warning(f"Could not measure search recall: {e}")
     
     # Get collection stats
     stats = vector_store.get_collection_stats()
@@ -180,17 +221,62 @@ def main():
     logger.info("=" * 60)
     logger.info(f"Total PDFs processed: {len(pdf_files)}")
     logger.info(f"✅ Successful: {success_count}")
+    logger.info(f"⏭️ Skipped (already ingested): {skipped_count}")
     logger.info(f"❌ Failed: {fail_count}")
-    logger.info(f"📊 Total documents in vector store: {stats.get('document_count', 0)}")
+    logger.info(f"📊 Total documents in vector store: {stats.get('document_count', 0)} ({stats.get('backend', backend)})")
     logger.info(f"📐 Embedding dimension: {stats.get('embedding_dimension', 'N/A')}")
+    logger.info(f"🗂️ Vector index version: {index_version or 'N/A'} ({vector_store.index_dir})")
+    if recall is not None:
+        logger.info(
+            f"🎯 Search recall@{recall['k']} vs exact: {recall['recall']:.3f} "
+            f"(loss {1 - recall['recall']:.3f} over {recall['queries']} sampled queries)"
+        )
     logger.info("=" * 60)
     
-    if success_count > 0:
+    if success_count > 0 or skipped_count > 0:
         logger.info("✅ Document ingestion completed successfully!")
     else:
         logger.warning("⚠️ No documents were successfully ingested")
 
 
+def main():
+    """Main ingestion function"""
+    logger.info("=" * 60)
+    logger.info("Document Ingestion Script")
+    logger.info("=" * 60)
+    
+    # Chunk storage: MongoDB, or the local SQLite store (no server needed)
+    backend = os.getenv("VECTOR_STORE_BACKEND", DEFAULT_STORAGE_BACKEND).lower()
+    if backend == "mongodb":
+        db = MongoDBConnection.connect()
+        if db is None:
+            logger.error("❌ MongoDB connection failed. Please check MONGODB_URI in .env")
+            sys.exit(1)
+        
+        logger.info("✅ MongoDB connected")
+    
+    # Initialize services
+    try:
+        processor = DocumentProcessor(chunk_size=500, chunk_overlap=50)
+        embedding_service = get_embedding_service()
+        vector_store = VectorStore(collection_name="documents", backend=backend)
+        logger.info("✅ Services initialized")
+    except Exception as e:
+        logger.error(f"❌ Failed to initialize services: {e}")
+        sys.exit(1)
+    
+    if not vector_store.storage.connected:
+        logger.error(f"❌ {vector_store.storage.name} vector store is not available")
+        sys.exit(1)
+    logger.info(f"✅ Vector store backend: {vector_store.storage.name}")
+    
+    try:
+        ingest_all(processor, embedding_service, vector_store, backend)
+    finally:
+        # Sharded scans (e.g. the recall check) spawn worker processes
+        vector_store.stop_search_shards()
+
+
 if __name__ == "__main__":
     main()
 
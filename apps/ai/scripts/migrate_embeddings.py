@@ -0,0 +1,74 @@
+"""
+Embedding Storage Migration Script
+Converts stored chunk embeddings in place between BSON storage modes
+
+Target mode comes from EMBEDDING_STORAGE (float32, float16 or list; default float32).
+"""
+import os
+import sys
+import logging
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.vector_store import VectorStore, DEFAULT_EMBEDDING_STORAGE
+from app.config.db import MongoDBConnection
+from dotenv import load_dotenv
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+
+def main():
+    """Main migration function"""
+    logger.info("=" * 60)
+    logger.info("Embedding Storage Migration Script")
+    logger.info("=" * 60)
+    
+    # Check MongoDB connection
+    db = MongoDBConnection.connect()
+    if db is None:
+        logger.error("❌ MongoDB connection failed. Please check MONGODB_URI in .env")
+        sys.exit(1)
+    
+    logger.info("✅ MongoDB connected")
+    
+    storage = os.getenv("EMBEDDING_STORAGE", DEFAULT_EMBEDDING_STORAGE)
+    
+    try:
+        vector_store = VectorStore(collection_name="documents", embedding_storage=storage)
+    except ValueError as e:
+        logger.error(f"❌ {e}")
+        sys.exit(1)
+    
+    logger.info(f"Converting embeddings to: {storage}")
+    logger.info("-" * 60)
+    
+    try:
+        converted = vector_store.migrate_embedding_storage(storage)
+    except Exception as e:
+        logger.error(f"❌ Migration failed: {e}", exc_info=True)
+        sys.exit(1)
+    
+    stats = vector_store.get_collection_stats()
+    
+    # Summary
+    logger.info("=" * 60)
+    logger.info("Migration Summary")
+    logger.info("=" * 60)
+    logger.info(f"🔁 Documents converted: {converted}")
+    logger.info(f"📊 Total documents in vector store: {stats.get('document_count', 0)}")
+    logger.info("=" * 60)
+    logger.info("✅ Embedding storage migration completed successfully!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Test script for sharded vector search recovering from a dead shard worker
+
+Runs against a temporary local SQLite store with two search shards, so
+neither MongoDB nor the embedding model is needed.
+"""
+import os
+import sys
+import signal
+import tempfile
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from app.services.vector_store import VectorStore
+
+
+def build_store():
+    """Published exact index of random vectors, searched by two shard workers"""
+    os.environ["LOCAL_STORE_DIR"] = tempfile.mkdtemp()
+    store = VectorStore(
+        collection_name="documents",
+        index_dir=tempfile.mkdtemp(),
+        index_type="exact",
+        backend="sqlite",
+        shards=2
+    )
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(500, 64)).astype(np.float32)
+    chunks = [{"text": f"chunk {i}", "source": "handbook.pdf", "page": i} for i in range(len(embeddings))]
+    store.load_index()
+    store.store_documents(chunks, embeddings)
+    store.publish_index()
+    return store, embeddings
+
+
+def test_search_after_worker_dies():
+    """A search after a shard worker is killed still returns hits, and the pool restarts"""
+    print("\n" + "="*60)
+    print("TEST: Sharded search after a worker dies")
+    print("="*60)
+    
+    store, embeddings = build_store()
+    try:
+        assert store.search_similar(embeddings[0], limit=3), "No hits before the worker died"
+        executor = store.shard_pool._executor
+        assert executor is not None, "Search did not use the shard workers"
+        
+        # Simulate an OOM kill of one worker
+        worker = next(iter(executor._processes.values()))
+        os.kill(worker.pid, signal.SIGKILL)
+        worker.join()
+        
+        results = store.search_similar(embeddings[1], limit=3)
+        print(f"Hits after the worker died: {len(results)}")
+        assert results, "No hits after the worker died"
+        assert results[0]["text"] == "chunk 1", "Wrong top hit after the worker died"
+        
+        results = store.search_similar(embeddings[2], limit=3)
+        print(f"Hits on the restarted pool: {len(results)}")
+        assert results and results[0]["text"] == "chunk 2", "No hits on the restarted pool"
+        assert store.shard_pool._executor is not executor, "Broken pool was not replaced"
+        print("[PASS] Sharded search recovered from a dead worker")
+    finally:
+        store.stop_search_shards()
+
+
+def main():
+    try:
+        test_search_after_worker_dies()
+        return 0
+    except AssertionError as e:
+        print(f"[FAIL] {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
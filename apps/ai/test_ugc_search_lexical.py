@@ -0,0 +1,72 @@
+"""
+Test script for UGC search while the embedding model is not loaded
+
+Runs against a temporary local SQLite store, so neither MongoDB nor the
+embedding model is needed.
+"""
+import os
+import sys
+import tempfile
+
+# Local store and index in a temporary directory
+os.environ["VECTOR_STORE_BACKEND"] = "sqlite"
+os.environ["LOCAL_STORE_DIR"] = tempfile.mkdtemp()
+os.environ["VECTOR_INDEX_DIR"] = tempfile.mkdtemp()
+os.environ["UGC_SEARCH_MODE"] = "vector"
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from app.services.embedding_service import DEFAULT_MODEL_NAME, MODEL_REGISTRY
+from app.services.vector_store import get_vector_store
+from app.tools.ugc_search_tool import UGCSearchTool
+
+CHUNKS = [
+    {"text": "Hostel facilities are provided for first year students on request.", "source": "handbook.pdf", "page": 1},
+    {"text": "The Mahapola scholarship is paid monthly to eligible students.", "source": "handbook.pdf", "page": 2},
+    {"text": "Repeat candidates must re-register for the course unit.", "source": "handbook.pdf", "page": 3},
+]
+
+
+def test_lexical_search_while_model_loads():
+    """A query before the model is loaded is answered by BM25 without waiting"""
+    print("\n" + "="*60)
+    print("TEST: Lexical search while the embedding model loads")
+    print("="*60)
+    
+    # Keep the model "loading" for the whole test
+    load_requests = []
+    MODEL_REGISTRY.load_in_background = load_requests.append
+    assert not MODEL_REGISTRY.is_loaded(DEFAULT_MODEL_NAME), "Model unexpectedly loaded"
+    
+    vector_store = get_vector_store(collection_name="documents")
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(len(CHUNKS), 384)).astype(np.float32)
+    vector_store.store_documents([dict(chunk) for chunk in CHUNKS], embeddings)
+    
+    tool = UGCSearchTool()
+    result = tool.execute(query="mahapola scholarship")
+    
+    print(f"Success: {result.get('success')}")
+    print(f"Sources: {result.get('sources')}")
+    
+    assert tool.embedding_service is None, "Tool waited for the embedding model"
+    assert DEFAULT_MODEL_NAME in load_requests, "Model load was not started in the background"
+    assert result.get("success"), f"Search failed: {result.get('message')}"
+    assert "Mahapola" in result["results"][0]["text"], "BM25 did not rank the matching chunk first"
+    print("[PASS] Lexical search answered while the model was not loaded")
+
+
+def main():
+    try:
+        test_lexical_search_while_model_loads()
+        return 0
+    except AssertionError as e:
+        print(f"[FAIL] {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())